@@ -0,0 +1,92 @@
+"""Bulk re-validation: the per-model loop versus the batch validator.
+
+The loop calls BalanceSheet / ProfitAndLoss.model_validate_with_tolerance for
+every statement, as re-validating stored extractions used to. The batch runs
+validate_statements on the same dicts, validate_jsonl on their JSON lines, and
+validate_batch on prebuilt StatementBatches (the rule evaluation alone, for
+callers that keep the values as arrays). The statements are synthetic: every
+row of the indexes (see benchmarks.export_loop_lag) set to zero, with one value
+perturbed in --broken percent of them.
+
+    python -m benchmarks.batch_validation --statements 5000 --broken 10
+"""
+import argparse
+import copy
+import json
+import random
+import time
+
+from src.domain.models.balance_sheet import BalanceSheet
+from src.domain.models.profit_and_loss import ProfitAndLoss
+from src.services.batch_validation import StatementBatch, validate_batch, validate_jsonl, validate_statements
+
+from benchmarks.export_loop_lag import synthetic_results
+
+TOLERANCE = 1
+
+
+def statement_dicts(count: int, broken_percent: int, seed: int) -> list[dict]:
+    # Every row of both statements, all zero so that every rule and row check holds
+    templates = [
+        {"statement_type": r["statement_type"], "rok": r["model"].rok, "data": {str(k): dict.fromkeys(v.model_dump(), 0) for k, v in r["model"].data.items()}}
+        for r in synthetic_results(1)
+    ]
+    rng = random.Random(seed)
+    statements = []
+    for i in range(count):
+        statement = copy.deepcopy(templates[i % 2])
+        if rng.randrange(100) < broken_percent:
+            row = statement["data"][rng.choice(list(statement["data"]))]
+            row[rng.choice(list(row))] = rng.randint(5, 500)
+        statements.append(statement)
+    return statements
+
+
+def model_loop(statements: list[dict]) -> int:
+    invalid = 0
+    for statement in statements:
+        model = BalanceSheet if statement["statement_type"] == "rozvaha" else ProfitAndLoss
+        try:
+            model.model_validate_with_tolerance({"rok": statement["rok"], "data": statement["data"]}, tolerance=TOLERANCE)
+        except ValueError:
+            invalid += 1
+    return invalid
+
+
+def measure(label: str, fn, count: int) -> float:
+    start = time.perf_counter()
+    invalid = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {elapsed:7.3f}s, {count / elapsed:10.0f} statements/s ({invalid} invalid)")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=5000)
+    parser.add_argument("--broken", type=int, default=10, help="percent of statements with a perturbed value")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    statements = statement_dicts(args.statements, args.broken, args.seed)
+    lines = [json.dumps(statement) for statement in statements]
+    batches = [
+        StatementBatch.from_statements(statement_type, [s for s in statements if s["statement_type"] == statement_type])
+        for statement_type in ("rozvaha", "vzz")
+    ]
+
+    def count_invalid(results) -> int:
+        return sum(1 for r in results if not r.valid)
+
+    loop = measure("model loop", lambda: model_loop(statements), args.statements)
+    for label, fn in (
+        ("validate_jsonl", lambda: count_invalid(validate_jsonl(lines, TOLERANCE))),
+        ("validate_statements", lambda: count_invalid(validate_statements(statements, tolerance=TOLERANCE))),
+        ("validate_batch", lambda: sum(1 for batch in batches for violations in validate_batch(batch, TOLERANCE) if violations)),
+    ):
+        elapsed = measure(label, fn, args.statements)
+        print(f"{'':>22}  {loop / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
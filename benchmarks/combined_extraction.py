@@ -0,0 +1,85 @@
+"""Latency and token cost of the staged flow versus the combined single-call extraction.
+
+The staged flow disambiguates first and then extracts each present statement;
+the combined flow asks for the presence flags and both statements at once.
+Both run against the live model (needs GOOGLE_API_KEY) with the response
+cache disabled, so every run issues real calls.
+
+    python -m benchmarks.combined_extraction statements.pdf other.pdf --repeats 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from pathlib import Path
+
+from src.infrastructure.clients.genai_client import TokenUsage, close_client_registry, token_usage
+from src.services.process import (
+    disambiguate_pdf_bytes_async,
+    extract_combined_async,
+    ocr_and_validate_with_retries,
+)
+
+
+async def run_staged(pdf_bytes: bytes, tolerance: int, max_retries: int) -> list[dict]:
+    info = await disambiguate_pdf_bytes_async(pdf_bytes)
+    present_types = [st_type for st_type in ("rozvaha", "vzz") if info.get(st_type)]
+    return await asyncio.gather(
+        *(ocr_and_validate_with_retries(pdf_bytes, st_type, tolerance, max_retries) for st_type in present_types)
+    )
+
+
+async def run_combined(pdf_bytes: bytes, tolerance: int, max_retries: int) -> list[dict]:
+    _, results = await extract_combined_async(pdf_bytes, tolerance, max_retries)
+    return list(results.values())
+
+
+async def measure(flow, pdf_bytes: bytes, tolerance: int, max_retries: int) -> tuple[float, TokenUsage, int, int]:
+    usage = TokenUsage()
+    token_usage.set(usage)
+    start = time.perf_counter()
+    results = await flow(pdf_bytes, tolerance, max_retries)
+    elapsed = time.perf_counter() - start
+    valid = sum(1 for r in results if r["status"] == "ok")
+    return elapsed, usage, valid, len(results)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=int, default=1)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["OCR_CACHE_ENABLED"] = "0"
+    flows = {"staged": run_staged, "combined": run_combined}
+
+    try:
+        for path in args.pdfs:
+            pdf_bytes = path.read_bytes()
+            print(f"{path.name} ({len(pdf_bytes)/1024:.1f}KB)")
+            for name, flow in flows.items():
+                latencies, runs = [], []
+                for _ in range(args.repeats):
+                    elapsed, usage, valid, total = await measure(flow, pdf_bytes, args.tolerance, args.retries)
+                    latencies.append(elapsed)
+                    runs.append((usage, valid, total))
+                calls = statistics.mean(u.calls for u, _, _ in runs)
+                prompt = statistics.mean(u.prompt_tokens for u, _, _ in runs)
+                cached = statistics.mean(u.cached_tokens for u, _, _ in runs)
+                output = statistics.mean(u.output_tokens for u, _, _ in runs)
+                valid = sum(v for _, v, _ in runs)
+                total = sum(t for _, _, t in runs)
+                print(
+                    f"  {name:<9} mean {statistics.mean(latencies):6.1f}s   max {max(latencies):6.1f}s   "
+                    f"calls {calls:4.1f}   prompt tokens {prompt:8.0f} (cached {cached:6.0f})   "
+                    f"output tokens {output:7.0f}   valid {valid}/{total}"
+                )
+    finally:
+        await close_client_registry()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Export time and peak memory of the DCF export paths.
+
+The "load" path parses DCF.xlsx with openpyxl.load_workbook for every export
+and checks every filled cell for a formula (how exports used to work); the
+"clone" path parses the template once, then fills a pickle clone using the
+precomputed formula-cell map; the "xml" path (DCF_EXPORT_BACKEND=xml) patches
+the template package without openpyxl. Each path runs in a fresh process so
+its peak RSS is its own. The statements are synthetic (see
+benchmarks.export_loop_lag).
+
+    python -m benchmarks.dcf_template_clone --exports 5 --years 3
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+
+import openpyxl
+
+from src.infrastructure.exporters import dcf
+from src.infrastructure.exporters.dcf_xml import export_dcf_xml, preload_xml_template
+
+from benchmarks.export_loop_lag import synthetic_results
+
+
+def run_path(path: str, exports: int, years: int) -> dict:
+    results = synthetic_results(years)
+    info = {"datum": f"{results[0]['model'].rok}-12-31"}
+    preload_seconds = 0.0
+    if path in ("clone", "xml"):
+        start = time.perf_counter()
+        if path == "clone":
+            dcf.preload_dcf_template()
+        else:
+            preload_xml_template()
+        preload_seconds = time.perf_counter() - start
+    timings = {"load": [], "fill_save": []}
+    for _ in range(exports):
+        start = time.perf_counter()
+        if path == "xml":
+            export_dcf_xml(results, info, 1)
+            timings["load"].append(0.0)
+            timings["fill_save"].append(time.perf_counter() - start)
+            continue
+        if path == "clone":
+            workbook, formula_cells = dcf.clone_dcf_template()
+        else:
+            workbook, formula_cells = openpyxl.load_workbook(dcf.TEMPLATE_PATH), None
+        loaded = time.perf_counter()
+        dcf.fill_dcf_workbook(workbook, results, info, 1, formula_cells)
+        timings["load"].append(loaded - start)
+        timings["fill_save"].append(time.perf_counter() - loaded)
+    return {
+        "preload": preload_seconds,
+        "load": statistics.median(timings["load"]),
+        "fill_save": statistics.median(timings["fill_save"]),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exports", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for path in ("load", "clone", "xml"):
+        with context.Pool(1) as pool:
+            stats = pool.apply(run_path, (path, args.exports, args.years))
+        print(
+            f"{path:>5}: template {stats['load']*1000:.0f}ms + fill/save {stats['fill_save']*1000:.0f}ms per export "
+            f"(median of {args.exports}), preload {stats['preload']*1000:.0f}ms, peak RSS {stats['peak_rss_mb']:.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Event-loop lag while DCF workbooks are generated.
+
+A ticker task sleeps in short intervals and records how late it wakes up while
+exports run: inline on the event loop (how POST /process used to export), in a
+thread, and in the export process pool. The lag is what every other request
+(/health included) waits on top of its own work. The statements are synthetic:
+every row of the balance sheet and profit and loss indexes for --years years.
+
+    python -m benchmarks.export_loop_lag --years 3 --exports 4 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from src.domain.models.balance_sheet import BalanceSheet, BalanceSheetRow
+from src.domain.models.profit_and_loss import ProfitAndLoss, ProfitAndLossRow
+from src.infrastructure.exporters.dcf import export_dcf_template
+from src.infrastructure.exporters.dcf_pool import close_export_pool, export_dcf_template_async
+from src.shared import utils
+
+TICK_SECONDS = 0.01
+
+
+def _row_ids(index: dict) -> list[int]:
+    ids = []
+    for row_id, row in index.items():
+        ids.append(int(row_id))
+        ids.extend(_row_ids(row.get("sub_rows") or {}))
+    return ids
+
+
+def synthetic_results(years: int, first_year: int = 2024) -> list[dict]:
+    bs_rows = _row_ids(utils.read_balance_sheet_index())
+    pl_rows = _row_ids(utils.read_profit_and_loss_index())
+    results = []
+    for rok in range(first_year, first_year - years, -1):
+        bs = BalanceSheet.model_construct(
+            rok=rok,
+            data={r: BalanceSheetRow.model_construct(brutto=r * 10, korekce=r, netto=r * 9, netto_minule=r * 8) for r in bs_rows},
+            tolerance=1,
+        )
+        pl = ProfitAndLoss.model_construct(
+            rok=rok, data={r: ProfitAndLossRow.model_construct(současné=r * 7, minulé=r * 6) for r in pl_rows}, tolerance=1
+        )
+        for statement_type, model in (("rozvaha", bs), ("vzz", pl)):
+            results.append({
+                "original": f"synthetic_{rok}.pdf",
+                "statement_type": statement_type,
+                "model": model,
+                "raw": None,
+                "validation_errors": [],
+                "ocr_attempts": 1,
+                "status": "ok",
+            })
+    return results
+
+
+async def measure(label: str, run_exports) -> None:
+    lags: list[float] = []
+    running = True
+
+    async def ticker():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK_SECONDS * 5)
+    start = time.perf_counter()
+    await run_exports()
+    elapsed = time.perf_counter() - start
+    running = False
+    await task
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p95 = lags_ms[int(len(lags_ms) * 0.95) - 1] if len(lags_ms) >= 20 else lags_ms[-1]
+    print(
+        f"{label:>7}: exports {elapsed:.2f}s, loop lag max {lags_ms[-1]:.0f}ms, "
+        f"p95 {p95:.0f}ms, mean {statistics.mean(lags_ms):.1f}ms ({len(lags_ms)} ticks)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3, help="statement years per export")
+    parser.add_argument("--exports", type=int, default=2, help="concurrent exports per mode")
+    parser.add_argument("--workers", type=int, default=None, help="DCF_EXPORT_WORKERS for the pool")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        os.environ["DCF_EXPORT_WORKERS"] = str(args.workers)
+    results = synthetic_results(args.years)
+    info = {"datum": f"{results[0]['model'].rok}-12-31"}
+
+    async def inline():
+        for _ in range(args.exports):
+            export_dcf_template(results, info)
+            await asyncio.sleep(0)
+
+    async def thread():
+        await asyncio.gather(*(asyncio.to_thread(export_dcf_template, results, info) for _ in range(args.exports)))
+
+    async def pool():
+        await asyncio.gather(*(export_dcf_template_async(results, info) for _ in range(args.exports)))
+
+    try:
+        # Start the pool processes outside the measurement
+        await export_dcf_template_async(results, info)
+        await measure("inline", inline)
+        await measure("thread", thread)
+        await measure("pool", pool)
+    finally:
+        close_export_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
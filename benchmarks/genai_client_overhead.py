@@ -0,0 +1,72 @@
+"""Per-call overhead of a fresh GenAI client versus the pooled registry.
+
+Offline mode measures only client construction. With --live (needs
+GOOGLE_API_KEY) every iteration also issues a cheap ``models.get`` call so
+connection setup and TLS handshakes are included in the numbers.
+
+    python -m benchmarks.genai_client_overhead --iterations 20 --live
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from google import genai
+
+from src.infrastructure import config
+from src.infrastructure.clients.genai_client import GenAIClientRegistry
+
+
+def summarize(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<28} mean {statistics.mean(samples):8.2f} ms   p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+async def per_call_client(iterations: int, api_key: str, model: str, live: bool) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client = genai.Client(api_key=api_key)
+        if live:
+            await client.aio.models.get(model=model)
+        samples.append((time.perf_counter() - start) * 1000)
+        await client.aio.aclose()
+        client.close()
+    return samples
+
+
+async def pooled_client(iterations: int, api_key: str, model: str, live: bool) -> list[float]:
+    registry = GenAIClientRegistry(
+        max_connections=config.get_genai_max_connections(),
+        max_keepalive_connections=config.get_genai_max_keepalive_connections(),
+        keepalive_expiry=float(config.get_genai_keepalive_expiry_seconds()),
+    )
+    samples = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            client = registry.get(api_key, model)
+            if live:
+                await client.aio.models.get(model=model)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        await registry.aclose()
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="issue a models.get request per iteration")
+    args = parser.parse_args()
+
+    api_key = config.get_api_key() if args.live else "benchmark-placeholder-key"
+    model = config.get_model()
+
+    summarize("client per call (before)", await per_call_client(args.iterations, api_key, model, args.live))
+    summarize("pooled registry (after)", await pooled_client(args.iterations, api_key, model, args.live))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
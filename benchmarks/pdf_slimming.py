@@ -0,0 +1,79 @@
+"""Bytes, time and extraction quality of slimmed versus original PDFs.
+
+Every PDF is slimmed locally with the configured (or given) settings and the
+bytes before and after are reported. With --live both versions are also sent
+to the model once per statement (needs GOOGLE_API_KEY, the response cache is
+disabled) to compare upload plus extraction latency, prompt tokens, validity
+and how many cells of the original answer the slimmed one reproduces.
+
+    python -m benchmarks.pdf_slimming scans/*.pdf --dpi 150 --live
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from pathlib import Path
+
+from src.infrastructure import config
+from src.infrastructure.clients.genai_client import TokenUsage, close_client_registry, token_usage
+from src.infrastructure.pdf.slimming import slim_pdf
+from src.infrastructure.pdf.text_layer import read_page_texts
+from src.services.process import _run_ocr_attempt
+
+from benchmarks.text_input_accuracy import agreement
+
+
+async def extract(pdf_bytes: bytes, statement_type: str, tolerance: int) -> dict:
+    usage = TokenUsage()
+    token_usage.set(usage)
+    start = time.perf_counter()
+    outcome = await _run_ocr_attempt(pdf_bytes, statement_type, tolerance, 1)
+    return {"seconds": time.perf_counter() - start, "usage": usage, "outcome": outcome}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--dpi", type=int, default=config.get_pdf_slimming_dpi())
+    parser.add_argument("--quality", type=int, default=config.get_pdf_slimming_jpeg_quality())
+    parser.add_argument("--color", action="store_true", help="keep colour images")
+    parser.add_argument("--live", action="store_true", help="also compare extraction on the live model")
+    parser.add_argument("--tolerance", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["OCR_CACHE_ENABLED"] = "0"
+    ratios = []
+    try:
+        for path in args.pdfs:
+            original = path.read_bytes()
+            strip_fonts = read_page_texts(original) is None
+            result = await asyncio.to_thread(slim_pdf, original, args.dpi, not args.color, args.quality, strip_fonts)
+            ratios.append(result.bytes_after / result.bytes_before)
+            print(
+                f"{path.name}: {result.bytes_before/1024:.1f}KB -> {result.bytes_after/1024:.1f}KB "
+                f"({result.bytes_after / result.bytes_before * 100:.0f}%), {result.images_resampled} images resampled, "
+                f"{result.seconds:.2f}s{' (fonts stripped)' if strip_fonts else ''}"
+            )
+            if not args.live or not result.slimmed:
+                continue
+            for statement_type in ("rozvaha", "vzz"):
+                before = await extract(original, statement_type, args.tolerance)
+                after = await extract(result.pdf_bytes, statement_type, args.tolerance)
+                for label, run in (("original", before), ("slimmed", after)):
+                    print(
+                        f"  {statement_type:<7} {label:<8} {run['seconds']:6.1f}s   prompt tokens {run['usage'].prompt_tokens:7d}   "
+                        f"valid {run['outcome']['model'] is not None}"
+                    )
+                same = agreement(after["outcome"]["raw"], before["outcome"]["raw"])
+                if same is not None:
+                    print(f"  {statement_type:<7} slimmed reproduces {same * 100:.1f}% of the original answer")
+    finally:
+        await close_client_registry()
+
+    if ratios:
+        print(f"mean size after slimming: {statistics.mean(ratios) * 100:.0f}% of the original")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
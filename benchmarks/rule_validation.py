@@ -0,0 +1,99 @@
+"""Rule evaluation per statement: the per-rule validators versus the compiled rule matrix.
+
+The loop calls validate_netto / validate_netto_minule / validate_profit_and_loss
+for every rule and column (how validate_consistency used to work); the matrix
+path reads the values once and evaluates all rules with one sparse product,
+building violations only for the violated rules. The statements are synthetic
+(see benchmarks.export_loop_lag), so most rules are violated; --consistent
+rebuilds every target row from its sources so that all rules pass.
+
+    python -m benchmarks.rule_validation --repeats 2000
+"""
+import argparse
+import time
+
+from src.domain.models.rules import (
+    BALANCE_SHEET_RULE_MATRIX,
+    PREDEFINED_VALIDATION_RULES,
+    PROFIT_AND_LOSS_RULE_MATRIX,
+    PROFIT_AND_LOSS_RULES,
+    rule_violations,
+)
+
+from benchmarks.export_loop_lag import synthetic_results
+
+
+def make_consistent(data: dict, rules, fields) -> None:
+    # Rules are listed parents first, so fill them bottom-up
+    for rule in reversed(rules):
+        terms = [(row, 1) for row in rule.source_rows] if hasattr(rule, "source_rows") else rule.source_expressions
+        for field in fields:
+            total = sum(sign * getattr(data[row], field) for row, sign in terms if row in data)
+            if rule.target_row in data:
+                setattr(data[rule.target_row], field, total)
+
+
+def loop_balance_sheet(data: dict, tolerance: int) -> list[str]:
+    errors = []
+    for rule in PREDEFINED_VALIDATION_RULES:
+        for validate in (rule.validate_netto, rule.validate_netto_minule):
+            is_valid, message = validate(data, tolerance=tolerance)
+            if not is_valid:
+                errors.append(message)
+    return errors
+
+
+def matrix_balance_sheet(data: dict, tolerance: int) -> list[str]:
+    violations = rule_violations(PREDEFINED_VALIDATION_RULES, BALANCE_SHEET_RULE_MATRIX, data, ("netto", "netto_minule"), tolerance, by_rule=True)
+    return [violation.message() for violation in violations]
+
+
+def loop_profit_and_loss(data: dict, tolerance: int) -> list[str]:
+    errors = []
+    for field in ("současné", "minulé"):
+        for rule in PROFIT_AND_LOSS_RULES:
+            is_valid, message = rule.validate_profit_and_loss(data, field=field, tolerance=tolerance)
+            if not is_valid:
+                errors.append(message)
+    return errors
+
+
+def matrix_profit_and_loss(data: dict, tolerance: int) -> list[str]:
+    violations = rule_violations(PROFIT_AND_LOSS_RULES, PROFIT_AND_LOSS_RULE_MATRIX, data, ("současné", "minulé"), tolerance)
+    return [violation.message() for violation in violations]
+
+
+def measure(label: str, fn, data: dict, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        errors = fn(data, 1)
+    per_call = (time.perf_counter() - start) / repeats
+    print(f"{label:>22}: {per_call * 1e6:8.1f}us per statement ({len(errors)} violations)")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--consistent", action="store_true", help="make every rule pass")
+    args = parser.parse_args()
+
+    bs, pl = synthetic_results(1)
+    bs_data, pl_data = bs["model"].data, pl["model"].data
+    if args.consistent:
+        make_consistent(bs_data, PREDEFINED_VALIDATION_RULES, ("netto", "netto_minule"))
+        make_consistent(pl_data, PROFIT_AND_LOSS_RULES, ("současné", "minulé"))
+
+    assert loop_balance_sheet(bs_data, 1) == matrix_balance_sheet(bs_data, 1)
+    assert loop_profit_and_loss(pl_data, 1) == matrix_profit_and_loss(pl_data, 1)
+    for name, loop, matrix, data in (
+        ("balance sheet", loop_balance_sheet, matrix_balance_sheet, bs_data),
+        ("profit and loss", loop_profit_and_loss, matrix_profit_and_loss, pl_data),
+    ):
+        loop_time = measure(f"{name} loop", loop, data, args.repeats)
+        matrix_time = measure(f"{name} matrix", matrix, data, args.repeats)
+        print(f"{'':>22}  {loop_time / matrix_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Accuracy, latency and token cost of OCR from a text rendition versus the PDF.
+
+For every statement the page locator finds, one OCR call is made with the
+sliced PDF and one with the text rendition of the same pages. Both answers are
+validated and compared cell by cell with each other and, when --truth is given,
+with a reference payload stored as <truth>/<pdf stem>.<statement type>.json.
+Needs GOOGLE_API_KEY and PDFs with a text layer.
+
+    python -m benchmarks.text_input_accuracy reports/*.pdf --truth reports/truth --tolerance 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.infrastructure.clients.genai_client import TokenUsage, close_client_registry, token_usage
+from src.infrastructure.pdf.page_locator import split_statement_pdfs
+from src.infrastructure.pdf.text_layer import render_pages_text
+from src.services.process import _run_ocr_attempt
+
+
+def cells(payload: Optional[dict]) -> dict[tuple[str, str], object]:
+    rows = (payload or {}).get("data") or {}
+    return {
+        (str(row), field): value
+        for row, values in rows.items()
+        if isinstance(values, dict)
+        for field, value in values.items()
+        if value is not None
+    }
+
+
+def agreement(left: Optional[dict], right: Optional[dict]) -> Optional[float]:
+    """Share of the right payload's non-empty cells that the left payload reproduces."""
+    reference = cells(right)
+    if not reference:
+        return None
+    candidate = cells(left)
+    return sum(1 for key, value in reference.items() if candidate.get(key, 0) == value) / len(reference)
+
+
+async def run_mode(pdf_bytes: bytes, statement_type: str, tolerance: int, document_text: Optional[str]) -> dict:
+    usage = TokenUsage()
+    token_usage.set(usage)
+    start = time.perf_counter()
+    outcome = await _run_ocr_attempt(pdf_bytes, statement_type, tolerance, 1, document_text=document_text)
+    return {"seconds": time.perf_counter() - start, "usage": usage, "outcome": outcome}
+
+
+def fmt(value: Optional[float]) -> str:
+    return f"{value * 100:5.1f}%" if value is not None else "   n/a"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--truth", type=Path, help="directory with reference payloads")
+    parser.add_argument("--tolerance", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["OCR_CACHE_ENABLED"] = "0"
+    totals: dict[str, list[dict]] = {"pdf": [], "text": []}
+
+    try:
+        for path in args.pdfs:
+            statement_pdfs = await asyncio.to_thread(split_statement_pdfs, path.read_bytes())
+            if not statement_pdfs.pages:
+                print(f"{path.name}: no statement pages located (no text layer?), skipped")
+                continue
+            for statement_type in statement_pdfs.pages:
+                pdf_bytes = statement_pdfs.for_statement(statement_type)
+                text = render_pages_text(statement_pdfs.statement_texts(statement_type))
+                runs = {
+                    "pdf": await run_mode(pdf_bytes, statement_type, args.tolerance, None),
+                    "text": await run_mode(pdf_bytes, statement_type, args.tolerance, text),
+                }
+                truth = None
+                truth_path = args.truth / f"{path.stem}.{statement_type}.json" if args.truth else None
+                if truth_path is not None and truth_path.exists():
+                    truth = json.loads(truth_path.read_text(encoding="utf-8"))
+
+                print(f"{path.name} [{statement_type}] {len(pdf_bytes)/1024:.1f}KB PDF vs {len(text)} chars text")
+                for mode, run in runs.items():
+                    outcome = run["outcome"]
+                    run["valid"] = outcome["model"] is not None
+                    run["truth"] = agreement(outcome["raw"], truth) if truth is not None else None
+                    totals[mode].append(run)
+                    print(
+                        f"  {mode:<5} {run['seconds']:6.1f}s   prompt tokens {run['usage'].prompt_tokens:7d}   "
+                        f"valid {str(run['valid']):<5}   vs truth {fmt(run['truth'])}"
+                    )
+                print(f"  text reproduces {fmt(agreement(runs['text']['outcome']['raw'], runs['pdf']['outcome']['raw']))} of the PDF answer")
+    finally:
+        await close_client_registry()
+
+    print("summary")
+    for mode, runs in totals.items():
+        if not runs:
+            continue
+        truths = [r["truth"] for r in runs if r["truth"] is not None]
+        print(
+            f"  {mode:<5} mean {statistics.mean(r['seconds'] for r in runs):6.1f}s   "
+            f"prompt tokens {statistics.mean(r['usage'].prompt_tokens for r in runs):8.0f}   "
+            f"valid {sum(r['valid'] for r in runs)}/{len(runs)}   "
+            f"vs truth {fmt(statistics.mean(truths) if truths else None)}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
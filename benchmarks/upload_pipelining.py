@@ -0,0 +1,81 @@
+"""Response time of POST /process over a slow link, settings sent before versus after the files.
+
+With the settings first the server starts on each PDF as soon as it has
+arrived; with the settings last it has to wait for the whole body, as every
+request did before the body was parsed incrementally. The upload is throttled
+to --kbps on the client side. Runs against a live server (DEMO_USER and
+DEMO_PASSWORD as configured there); compare the server log's per-file timings
+and GET /stats (ingestion) with the times printed here.
+
+    python -m benchmarks.upload_pipelining http://localhost:8000 a.pdf b.pdf c.pdf --kbps 500
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+CHUNK_BYTES = 16 * 1024
+
+
+def multipart_parts(pdfs: list[Path], settings: dict[str, str], settings_first: bool) -> tuple[str, list[bytes]]:
+    boundary = uuid.uuid4().hex
+    fields = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in settings.items()
+    ]
+    files = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="pdfs"; filename="{path.name}"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n".encode() + path.read_bytes() + b"\r\n"
+        for path in pdfs
+    ]
+    parts = fields + files if settings_first else files + fields
+    return boundary, parts + [f"--{boundary}--\r\n".encode()]
+
+
+async def throttled(parts: list[bytes], kbps: int):
+    delay = CHUNK_BYTES / (kbps * 1024)
+    for part in parts:
+        for offset in range(0, len(part), CHUNK_BYTES):
+            yield part[offset:offset + CHUNK_BYTES]
+            await asyncio.sleep(delay)
+
+
+async def measure(client: httpx.AsyncClient, pdfs: list[Path], settings: dict[str, str], settings_first: bool, kbps: int) -> None:
+    boundary, parts = multipart_parts(pdfs, settings, settings_first)
+    size = sum(len(part) for part in parts)
+    start = time.perf_counter()
+    response = await client.post(
+        "/process",
+        content=throttled(parts, kbps),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    elapsed = time.perf_counter() - start
+    upload_seconds = size / (kbps * 1024)
+    label = "settings first" if settings_first else "settings last"
+    print(f"{label:>14}: {response.status_code} after {elapsed:.2f}s (upload alone ~{upload_seconds:.2f}s, {size / 1024:.0f}KB)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--kbps", type=int, default=500, help="client upload speed in KB/s")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    # JSON output keeps the export out of the measurement; the response cache should be off on the server
+    settings = {"tolerance": "1", "return_json": "true"}
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        login = {"username": os.getenv("DEMO_USER", "demo"), "password": os.getenv("DEMO_PASSWORD", "")}
+        await client.post("/login", data=login)
+        for _ in range(args.repeats):
+            await measure(client, args.pdfs, settings, settings_first=False, kbps=args.kbps)
+            await measure(client, args.pdfs, settings, settings_first=True, kbps=args.kbps)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
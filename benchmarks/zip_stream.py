@@ -0,0 +1,66 @@
+"""Time to first byte and peak memory of the ZIP fallback export, buffered versus streamed.
+
+The buffered path builds every per-statement workbook into one in-memory
+archive before anything is sent (how the fallback used to work); the streamed
+path yields each member's compressed bytes as soon as it is written. Memory is
+measured with tracemalloc, which slows both paths down alike. The statements
+are synthetic (see benchmarks.export_loop_lag).
+
+    python -m benchmarks.zip_stream --results 4 16 64
+"""
+import argparse
+import asyncio
+import io
+import time
+import tracemalloc
+import zipfile
+
+from src.infrastructure.exporters.excel import export_excel
+from src.infrastructure.exporters.zip_stream import stream_zip
+
+from benchmarks.export_loop_lag import synthetic_results
+
+
+def members(results: list[dict]):
+    for i, r in enumerate(results):
+        yield f"{i}_{r['statement_type']}_{r['model'].rok}.xlsx", lambda r=r: export_excel(r["statement_type"], r["model"]).getvalue()
+
+
+async def buffered(results: list[dict]):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, produce in members(results):
+            archive.writestr(arcname, produce())
+    yield buffer.getvalue()
+
+
+async def measure(label: str, body) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    async for chunk in body:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        # Chunks are dropped like a response that has been sent
+        size += len(chunk)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:>8}: first byte {first_byte:.2f}s, total {total:.2f}s, {size/1024:.0f}KB, peak traced memory {peak/1024/1024:.1f}MB")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, nargs="+", default=[4, 16, 64], help="statements per archive")
+    args = parser.parse_args()
+
+    for count in args.results:
+        results = synthetic_results((count + 1) // 2)[:count]
+        print(f"{count} workbooks:")
+        await measure("buffered", buffered(results))
+        await measure("streamed", stream_zip(members(results)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
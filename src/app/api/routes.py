@@ -1,17 +1,20 @@
 import os
-import io
-import zipfile
+import json
+import uuid
 import logging
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status, Request
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, RedirectResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse, RedirectResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
 logger = logging.getLogger(__name__)
 
-from src.infrastructure.exporters.excel import export_excel
-from src.infrastructure.exporters.dcf import export_dcf_template
-from src.services.process import process_pdf_bytes, disambiguate_pdf_bytes, process_pdf_bytes_async, disambiguate_pdf_bytes_async, ocr_and_validate_with_retries
+from src.services.batch_validation import validate_jsonl_request
+from src.services.ingestion import process_streamed_upload
+from src.services.pipeline import build_export, resolve_options, summarize_results
+from src.services.jobs import IdempotencyConflict, Job, JobQueueFull, get_job_manager
 from src.infrastructure import config
+from src.infrastructure.clients.scheduler import llm_session
+from src.infrastructure.uploads import SpooledPdf, UploadTooLarge, discard_all, spool_upload
 
 
 router = APIRouter()
@@ -22,6 +25,15 @@ def is_authenticated(request: Request) -> bool:
     return bool(request.session.get("auth"))
 
 
+def get_session_id(request: Request) -> str:
+    """Stable per-browser id used to queue model calls fairly between users."""
+    sid = request.session.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        request.session["sid"] = sid
+    return sid
+
+
 def require_demo(request: Request, credentials: HTTPBasicCredentials = Depends(security)):
     # Allow if previously authenticated via form/cookie
     if is_authenticated(request):
@@ -113,6 +125,11 @@ INDEX_HTML = """
       .notice { margin-top: 6px; font-size: 14px; display: none; }
       .notice--error { color: #b91c1c; display: block; }
       .notice--success { color: #166534; display: block; }
+      .progress { margin: 4px 0 0; padding-left: 18px; font-size: 13px; color: #475569; max-height: 220px; overflow-y: auto; }
+      .progress:empty { display: none; }
+      .progress li { margin: 2px 0; }
+      .progress li.is-error { color: #b91c1c; }
+      .progress li.is-ok { color: #166534; }
 
       .actions { display: flex; align-items: center; gap: 12px; margin-top: 4px; }
       button[type="submit"] {
@@ -178,6 +195,7 @@ INDEX_HTML = """
               <span class="hint">Po úspěšném zpracování se stáhne soubor .xlsx.</span>
             </div>
             <div id="notice" class="notice" aria-live="polite"></div>
+            <ol id="progress" class="progress" aria-live="polite"></ol>
           </form>
         </div>
         <aside class="aside">
@@ -207,6 +225,7 @@ INDEX_HTML = """
         const form = document.getElementById('upload-form');
         const submitBtn = document.getElementById('submit-btn');
         const notice = document.getElementById('notice');
+        const progressList = document.getElementById('progress');
 
         const showNames = (files) => {
           if (!files || files.length === 0) { fileName.textContent = ''; return; }
@@ -235,51 +254,114 @@ INDEX_HTML = """
         });
         input.addEventListener('change', () => showNames(input.files));
 
+        const STATEMENTS = { rozvaha: 'Rozvaha', vzz: 'VZZ', combined: 'Rozvaha + VZZ' };
+        const describe = (ev) => {
+          const who = ev.file ? ev.file + ': ' : '';
+          const st = STATEMENTS[ev.statement_type] || ev.statement_type;
+          switch (ev.stage) {
+            case 'job_started': return ['Zpracování zahájeno.'];
+            case 'file_started': return [who + 'zahájeno'];
+            case 'disambiguation': {
+              const found = ['rozvaha', 'vzz'].filter(k => ev[k]).map(k => STATEMENTS[k]);
+              return [who + (found.length ? 'rozpoznáno – ' + found.join(', ') + (ev.datum ? ' k ' + ev.datum : '') : 'nerozpoznán žádný výkaz')];
+            }
+            case 'ocr_attempt_started':
+              return [who + st + ' – vytěžování, pokus ' + ev.attempt + '/' + ev.max_attempts + (ev.rows ? ' (' + ev.rows + ' řádků)' : '')];
+            case 'ocr_attempt_finished':
+              return ev.valid ? [who + st + ' – pokus ' + (ev.attempt || '') + ' prošel kontrolami'] : [who + st + ' – pokus ' + (ev.attempt || '') + ' neprošel kontrolami' + (ev.errors ? ' (' + ev.errors + ' chyb)' : '')];
+            case 'validation': {
+              const source = ev.source === 'text_layer' ? ' (z textové vrstvy PDF)' : ev.source === 'cache' ? ' (z mezipaměti)' : '';
+              return ev.status === 'ok' ? [who + st + ' v pořádku' + source, 'ok'] : [who + st + ' s chybami ve výkazu (' + ev.errors + ')', 'error'];
+            }
+            case 'file_done': return [who + 'hotovo', 'ok'];
+            case 'file_failed': return [who + (ev.error || 'chyba'), 'error'];
+            case 'export_started': return ['Připravuji Excel…'];
+            case 'export_done': return ['Excel je připraven.', 'ok'];
+            case 'job_failed': return ['Zpracování selhalo.', 'error'];
+            default: return null;
+          }
+        };
+        const addProgress = (ev) => {
+          const line = describe(ev);
+          if (!line) return;
+          const li = document.createElement('li');
+          li.textContent = line[0];
+          if (line[1]) li.className = 'is-' + line[1];
+          progressList.appendChild(li);
+          progressList.scrollTop = progressList.scrollHeight;
+        };
+        // Resolves with the final event (job_done / job_failed)
+        const followJob = (jobId) => new Promise((resolve, reject) => {
+          const source = new EventSource('/jobs/' + jobId + '/events');
+          source.onmessage = (msg) => {
+            const ev = JSON.parse(msg.data);
+            addProgress(ev);
+            if (ev.stage === 'job_done' || ev.stage === 'job_failed') { source.close(); resolve(ev); }
+          };
+          // The browser reconnects on its own; give up only once it has closed the stream
+          source.onerror = () => { if (source.readyState === EventSource.CLOSED) reject(new Error('stream closed')); };
+        });
+        const readError = async (response) => {
+          const contentType = response.headers.get('content-type') || '';
+          let message = 'Zpracování selhalo. Zkuste to prosím znovu.';
+          if (contentType.includes('application/json')) {
+            const data = await response.json().catch(() => null);
+            if (data && (data.detail || data.message)) {
+              message = data.detail || data.message;
+            }
+          } else {
+            const text = await response.text().catch(() => '');
+            if (text) message = text;
+          }
+          return message;
+        };
+        const download = async (response, fallbackName, successMessage) => {
+          const blob = await response.blob();
+          const url = window.URL.createObjectURL(blob);
+          const disposition = response.headers.get('content-disposition') || '';
+          const fileNameMatch = /filename\\*=UTF-8''([^;]+)|filename="?([^";]+)"?/i.exec(disposition);
+          const suggestedName = fileNameMatch ? decodeURIComponent(fileNameMatch[1] || fileNameMatch[2]) : fallbackName;
+          const a = document.createElement('a');
+          a.href = url; a.download = suggestedName; document.body.appendChild(a); a.click(); a.remove();
+          window.URL.revokeObjectURL(url);
+          setNotice(successMessage, 'success');
+        };
+
         form.addEventListener('submit', async (e) => {
           e.preventDefault();
           setNotice('', '');
+          progressList.innerHTML = '';
           submitBtn.disabled = true;
           const previousText = submitBtn.textContent;
-          submitBtn.textContent = 'Zpracovávám…';
+          submitBtn.textContent = 'Odesílám…';
           try {
-            const formData = new FormData(form);
-            const response = await fetch('/process', { method: 'POST', body: formData });
-            const contentType = response.headers.get('content-type') || '';
-            if (!response.ok) {
-              let message = 'Zpracování selhalo. Zkuste to prosím znovu.';
-              if (contentType.includes('application/json')) {
-                const data = await response.json().catch(() => null);
-                if (data && (data.detail || data.message)) {
-                  message = data.detail || data.message;
-                }
-              } else {
-                const text = await response.text().catch(() => '');
-                if (text) message = text;
-              }
-              setNotice(message, 'error');
+            // Settings go before the files, so the server knows them when the first PDF arrives
+            const formData = new FormData();
+            for (const [name, value] of new FormData(form)) {
+              if (!(value instanceof File)) formData.append(name, value);
+            }
+            for (const file of input.files) formData.append('pdfs', file);
+            const created = await fetch('/jobs', { method: 'POST', body: formData });
+            if (!created.ok) {
+              setNotice(await readError(created), 'error');
+              return;
+            }
+            const job = await created.json();
+            submitBtn.textContent = 'Zpracovávám…';
+            const finalEvent = await followJob(job.job_id);
+            if (finalEvent.stage === 'job_failed') {
+              setNotice(finalEvent.error || 'Zpracování selhalo. Zkuste to prosím znovu.', 'error');
               return;
             }
 
-            if (contentType.includes('application/zip')) {
-              const blob = await response.blob();
-              const url = window.URL.createObjectURL(blob);
-              const disposition = response.headers.get('content-disposition') || '';
-              const fileNameMatch = /filename\\*=UTF-8''([^;]+)|filename="?([^";]+)"?/i.exec(disposition);
-              const suggestedName = fileNameMatch ? decodeURIComponent(fileNameMatch[1] || fileNameMatch[2]) : 'valuagent_results.zip';
-              const a = document.createElement('a');
-              a.href = url; a.download = suggestedName; document.body.appendChild(a); a.click(); a.remove();
-              window.URL.revokeObjectURL(url);
-              setNotice('ZIP byl úspěšně stažen.', 'success');
+            const response = await fetch(job.result_url);
+            const contentType = response.headers.get('content-type') || '';
+            if (!response.ok) {
+              setNotice(await readError(response), 'error');
+            } else if (contentType.includes('application/zip')) {
+              await download(response, 'valuagent_results.zip', 'ZIP byl úspěšně stažen.');
             } else if (contentType.includes('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')) {
-              const blob = await response.blob();
-              const url = window.URL.createObjectURL(blob);
-              const disposition = response.headers.get('content-disposition') || '';
-              const fileNameMatch = /filename\\*=UTF-8''([^;]+)|filename="?([^";]+)"?/i.exec(disposition);
-              const suggestedName = fileNameMatch ? decodeURIComponent(fileNameMatch[1] || fileNameMatch[2]) : 'valuagent.xlsx';
-              const a = document.createElement('a');
-              a.href = url; a.download = suggestedName; document.body.appendChild(a); a.click(); a.remove();
-              window.URL.revokeObjectURL(url);
-              setNotice('Excel byl úspěšně stažen.', 'success');
+              await download(response, 'valuagent.xlsx', 'Excel byl úspěšně stažen.');
             } else if (contentType.includes('application/json')) {
               const data = await response.json();
               setNotice(data ? JSON.stringify(data) : 'Obdržena odpověď JSON.', 'success');
@@ -309,176 +391,211 @@ def index(request: Request):
 
 from src.app.main import limiter  # import limiter for decorators
 
+# The /process body is parsed by the handler itself (services.ingestion), so the form is documented here
+PROCESS_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["pdfs"],
+                    "properties": {
+                        "tolerance": {"type": "integer", "default": 1},
+                        "return_json": {"type": "boolean", "default": False},
+                        "ocr_retries": {"type": "integer"},
+                        "ocr_parallel": {"type": "integer"},
+                        "extraction_mode": {"type": "string", "enum": ["staged", "combined"]},
+                        "pdfs": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                    },
+                }
+            }
+        },
+    }
+}
 
-@router.post("/process")
+
+@router.post("/process", openapi_extra=PROCESS_FORM_SCHEMA)
 @limiter.limit("10/minute")
-async def process_pdf(
+async def process_pdf(request: Request):
+    """Process the PDFs of a multipart form; settings sent before the files let each file start on arrival."""
+    if not is_authenticated(request):
+        return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
+
+    # Model calls of this request queue under the caller's session in the shared scheduler
+    llm_session.set(get_session_id(request))
+
+    results, options = await process_streamed_upload(request)
+
+    if options.return_json:
+        # Return compact JSON summary
+        return JSONResponse(summarize_results(results))
+
+    body, media_type, filename = await build_export(results, options.tolerance)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+VALIDATE_JSONL_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {
+                "schema": {
+                    "type": "string",
+                    "description": 'One statement per line: {"statement_type": "rozvaha" | "vzz", "rok": 2024, "data": {"1": {"netto": 0, ...}}}',
+                }
+            }
+        },
+    }
+}
+
+
+@router.post("/validate", openapi_extra=VALIDATE_JSONL_SCHEMA)
+@limiter.limit("30/minute")
+async def validate_statements_jsonl(request: Request, tolerance: int = Query(1, ge=0)):
+    """Re-validate extracted statements in bulk; answers one JSON line per input line, in order."""
+    if not is_authenticated(request):
+        return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
+    results = await validate_jsonl_request(request, tolerance)
+    body = "".join(json.dumps(result.to_dict(), ensure_ascii=False) + "\n" for result in results)
+    return Response(body, media_type="application/x-ndjson")
+
+
+async def read_uploads(pdfs: list[UploadFile]) -> list[SpooledPdf]:
+    """Spool the uploaded files to disk, rejecting empty ones and those over the size limits."""
+    uploads: list[SpooledPdf] = []
+    logger.info(f"Processing {len(pdfs)} uploaded PDF files")
+    max_file = config.get_upload_max_file_mb() * 1024 * 1024
+    max_request = config.get_upload_max_request_mb() * 1024 * 1024
+    total = 0
+    try:
+        for i, f in enumerate(pdfs):
+            filename = f.filename or f"soubor_{i+1}.pdf"
+            try:
+                upload = await spool_upload(f, filename, min(max_file, max_request - total))
+            except UploadTooLarge:
+                if max_file <= max_request - total:
+                    detail = f"Uploaded file '{filename}' exceeds {config.get_upload_max_file_mb()}MB"
+                else:
+                    detail = f"Uploaded files exceed {config.get_upload_max_request_mb()}MB in total"
+                raise HTTPException(status_code=413, detail=detail)
+            uploads.append(upload)
+            if not upload.size:
+                raise HTTPException(status_code=400, detail=f"Uploaded file '{f.filename}' is empty")
+            total += upload.size
+            logger.info(f"File {i+1}: {filename} ({upload.size/1024:.1f}KB)")
+    except BaseException:
+        discard_all(uploads)
+        raise
+    return uploads
+
+
+@router.post("/jobs", status_code=202)
+@limiter.limit("10/minute")
+async def create_job(
     request: Request,
     pdfs: list[UploadFile] = File(...),
     tolerance: int = Form(1),
     return_json: bool = Form(False),
     ocr_retries: int = Form(None),
+    ocr_parallel: int = Form(None),
+    extraction_mode: str = Form(None),
 ):
+    """Queue the same processing as /process and return a job id right away.
+
+    A retry carrying the Idempotency-Key of an earlier submission gets that job (200) instead of a new one.
+    """
     if not is_authenticated(request):
         return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
 
-    # Read files and validate
-    file_payloads: list[tuple[str, bytes]] = []
-    logger.info(f"Processing {len(pdfs)} uploaded PDF files")
-    
-    for i, f in enumerate(pdfs):
-        content = await f.read()
-        if not content:
-            raise HTTPException(status_code=400, detail=f"Uploaded file '{f.filename}' is empty")
-        filename = f.filename or f"soubor_{i+1}.pdf"
-        file_payloads.append((filename, content))
-        logger.info(f"File {i+1}: {filename} ({len(content)/1024:.1f}KB)")
-
-    import asyncio
-    
-    # Process all files concurrently using async
-    async def process_single_file(original_name: str, pdf_bytes: bytes):
-        logger.info(f"Starting processing of file: {original_name}")
-        
-        # First disambiguate what's in the file
-        info = await disambiguate_pdf_bytes_async(pdf_bytes)
-        present_types: list[str] = []
-        if info.get("rozvaha"):
-            present_types.append("rozvaha")
-        if info.get("vzz"):
-            present_types.append("vzz")
-        if not present_types:
-            logger.error(f"No statement types detected in {original_name}")
-            raise HTTPException(status_code=400, detail=f"Ve souboru '{original_name}' nebyl rozpoznán Rozvaha ani VZZ")
-
-        logger.info(f"File {original_name} contains: {present_types}")
-
-        # Determine max retries
-        max_retries = ocr_retries if ocr_retries is not None else config.get_ocr_max_retries()
-        if not isinstance(max_retries, int):
-            max_retries = config.get_ocr_max_retries()
-        if max_retries < 1:
-            max_retries = 1
-        if max_retries > 5:
-            max_retries = 5
-
-        # Process each statement type concurrently with retries
-        tasks = []
-        for st_type in present_types:
-            logger.debug(f"Creating task for {original_name} - {st_type} with up to {max_retries} OCR attempts")
-            tasks.append(ocr_and_validate_with_retries(pdf_bytes, st_type, tolerance, max_retries))
-        
-        logger.info(f"Processing {len(tasks)} statement types for {original_name}")
-        models = await asyncio.gather(*tasks)
-        
-        file_results = []
-        for st_type, result_obj in zip(present_types, models):
-            # result_obj is the dict from ocr_and_validate_with_retries
-            result_obj = dict(result_obj)
-            result_obj["original"] = original_name
-            result_obj["statement_type"] = st_type
-            result_obj["disambiguation_info"] = info
-            file_results.append(result_obj)
-            logger.debug(f"Completed {st_type} for {original_name} with status {result_obj.get('status')}")
-        
-        logger.info(f"Finished processing file: {original_name} ({len(file_results)} results)")
-        return file_results
-
-    # Process all files concurrently
-    logger.info(f"Starting concurrent processing of {len(file_payloads)} files")
-    file_tasks = [process_single_file(name, bytes_) for name, bytes_ in file_payloads]
-    file_results_lists = await asyncio.gather(*file_tasks)
-    
-    # Flatten the results
-    results = []
-    for file_results in file_results_lists:
-        results.extend(file_results)
-    
-    logger.info(f"All processing completed. Total results: {len(results)}")
-
-    if return_json:
-        # Return compact JSON summary
-        payload = [
-            {
-                "file": r.get("original"),
-                "statement_type": r.get("statement_type"),
-                "rok": getattr(r.get("model"), "rok", None) if r.get("model") is not None else (r.get("raw") or {}).get("rok"),
-                "rows": len(getattr(r.get("model"), "data", {})) if r.get("model") is not None else len((r.get("raw") or {}).get("data", {})),
-                "ocr_attempts": r.get("ocr_attempts", 1),
-                "status": r.get("status", "ok"),
-                "validation_errors_count": len(r.get("validation_errors") or []),
-            }
-            for r in results
-        ]
-        return JSONResponse(payload)
-
-    # Export using DCF template with Předmět ocenění sheet filled
+    options = resolve_options(tolerance, return_json, ocr_retries, ocr_parallel, extraction_mode)
+    uploads = await read_uploads(pdfs)
+    idempotency_key = request.headers.get("idempotency-key") or None
+    created = False
     try:
-        logger.info("Creating DCF template export")
-        
-        # Get disambiguation info from the latest balance sheet result
-        balance_sheets = [r for r in results if r["statement_type"] == "rozvaha"]
-        disambiguation_info = None
-        if balance_sheets:
-            latest_bs = max(balance_sheets, key=lambda x: getattr(x["model"], "rok", 0))
-            disambiguation_info = latest_bs.get("disambiguation_info")
-            year = getattr(latest_bs["model"], "rok", "")
-            filename = f"DCF_valuagent_{year}.xlsx"
-        else:
-            filename = "DCF_valuagent.xlsx"
-        
-        dcf_buffer = export_dcf_template(results, disambiguation_info, tolerance=tolerance)
-        
-        logger.info(f"Generated DCF template: {filename}")
-        return StreamingResponse(
-            dcf_buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
-        
-    except Exception as e:
-        logger.error(f"Failed to create DCF template: {e}", exc_info=True)
-        # Fallback to old behavior if DCF template fails
-        logger.info("Falling back to ZIP export due to DCF template error")
-        
-        # If only one Excel, return it directly for convenience
-        if len(results) == 1:
-            logger.info("Returning single Excel file (fallback)")
-            r0 = results[0]
-            st_type = r0["statement_type"]
-            model_obj = r0["model"]
-            excel_buffer = export_excel(st_type, model_obj)
-            safe_name = (r0["original"] or "valuagent").rsplit(".", 1)[0]
-            filename = f"{safe_name}_{st_type}_{model_obj.rok}.xlsx"
-            logger.info(f"Generated Excel file: {filename}")
-            return StreamingResponse(
-                excel_buffer,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={filename}"},
-            )
+        job, created = await get_job_manager().submit(get_session_id(request), uploads, options, idempotency_key)
+    except JobQueueFull as e:
+        logger.warning(f"Rejecting job: {e}")
+        raise HTTPException(status_code=503, detail="Server je přetížen, zkuste to prosím později.", headers={"Retry-After": "30"})
+    except IdempotencyConflict as e:
+        logger.warning(f"Rejecting job: {e}")
+        raise HTTPException(status_code=422, detail="Idempotency-Key již byl použit pro jiný požadavek.")
+    finally:
+        # A new job owns its uploads until it has run
+        if not created:
+            discard_all(uploads)
+    return JSONResponse(
+        {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "result_url": f"/jobs/{job.id}/result",
+        },
+        status_code=202 if created else 200,
+    )
+
+
+async def get_own_job(request: Request, job_id: str) -> Job:
+    # Jobs of other sessions are reported as missing
+    job = await get_job_manager().get(job_id)
+    if job is None or job.session_id != get_session_id(request):
+        raise HTTPException(status_code=404, detail="Úloha nenalezena")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    if not is_authenticated(request):
+        return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
+    return (await get_own_job(request, job_id)).to_status()
+
 
-        # Otherwise bundle into a ZIP
-        logger.info(f"Creating ZIP file with {len(results)} Excel files (fallback)")
-        zip_buf = io.BytesIO()
-        with zipfile.ZipFile(zip_buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for i, r in enumerate(results):
-                st_type = r["statement_type"]
-                model_obj = r["model"]
-                logger.debug(f"Generating Excel {i+1}/{len(results)}: {r['original']} - {st_type}")
-                excel_buffer = export_excel(st_type, model_obj)
-                safe_name = (r["original"] or "valuagent").rsplit(".", 1)[0]
-                arcname = f"{safe_name}_{st_type}_{model_obj.rok}.xlsx"
-                zf.writestr(arcname, excel_buffer.getvalue())
-        zip_buf.seek(0)
-
-        logger.info(f"ZIP file created with {len(results)} files, size: {zip_buf.getbuffer().nbytes/1024:.1f}KB")
-        return StreamingResponse(
-            zip_buf,
-            media_type="application/zip",
-            headers={"Content-Disposition": "attachment; filename=valuagent_results.zip"},
+@router.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-Sent Events stream of the job's progress; replays earlier events first and ends with job_done/job_failed."""
+    if not is_authenticated(request):
+        return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
+    job = await get_own_job(request, job_id)
+    # EventSource reconnects with the id of the last event it received
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    async def stream():
+        async for event in job.follow_events(start):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {event['id']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@router.get("/jobs/{job_id}/result")
+async def job_result(request: Request, job_id: str):
+    if not is_authenticated(request):
+        return JSONResponse({"detail": "Nejste přihlášeni."}, status_code=401)
+    job = await get_own_job(request, job_id)
+    if not job.finished:
+        return JSONResponse({"detail": "Úloha ještě není dokončena", "status": job.status}, status_code=409)
+    if job.status == "failed":
+        return JSONResponse({"detail": job.error, "status": job.status}, status_code=job.error_status)
+    if job.summary is not None:
+        return JSONResponse(job.summary)
+    content, media_type, filename = job.export
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 
 # Pretty login page (form-based)
 LOGIN_HTML = """
@@ -540,6 +657,7 @@ def login(request: Request, username: str = Form(...), password: str = Form(""))
     demo_pass = os.getenv("DEMO_PASSWORD", "")
     if username == demo_user and password == demo_pass:
         request.session["auth"] = True
+        request.session["sid"] = uuid.uuid4().hex
         return RedirectResponse(url="/", status_code=303)
     return HTMLResponse(LOGIN_HTML.replace("</form>", "<div class=\"error\">Neplatné přihlašovací údaje</div></form>"), status_code=401)
 
@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import os
 import sys
 import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import PlainTextResponse
@@ -71,7 +73,34 @@ from slowapi.util import get_remote_address  # type: ignore
 limiter = Limiter(key_func=get_remote_address, default_limits=["20/minute"])  # export for route decorators
 
 
-app = FastAPI(title="Valuagent API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from src.infrastructure.clients.genai_client import close_client_registry, init_client_registry
+    from src.infrastructure.clients.context_cache import close_context_cache
+    from src.infrastructure.clients.pdf_store import close_pdf_store
+    from src.infrastructure.exporters.dcf_pool import close_export_pool, preload_export_template
+    from src.infrastructure.pdf.slimming import close_slimming_pool
+    from src.infrastructure.uploads import remove_stale_spool_files
+    from src.services.jobs import close_job_manager, get_job_manager
+
+    # One pooled GenAI client registry shared by all requests
+    app.state.genai_clients = init_client_registry()
+    remove_stale_spool_files()
+    # Pick up jobs a previous process left unfinished
+    await get_job_manager().recover()
+    await preload_export_template()
+    yield
+    # Cancel running jobs first so their PDF handles are released through the normal cleanup
+    await close_job_manager()
+    # Delete PDF handles still registered (e.g. by cancelled requests) before closing clients
+    await close_pdf_store()
+    await close_context_cache()
+    await close_client_registry()
+    close_slimming_pool()
+    close_export_pool()
+
+
+app = FastAPI(title="Valuagent API", version="0.1.0", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(
     RateLimitExceeded, lambda request, exc: PlainTextResponse("Too Many Requests", 429)
@@ -113,4 +142,43 @@ app.include_router(router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+def _ocr_cache_stats() -> dict:
+    from src.infrastructure.cache import get_response_cache
+
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/stats")
+async def stats():
+    from src.infrastructure.clients.context_cache import get_context_cache
+    from src.infrastructure.clients.hedging import get_hedger
+    from src.infrastructure.clients.pdf_store import get_pdf_store
+    from src.infrastructure.clients.scheduler import get_scheduler
+    from src.infrastructure import config
+    from src.infrastructure.pdf.page_locator import page_locator_stats
+    from src.infrastructure.pdf.slimming import pdf_slimming_stats
+    from src.infrastructure.uploads import upload_stats
+    from src.services.ingestion import ingestion_stats
+    from src.services.jobs import get_job_manager
+
+    # Opening the cache and counting its entries are SQLite calls; keep them off the event loop
+    ocr_cache = await asyncio.to_thread(_ocr_cache_stats)
+    pdf_store = get_pdf_store()
+    context_cache = get_context_cache()
+    hedger = get_hedger()
+    return {
+        "ocr_cache": ocr_cache,
+        "pdf_uploads": pdf_store.stats() if pdf_store is not None else {"store": "inline"},
+        "context_cache": context_cache.stats() if context_cache is not None else {"enabled": False},
+        "llm_scheduler": get_scheduler().stats(),
+        "hedging": hedger.stats() if hedger is not None else {"enabled": False},
+        "page_locator": page_locator_stats.stats() if config.is_page_locator_enabled() else {"enabled": False},
+        "pdf_slimming": pdf_slimming_stats.stats(),
+        "uploads": upload_stats.stats(),
+        "ingestion": ingestion_stats.stats(),
+        "jobs": get_job_manager().stats(),
+    }
@@ -1,7 +1,22 @@
 from typing import Dict, List, Tuple, Optional
 from pydantic import BaseModel, Field, model_validator
 
-from src.domain.models.rules import PREDEFINED_VALIDATION_RULES, ValidationRule
+from src.domain.models.rules import BALANCE_SHEET_RULE_MATRIX, PREDEFINED_VALIDATION_RULES, ValidationRule, rule_violations
+from src.domain.models.violations import BRUTTO_KOREKCE, BRUTTO_KOREKCE_RULE_ID, Violation, ViolationError
+
+
+def brutto_korekce_violation(brutto: int, korekce: int, netto: int, tolerance: int, row_id: Optional[int] = None) -> Violation:
+    return Violation(
+        rule_id=BRUTTO_KOREKCE_RULE_ID,
+        kind=BRUTTO_KOREKCE,
+        column="netto",
+        target_row=row_id,
+        target_value=netto,
+        computed_value=brutto - abs(korekce),
+        tolerance=tolerance,
+        brutto=brutto,
+        korekce=korekce,
+    )
 
 
 class BalanceSheetRow(BaseModel):
@@ -20,12 +35,9 @@ class BalanceSheetRow(BaseModel):
                 tolerance = self.model_config['tolerance']
             elif info.context and 'tolerance' in info.context:
                 tolerance = info.context['tolerance']
-            difference = abs(self.netto - expected_netto)
-            if difference > tolerance:
-                raise ValueError(
-                    f"Brutto - Korekce validation failed: brutto ({self.brutto}) - korekce ({abs(self.korekce)}) = {expected_netto}, "
-                    f"but netto is {self.netto} (difference: {difference}, tolerance: {tolerance})"
-                )
+            if abs(self.netto - expected_netto) > tolerance:
+                # The row does not know its id; violations_from_error takes it from the error location
+                raise ViolationError([brutto_korekce_violation(self.brutto, self.korekce, self.netto, tolerance)])
         return self
 
     @classmethod
@@ -45,25 +57,24 @@ class BalanceSheet(BaseModel):
 
     @model_validator(mode='after')
     def validate_consistency(self, info):
-        errors = []
         tolerance = self.tolerance
         if tolerance == 0 and info.context and 'tolerance' in info.context:
             tolerance = info.context['tolerance']
             self.tolerance = tolerance
 
-        for rule in PREDEFINED_VALIDATION_RULES:
-            is_valid, error_msg = rule.validate_netto(self.data, tolerance=tolerance)
-            if not is_valid:
-                errors.append(error_msg)
-            # Also validate hierarchical rules for previous year column
-            is_valid_prev, error_msg_prev = rule.validate_netto_minule(self.data, tolerance=tolerance)
-            if not is_valid_prev:
-                errors.append(error_msg_prev)
-
-        if errors:
-            raise ValueError("Balance sheet validation failed:\n" + "\n".join(f"- {error}" for error in errors))
+        violations = self._rule_violations(tolerance)
+        if violations:
+            raise ViolationError(violations, "Balance sheet validation failed:")
         return self
 
+    def _rule_violations(self, tolerance: int) -> List[Violation]:
+        # All rules on both columns in one pass, reported by rule, then column
+        return rule_violations(PREDEFINED_VALIDATION_RULES, BALANCE_SHEET_RULE_MATRIX, self.data, ("netto", "netto_minule"), tolerance, by_rule=True)
+
+    def violations(self) -> List[Violation]:
+        """Rule violations of the current data at self.tolerance."""
+        return self._rule_violations(self.tolerance)
+
     def get_row_value(self, row_number: int, field: str = 'netto') -> int:
         if row_number in self.data:
             return getattr(self.data[row_number], field)
@@ -83,15 +94,14 @@ class BalanceSheet(BaseModel):
             f"Tolerance: {self.tolerance}",
             "",
         ]
-        all_valid = True
+        failed = {violation.rule_id: violation for violation in self.violations() if violation.column == "netto"}
+        all_valid = not failed
         for i, rule in enumerate(PREDEFINED_VALIDATION_RULES, 1):
             report.append(f"Rule {i}: Row {rule.target_row} = {' + '.join(str(r) for r in rule.source_rows)}")
-            is_valid, error_msg = rule.validate_netto(self.data, tolerance=self.tolerance)
-            status = "✓" if is_valid else "✗"
-            report.append(f"  Netto: {status}")
-            if not is_valid:
-                all_valid = False
-                report.append(f"    {error_msg}")
+            violation = failed.get(rule.rule_id)
+            report.append(f"  Netto: {'✗' if violation else '✓'}")
+            if violation:
+                report.append(f"    {violation.message()}")
             report.append("")
         report.append(f"Overall Status: {'✓ VALID' if all_valid else '✗ VALIDATION ERRORS'}")
         return "\n".join(report)
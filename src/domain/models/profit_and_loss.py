@@ -4,9 +4,13 @@ from pydantic import BaseModel, Field, model_validator
 from src.domain.models.rules import (
     PREDEFINED_PL_FLEXIBLE_RULES,
     PREDEFINED_PL_VALIDATION_RULES,
+    PROFIT_AND_LOSS_RULE_MATRIX,
+    PROFIT_AND_LOSS_RULES,
     FlexibleValidationRule,
     ValidationRule,
+    rule_violations,
 )
+from src.domain.models.violations import Violation, ViolationError
 
 
 class ProfitAndLossRow(BaseModel):
@@ -31,26 +35,21 @@ class ProfitAndLoss(BaseModel):
 
     @model_validator(mode='after')
     def validate_consistency(self, info):
-        errors = []
         tolerance = self.tolerance
         if tolerance == 0 and info.context and 'tolerance' in info.context:
             tolerance = info.context['tolerance']
             self.tolerance = tolerance
 
-        for field in ['současné', 'minulé']:
-            for rule in PREDEFINED_PL_VALIDATION_RULES:
-                is_valid, error_msg = rule.validate_profit_and_loss(self.data, field=field, tolerance=tolerance)
-                if not is_valid:
-                    errors.append(error_msg)
-            for flexible_rule in PREDEFINED_PL_FLEXIBLE_RULES:
-                is_valid, error_msg = flexible_rule.validate_profit_and_loss(self.data, field=field, tolerance=tolerance)
-                if not is_valid:
-                    errors.append(error_msg)
-
-        if errors:
-            raise ValueError("Profit and loss validation failed:\n" + "\n".join(f"- {error}" for error in errors))
+        # Hierarchical and flexible rules on both columns in one pass
+        violations = rule_violations(PROFIT_AND_LOSS_RULES, PROFIT_AND_LOSS_RULE_MATRIX, self.data, ('současné', 'minulé'), tolerance)
+        if violations:
+            raise ViolationError(violations, "Profit and loss validation failed:")
         return self
 
+    def violations(self) -> List[Violation]:
+        """Rule violations of the current data at self.tolerance."""
+        return rule_violations(PROFIT_AND_LOSS_RULES, PROFIT_AND_LOSS_RULE_MATRIX, self.data, ('současné', 'minulé'), self.tolerance)
+
     def get_row_value(self, row_number: int, field: str = 'současné') -> int:
         if row_number in self.data:
             return getattr(self.data[row_number], field)
@@ -77,45 +76,27 @@ class ProfitAndLoss(BaseModel):
             f"Tolerance: {self.tolerance}",
             "",
         ]
-        all_valid = True
+        failed = {(violation.rule_id, violation.column): violation for violation in self.violations()}
+        all_valid = not failed
         for field in ['současné', 'minulé']:
             report.append(f"Field: {field}")
             report.append("-" * 20)
-            for i, rule in enumerate(PREDEFINED_PL_VALIDATION_RULES, 1):
-                # FlexibleValidationRule has source_expressions, not source_rows
-                expression_parts = []
-                for row_number, operation in rule.source_expressions:
-                    op_symbol = "+" if operation > 0 else "-"
-                    if len(expression_parts) == 0 and operation > 0:
-                        expression_parts.append(str(row_number))
-                    else:
-                        expression_parts.append(f"{op_symbol}{row_number}")
-                expression_str = "".join(expression_parts)
-                report.append(f"Hierarchical Rule {i}: Row {rule.target_row} = {expression_str}")
-                is_valid, error_msg = rule.validate_profit_and_loss(self.data, field=field, tolerance=self.tolerance)
-                status = "✓" if is_valid else "✗"
-                report.append(f"  {field}: {status}")
-                if not is_valid:
-                    all_valid = False
-                    report.append(f"    {error_msg}")
-                report.append("")
-            for i, flexible_rule in enumerate(PREDEFINED_PL_FLEXIBLE_RULES, 1):
-                expression_parts = []
-                for row_number, operation in flexible_rule.source_expressions:
-                    op_symbol = "+" if operation > 0 else "-"
-                    if len(expression_parts) == 0 and operation > 0:
-                        expression_parts.append(str(row_number))
-                    else:
-                        expression_parts.append(f"{op_symbol}{row_number}")
-                expression_str = "".join(expression_parts)
-                report.append(f"Flexible Rule {i}: Row {flexible_rule.target_row} = {expression_str}")
-                is_valid, error_msg = flexible_rule.validate_profit_and_loss(self.data, field=field, tolerance=self.tolerance)
-                status = "✓" if is_valid else "✗"
-                report.append(f"  {field}: {status}")
-                if not is_valid:
-                    all_valid = False
-                    report.append(f"    {error_msg}")
-                report.append("")
+            for label, rules in (("Hierarchical Rule", PREDEFINED_PL_VALIDATION_RULES), ("Flexible Rule", PREDEFINED_PL_FLEXIBLE_RULES)):
+                for i, rule in enumerate(rules, 1):
+                    expression_parts = []
+                    for row_number, operation in rule.source_expressions:
+                        op_symbol = "+" if operation > 0 else "-"
+                        if len(expression_parts) == 0 and operation > 0:
+                            expression_parts.append(str(row_number))
+                        else:
+                            expression_parts.append(f"{op_symbol}{row_number}")
+                    expression_str = "".join(expression_parts)
+                    report.append(f"{label} {i}: Row {rule.target_row} = {expression_str}")
+                    violation = failed.get((rule.rule_id, field))
+                    report.append(f"  {field}: {'✗' if violation else '✓'}")
+                    if violation:
+                        report.append(f"    {violation.message()}")
+                    report.append("")
         report.append(f"Overall Status: {'✓ VALID' if all_valid else '✗ VALIDATION ERRORS'}")
         return "\n".join(report)
 
@@ -0,0 +1,94 @@
+"""Statement rules compiled into a signed sparse coefficient matrix.
+
+Every rule "target = sum of sign * source" is one row of a coefficient matrix
+over the statement row ids: +1 at the target, -sign at each source. Kept in
+COO form (rule index, row position, coefficient), sorted by rule, the
+residuals of all rules for all columns are a single gather, multiply and
+np.add.reduceat; stacks of statements go through a dense float64 copy and one
+matrix product instead. The residual of a rule is target - sources, with missing rows
+counting as 0, exactly as the per-rule validators compute it.
+"""
+from typing import Any, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# (target row, [(source row, +1 or -1), ...])
+RuleTerms = Tuple[int, Sequence[Tuple[int, int]]]
+
+
+class RuleMatrix:
+    """Signed sparse (COO) coefficient matrix of a rule set over statement row ids."""
+
+    def __init__(self, rules: Sequence[RuleTerms]):
+        self.rules = [(target, list(terms)) for target, terms in rules]
+        self.row_ids = sorted({target for target, _ in self.rules} | {row for _, terms in self.rules for row, _ in terms})
+        self.row_positions = {row: position for position, row in enumerate(self.row_ids)}
+
+        rule_indices, positions, coefficients = [], [], []
+        for rule_index, (target, terms) in enumerate(self.rules):
+            for row, coefficient in [(target, 1)] + [(row, -sign) for row, sign in terms]:
+                rule_indices.append(rule_index)
+                positions.append(self.row_positions[row])
+                coefficients.append(coefficient)
+        self.rule_indices = np.asarray(rule_indices, dtype=np.intp)
+        self.positions = np.asarray(positions, dtype=np.intp)
+        self.coefficients = np.asarray(coefficients, dtype=np.int64)
+        # Every rule has its target entry, so each rule owns a non-empty run of entries
+        self._starts = np.flatnonzero(np.r_[True, self.rule_indices[1:] != self.rule_indices[:-1]])
+        self.targets = self.positions[self._starts]
+
+        # Dense float64 copy for stacks of statements: one BLAS product instead of a gather per entry.
+        # Exact while every partial sum stays below 2**53, which the value bound guarantees.
+        self._dense = np.zeros((len(self.row_ids), len(self.rules)))
+        np.add.at(self._dense, (self.positions, self.rule_indices), self.coefficients)
+        terms_per_rule = int(np.diff(np.r_[self._starts, len(self.positions)]).max()) if len(self.positions) else 1
+        self._float_exact_limit = 2 ** 53 // terms_per_rule
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def values(self, data: Mapping[int, Any], fields: Sequence[str]) -> np.ndarray:
+        """(len(fields), rows) matrix of the statement's values; rows outside the rules are skipped."""
+        width = len(fields)
+        # One flat list converted at once; per-element numpy stores cost more than the whole product
+        flat = [0] * (len(self.row_ids) * width)
+        for row_id, row in data.items():
+            position = self.row_positions.get(row_id)
+            if position is not None:
+                offset = position * width
+                for i, field in enumerate(fields):
+                    flat[offset + i] = getattr(row, field) or 0
+        try:
+            matrix = np.fromiter(flat, dtype=np.int64, count=len(flat))
+        except OverflowError:
+            # Values outside int64 stay exact as Python ints; residuals then skip the float64 product
+            matrix = np.array(flat, dtype=object)
+        return matrix.reshape(-1, width).T
+
+    def residuals(self, values: np.ndarray) -> np.ndarray:
+        """target - sources of every rule along the last axis; leading axes (columns, statements) are kept."""
+        limit = self._float_exact_limit
+        if values.dtype != object and values.size > len(self.row_ids) * 2 and values.max() < limit and values.min() > -limit:
+            return (values @ self._dense).astype(np.int64)
+        return np.add.reduceat(values[..., self.positions] * self.coefficients, self._starts, axis=-1)
+
+    def violations(self, values: np.ndarray, tolerance: int) -> np.ndarray:
+        """Boolean mask of the rules whose residual exceeds the tolerance."""
+        return np.abs(self.residuals(values)) > tolerance
+
+    def failures(self, values: np.ndarray, tolerance: int) -> list[tuple[int, int, int, int]]:
+        """(column, rule index, target value, computed value) of every violation in a (columns, rows) matrix.
+
+        Ordered by column, then rule; the computed value is the signed sum of the rule's sources.
+        """
+        residuals = self.residuals(values)
+        columns, rules = np.nonzero(np.abs(residuals) > tolerance)
+        targets = values[columns, self.targets[rules]]
+        computed = targets - residuals[columns, rules]
+        return list(zip(columns.tolist(), rules.tolist(), targets.tolist(), computed.tolist()))
+
+    def failing_rows(self, values: np.ndarray, tolerance: int) -> set[int]:
+        """Target and source rows of every rule violated in any column."""
+        violated = self.violations(values, tolerance)
+        violated = violated.reshape(-1, len(self.rules)).any(axis=0)
+        return {self.row_ids[p] for p in self.positions[violated[self.rule_indices]]}
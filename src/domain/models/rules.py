@@ -1,35 +1,41 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Collection, Dict, List, Tuple, Optional
 from pydantic import BaseModel, Field
 
+from src.domain.models.rule_matrix import RuleMatrix
+from src.domain.models.violations import EXPRESSION_RULE, SUM_RULE, Violation
+
 
 class ValidationRule(BaseModel):
     """Represents a validation rule for balance sheet consistency."""
     target_row: int = Field(..., description="Target row number (left side of equation)")
     source_rows: List[int] = Field(..., description="Source row numbers (right side of equation)")
+    rule_id: str = Field(default="custom", description="Stable id reported in violations")
 
     def validate_netto(self, balance_data: Dict[int, "BalanceSheetRow"], tolerance: int = 0) -> Tuple[bool, str]:
-        target_value = balance_data.get(self.target_row, None).netto if self.target_row in balance_data else 0
-        source_sum = sum(balance_data[s].netto for s in self.source_rows if s in balance_data)
-        difference = abs(target_value - source_sum)
-        if difference <= tolerance:
-            return True, ""
-        return False, (
-            f"Rule validation failed for netto: Row {self.target_row} ({target_value}) != "
-            f"Sum of rows {'+'.join(str(row) for row in self.source_rows)} ({source_sum}) "
-            f"(difference: {difference}, tolerance: {tolerance})"
-        )
+        return self._validate_field(balance_data, "netto", tolerance)
 
     def validate_netto_minule(self, balance_data: Dict[int, "BalanceSheetRow"], tolerance: int = 0) -> Tuple[bool, str]:
         """Validate the same hierarchical rules but on the previous-year column (netto_minule)."""
-        target_value = balance_data.get(self.target_row, None).netto_minule if self.target_row in balance_data else 0
-        source_sum = sum(balance_data[s].netto_minule for s in self.source_rows if s in balance_data)
-        difference = abs(target_value - source_sum)
-        if difference <= tolerance:
+        return self._validate_field(balance_data, "netto_minule", tolerance)
+
+    def _validate_field(self, balance_data: Dict[int, "BalanceSheetRow"], field: str, tolerance: int) -> Tuple[bool, str]:
+        target_value = getattr(balance_data[self.target_row], field) if self.target_row in balance_data else 0
+        source_sum = sum(getattr(balance_data[s], field) for s in self.source_rows if s in balance_data)
+        if abs(target_value - source_sum) <= tolerance:
             return True, ""
-        return False, (
-            f"Rule validation failed for netto_minule: Row {self.target_row} ({target_value}) != "
-            f"Sum of rows {'+'.join(str(row) for row in self.source_rows)} ({source_sum}) "
-            f"(difference: {difference}, tolerance: {tolerance})"
+        return False, self.violation(field, target_value, source_sum, tolerance, balance_data).message()
+
+    def violation(self, field: str, target_value: int, source_sum: int, tolerance: int, present_rows: Collection[int]) -> Violation:
+        return Violation(
+            rule_id=self.rule_id,
+            kind=SUM_RULE,
+            column=field,
+            target_row=self.target_row,
+            target_value=target_value,
+            computed_value=source_sum,
+            tolerance=tolerance,
+            source_terms=tuple((row, 1) for row in self.source_rows),
+            missing_rows=tuple(row for row in self.source_rows if row not in present_rows),
         )
 
 
@@ -37,28 +43,31 @@ class FlexibleValidationRule(BaseModel):
     """Represents a flexible validation rule that can handle addition and subtraction."""
     target_row: int = Field(..., description="Target row number (left side of equation)")
     source_expressions: List[Tuple[int, int]] = Field(..., description="List of (row_number, operation) where operation is +1 or -1")
+    rule_id: str = Field(default="custom", description="Stable id reported in violations")
 
     def validate_profit_and_loss(self, pl_data: Dict[int, "ProfitAndLossRow"], field: str = 'současné', tolerance: int = 0) -> Tuple[bool, str]:
         target_value = getattr(pl_data[self.target_row], field) if self.target_row in pl_data else 0
-        calculated_value = 0
-        expression_parts: List[str] = []
-        for row_number, operation in self.source_expressions:
-            if row_number in pl_data:
-                row_value = getattr(pl_data[row_number], field)
-                calculated_value += row_value * operation
-                op_symbol = "+" if operation > 0 else "-"
-                if len(expression_parts) == 0 and operation > 0:
-                    expression_parts.append(str(row_number))
-                else:
-                    expression_parts.append(f"{op_symbol}{row_number}")
-
-        difference = abs(target_value - calculated_value)
-        if difference <= tolerance:
+        calculated_value = sum(
+            getattr(pl_data[row_number], field) * operation
+            for row_number, operation in self.source_expressions
+            if row_number in pl_data
+        )
+        if abs(target_value - calculated_value) <= tolerance:
             return True, ""
-        expression_str = "".join(expression_parts)
-        return False, (
-            f"Flexible rule validation failed for {field}: Row {self.target_row} ({target_value}) != "
-            f"{expression_str} ({calculated_value}) (difference: {difference}, tolerance: {tolerance})"
+        return False, self.violation(field, target_value, calculated_value, tolerance, pl_data).message()
+
+    def violation(self, field: str, target_value: int, calculated_value: int, tolerance: int, present_rows: Collection[int]) -> Violation:
+        """present_rows are the statement's row ids (or its data); the message lists only those sources."""
+        return Violation(
+            rule_id=self.rule_id,
+            kind=EXPRESSION_RULE,
+            column=field,
+            target_row=self.target_row,
+            target_value=target_value,
+            computed_value=calculated_value,
+            tolerance=tolerance,
+            source_terms=tuple((row, operation) for row, operation in self.source_expressions),
+            missing_rows=tuple(row for row, _ in self.source_expressions if row not in present_rows),
         )
 
 
@@ -100,9 +109,12 @@ def generate_profit_and_loss_validation_rules() -> list:
 def _generate_predefined_rules():
     try:
         rules_data = generate_validation_rules()
-        return [ValidationRule(target_row=target, source_rows=sources) for target, sources in rules_data]
+        return [
+            ValidationRule(rule_id=f"rozvaha:R{i}", target_row=target, source_rows=sources)
+            for i, (target, sources) in enumerate(rules_data, 1)
+        ]
     except Exception:
-        return [ValidationRule(target_row=1, source_rows=[78])]
+        return [ValidationRule(rule_id="rozvaha:R1", target_row=1, source_rows=[78])]
 
 
 PREDEFINED_VALIDATION_RULES = _generate_predefined_rules()
@@ -112,8 +124,8 @@ def _generate_predefined_pl_rules():
     try:
         rules_data = generate_profit_and_loss_validation_rules()
         # Convert to FlexibleValidationRule with positive operations for all source rows
-        return [FlexibleValidationRule(target_row=target, source_expressions=[(row, 1) for row in sources]) 
-                for target, sources in rules_data]
+        return [FlexibleValidationRule(rule_id=f"vzz:R{i}", target_row=target, source_expressions=[(row, 1) for row in sources])
+                for i, (target, sources) in enumerate(rules_data, 1)]
     except Exception:
         return []
 
@@ -121,10 +133,11 @@ def _generate_predefined_pl_rules():
 PREDEFINED_PL_VALIDATION_RULES = _generate_predefined_pl_rules()
 
 PREDEFINED_PL_FLEXIBLE_RULES = [
-    FlexibleValidationRule(target_row=49, source_expressions=[(30, 1), (48, 1)]),
-    FlexibleValidationRule(target_row=53, source_expressions=[(49, 1), (50, -1)]),
-    FlexibleValidationRule(target_row=55, source_expressions=[(53, 1), (54, -1)]),
+    FlexibleValidationRule(rule_id="vzz:F1", target_row=49, source_expressions=[(30, 1), (48, 1)]),
+    FlexibleValidationRule(rule_id="vzz:F2", target_row=53, source_expressions=[(49, 1), (50, -1)]),
+    FlexibleValidationRule(rule_id="vzz:F3", target_row=55, source_expressions=[(53, 1), (54, -1)]),
     FlexibleValidationRule(
+        rule_id="vzz:F4",
         target_row=48,
         source_expressions=[
             (31, 1),
@@ -139,6 +152,7 @@ PREDEFINED_PL_FLEXIBLE_RULES = [
         ],
     ),
     FlexibleValidationRule(
+        rule_id="vzz:F5",
         target_row=30,
         source_expressions=[
             (1, 1),
@@ -154,4 +168,19 @@ PREDEFINED_PL_FLEXIBLE_RULES = [
     ),
 ]
 
-
+# All rules compiled once; the models evaluate them in one pass and only format the violated ones
+BALANCE_SHEET_RULE_MATRIX = RuleMatrix(
+    [(rule.target_row, [(row, 1) for row in rule.source_rows]) for rule in PREDEFINED_VALIDATION_RULES]
+)
+PROFIT_AND_LOSS_RULES = PREDEFINED_PL_VALIDATION_RULES + PREDEFINED_PL_FLEXIBLE_RULES
+PROFIT_AND_LOSS_RULE_MATRIX = RuleMatrix([(rule.target_row, rule.source_expressions) for rule in PROFIT_AND_LOSS_RULES])
+
+
+def rule_violations(
+    rules: list, matrix: RuleMatrix, data: Dict[int, BaseModel], fields: Tuple[str, ...], tolerance: int, by_rule: bool = False
+) -> List[Violation]:
+    """Violations of the compiled rules on one statement's rows, ordered by column, then rule (or by rule, then column)."""
+    failures = matrix.failures(matrix.values(data, fields), tolerance)
+    if by_rule:
+        failures.sort(key=lambda failure: failure[1])
+    return [rules[i].violation(fields[column], target_value, computed_value, tolerance, data) for column, i, target_value, computed_value in failures]
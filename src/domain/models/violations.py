@@ -0,0 +1,167 @@
+"""Structured results of the statement consistency checks.
+
+The rules and the brutto - korekce row check report a Violation per failed
+check instead of a text. The English messages of the models' errors, the Czech
+messages for finance users, the "Kvalita dat" sheet and the JSON API are all
+produced from these records. The models raise ViolationError, a ValueError
+that keeps its violations; violations_from_error collects them back out of a
+pydantic ValidationError, with the row id of row-level failures filled in from
+the error location.
+"""
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
+
+from src.shared import utils
+
+# Kinds of checks
+SUM_RULE = "sum"  # target = sum of the source rows (balance sheet)
+EXPRESSION_RULE = "expression"  # target = signed sum of the source rows (profit and loss)
+BRUTTO_KOREKCE = "brutto_korekce"  # netto = brutto - |korekce| within a balance-sheet row
+
+BRUTTO_KOREKCE_RULE_ID = "rozvaha:brutto-korekce"
+
+
+@dataclass(frozen=True)
+class Violation:
+    """One failed check: target_value differs from computed_value by more than the tolerance.
+
+    source_terms are the rule's (row, +1/-1) terms, missing_rows those of its
+    source rows the statement does not have (they count as 0). Row checks have
+    no source terms; they carry brutto and korekce and compute brutto - |korekce|.
+    """
+
+    rule_id: str
+    kind: str
+    column: str
+    target_row: Optional[int]
+    target_value: int
+    computed_value: int
+    tolerance: int
+    source_terms: tuple[tuple[int, int], ...] = ()
+    missing_rows: tuple[int, ...] = ()
+    brutto: Optional[int] = None
+    korekce: Optional[int] = None
+
+    @property
+    def difference(self) -> int:
+        return abs(self.target_value - self.computed_value)
+
+    def present_terms(self) -> list[tuple[int, int]]:
+        return [(row, sign) for row, sign in self.source_terms if row not in self.missing_rows]
+
+    def message(self) -> str:
+        """The English message of the models' validation errors."""
+        if self.kind == BRUTTO_KOREKCE:
+            return (
+                f"Brutto - Korekce validation failed: brutto ({self.brutto}) - korekce ({abs(self.korekce)}) = {self.computed_value}, "
+                f"but netto is {self.target_value} (difference: {self.difference}, tolerance: {self.tolerance})"
+            )
+        if self.kind == SUM_RULE:
+            return (
+                f"Rule validation failed for {self.column}: Row {self.target_row} ({self.target_value}) != "
+                f"Sum of rows {'+'.join(str(row) for row, _ in self.source_terms)} ({self.computed_value}) "
+                f"(difference: {self.difference}, tolerance: {self.tolerance})"
+            )
+        expression_parts: list[str] = []
+        for row, sign in self.present_terms():
+            if not expression_parts and sign > 0:
+                expression_parts.append(str(row))
+            else:
+                expression_parts.append(f"{'+' if sign > 0 else '-'}{row}")
+        return (
+            f"Flexible rule validation failed for {self.column}: Row {self.target_row} ({self.target_value}) != "
+            f"{''.join(expression_parts)} ({self.computed_value}) (difference: {self.difference}, tolerance: {self.tolerance})"
+        )
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["source_terms"] = [list(term) for term in self.source_terms]
+        data["missing_rows"] = list(self.missing_rows)
+        data["difference"] = self.difference
+        data["message"] = self.message()
+        return data
+
+
+class ViolationError(ValueError):
+    """Validation failure carrying its violations; str() is the header and one message per line."""
+
+    def __init__(self, violations: list[Violation], header: Optional[str] = None):
+        self.violations = violations
+        messages = [violation.message() for violation in violations]
+        if header is None:
+            super().__init__("\n".join(messages))
+        else:
+            super().__init__(header + "\n" + "\n".join(f"- {message}" for message in messages))
+
+
+def violations_from_error(error: Exception) -> tuple[list[Violation], list[str]]:
+    """The violations of a failed validation and the texts of its other errors (types, missing fields)."""
+    if isinstance(error, ViolationError):
+        return list(error.violations), []
+    if not hasattr(error, "errors"):
+        return [], [str(error)]
+    violations: list[Violation] = []
+    other: list[str] = []
+    for detail in error.errors():
+        cause = (detail.get("ctx") or {}).get("error")
+        if isinstance(cause, ViolationError):
+            row_id = _row_of(detail.get("loc") or ())
+            violations.extend(
+                replace(violation, target_row=row_id) if violation.target_row is None else violation
+                for violation in cause.violations
+            )
+        else:
+            location = ".".join(str(part) for part in detail.get("loc") or ())
+            other.append(f"{location}: {detail.get('msg')}" if location else str(detail.get("msg")))
+    return violations, other
+
+
+def _row_of(loc: tuple) -> Optional[int]:
+    """Row id of a ('data', row, ...) error location."""
+    if len(loc) >= 2 and loc[0] == "data":
+        try:
+            return int(loc[1])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+COLUMN_LABELS_CZ = {"netto_minule": "sl. minulé", "současné": "současné", "minulé": "minulé"}
+
+
+def format_violation_cz(violation: Violation, statement_type: str, row_names: Optional[dict[int, str]] = None) -> str:
+    """Short Czech message of a violation for finance users (e.g. in Excel)."""
+    if row_names is None:
+        row_names = row_names_for(statement_type)
+    statement_label = "Rozvaha" if statement_type == "rozvaha" else "Výsledovka"
+
+    def with_row(row: Optional[int]) -> str:
+        return f"ř. {row} ({row_names.get(row, str(row))})" if row is not None else "řádek ?"
+
+    if violation.kind == BRUTTO_KOREKCE:
+        message = (
+            f"{statement_label}, {with_row(violation.target_row)}: brutto {violation.brutto} − korekce {abs(violation.korekce)} "
+            f"= {violation.computed_value}, ale netto je {violation.target_value}"
+        )
+    else:
+        column = COLUMN_LABELS_CZ.get(violation.column)
+        target = f"{with_row(violation.target_row)}{f' ({column})' if column else ''} {violation.target_value}"
+        if violation.kind == SUM_RULE:
+            sources = ", ".join(with_row(row) for row, _ in violation.source_terms)
+            message = f"{statement_label}, {target} ≠ součet {sources} {violation.computed_value}"
+        else:
+            expression = ""
+            for row, sign in violation.present_terms():
+                if not expression:
+                    expression = with_row(row) if sign > 0 else f"− {with_row(row)}"
+                else:
+                    expression += f" {'+' if sign > 0 else '−'} {with_row(row)}"
+            message = f"{statement_label}, {target} ≠ {expression} {violation.computed_value}"
+    return f"{message}. Rozdíl {violation.difference} > tolerance {violation.tolerance}."
+
+
+def row_names_for(statement_type: str) -> dict[int, str]:
+    if statement_type == "rozvaha":
+        return utils.load_balance_sheet_row_names()
+    return utils.load_profit_and_loss_row_names()
+
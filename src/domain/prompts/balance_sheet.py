@@ -52,3 +52,43 @@ Formát:
 """).safe_substitute(balance_sheet_index=BALANCE_SHEET_INDEX)
 
 
+
+
+balance_sheet_subtree_ocr_template = Template("""
+Najdi v přiloženém PDF účetní rozvahu.
+Předchozí vytěžení neprošlo kontrolou součtů, vytěž proto znovu pouze následující položky:
+Označení Položka
+${balance_sheet_rows}
+
+Každá položka je sumou položek o jeden indent hlouběji.
+
+Pokud položka v rozvaze chybí, vrať hodnoty 0.
+V některých případech může být položka označena například zkratkou nebo synonymem.
+Dej pozor na správné znaménko u jednotlivých položek. Kladná čísla vracej jako kladná, záporná čísla vracej jako záporná.
+Dej pozor v jakých jednotkách je výkaz vyjádřen. Použij stejné jednotky ve výstupu.
+
+Ke každé aktivní položce potřebujeme Brutto, Korekce, Netto a Netto v minulém období.
+Pasivní položky jsou udávany pouze jedním stavem (Netto), potřebujeme tedy extrahovat Netto a Netto v minulém období.
+
+Vracíš pouze json, nic jiného, a pouze s výše uvedenými položkami.
+Jednotlivé položky označuj podle číselného sloupečku "Označení"
+Formát:
+{
+    "rok": 2024,
+    "data": {
+        "37": {
+            "brutto": 100000,
+            "korekce": 10000,
+            "netto": 90000,
+            "netto_minule": 80000
+        },
+        ...
+    }
+}
+""")
+
+
+def balance_sheet_subtree_ocr_instructions(row_ids: set[int]) -> str:
+    """Prompt re-extracting only the given rows (e.g. those of failing rules)."""
+    rows = utils.index_to_string(utils.read_balance_sheet_index(), include=set(row_ids))
+    return balance_sheet_subtree_ocr_template.safe_substitute(balance_sheet_rows=rows)
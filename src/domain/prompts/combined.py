@@ -0,0 +1,73 @@
+from string import Template
+
+from src.domain.prompts.balance_sheet import BALANCE_SHEET_INDEX
+from src.domain.prompts.profit_and_loss import PROFIT_AND_LOSS_INDEX
+
+
+combined_extraction_instructions = Template("""
+Přečti přiložené PDF.
+
+Identifikuj, zda obsahuje Rozvahu a Výkaz zisku a ztráty. Může obsahovat obojí.
+Dále identifikuj datum za ke kterému jsou výkazy vydány.
+
+Pokud PDF obsahuje Rozvahu, indentifikuj její jednotlivé položky.
+Existují následující položky Rozvahy:
+Označení Položka
+${balance_sheet_index}
+
+Ke každé aktivní položce Rozvahy potřebujeme Brutto, Korekce, Netto a Netto v minulém období.
+Pasivní položky jsou udávany pouze jedním stavem (Netto), potřebujeme tedy extrahovat Netto a Netto v minulém období.
+
+Pokud PDF obsahuje Výkaz zisku a ztráty, indentifikuj jeho jednotlivé položky.
+Existují následující položky Výkazu zisku a ztráty:
+Označení Položka
+${profit_and_loss_index}
+
+Ke každé položce Výkazu zisku a ztráty potřebujeme současné a minulé období.
+
+Každá položka je sumou položek o jeden indent hlouběji.
+Některé položky můžou ve výkazu chybět, pokud tomu tak je, vrať hodnoty 0.
+V některých případech může být položka označena například zkratkou nebo synonymem.
+Dej pozor na správné znaménko u jednotlivých položek. Kladná čísla vracej jako kladná, záporná čísla vracej jako záporná.
+Dej pozor v jakých jednotkách je výkaz vyjádřen. Použij stejné jednotky ve výstupu.
+
+Vracíš pouze json, nic jiného.
+Jednotlivé položky označuj podle číselného sloupečku "Označení".
+Výkaz, který v PDF není, vrať jako null.
+Formát:
+{
+    "rozvaha": true, # true nebo false
+    "výkaz_zisku_a_ztráty": true, # true nebo false
+    "datum": "2024-01-01", # datum ve formátu YYYY-MM-DD
+    "rozvaha_data": {
+        "rok": 2024,
+        "data": {
+            "1": {
+                "brutto": 100000,
+                "korekce": 10000,
+                "netto": 90000,
+                "netto_minule": 80000
+            },
+            ...
+            "78": {
+                "netto": 90000,
+                "netto_minule": 80000
+            },
+            ...
+        }
+    },
+    "vzz_data": {
+        "rok": 2024,
+        "data": {
+            "1": {
+                "současné": 100000,
+                "minulé": 80000
+            },
+            ...
+        }
+    }
+}
+""").safe_substitute(
+    balance_sheet_index=BALANCE_SHEET_INDEX,
+    profit_and_loss_index=PROFIT_AND_LOSS_INDEX,
+)
@@ -40,3 +40,37 @@ Formát:
 """).safe_substitute(profit_and_loss_index=PROFIT_AND_LOSS_INDEX)
 
 
+
+
+profit_and_loss_subtree_ocr_template = Template("""
+Najdi v přiloženém PDF účetní výkaz zisku a ztráty.
+Předchozí vytěžení neprošlo kontrolou součtů, vytěž proto znovu pouze následující položky:
+Označení Položka
+${profit_and_loss_rows}
+
+Každá položka je sumou položek o jeden indent hlouběji.
+Dej pozor na správné znaménko u jednotlivých položek. Kladná čísla vracej jako kladná, záporná čísla vracej jako záporná.
+Dej pozor v jakých jednotkách je výkaz vyjádřen. Použij stejné jednotky ve výstupu.
+
+Pokud položka ve výkazu zisku a ztráty chybí, vrať hodnoty 0.
+Ke každé položce potřebujeme současné a minulé období.
+
+Vracíš pouze json, nic jiného, a pouze s výše uvedenými položkami.
+Formát:
+{
+    "rok": 2024,
+    "data": {
+        "30": {
+            "současné": 100000,
+            "minulé": 80000
+        },
+        ...
+    }
+}
+""")
+
+
+def profit_and_loss_subtree_ocr_instructions(row_ids: set[int]) -> str:
+    """Prompt re-extracting only the given rows (e.g. those of failing rules)."""
+    rows = utils.index_to_string(utils.read_profit_and_loss_index(), include=set(row_ids))
+    return profit_and_loss_subtree_ocr_template.safe_substitute(profit_and_loss_rows=rows)
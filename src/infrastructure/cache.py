@@ -0,0 +1,201 @@
+"""Content-addressed cache for model responses.
+
+Entries are keyed by the SHA-256 of the PDF bytes, the SHA-256 of the prompt
+text and the model name, so re-uploading the same report with the same prompt
+and model is answered locally instead of by Gemini. There are two tiers: an
+in-memory LRU in front of a persistent SQLite file with TTL and size eviction.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+from src.infrastructure import config
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_hex(data: Union[bytes, str]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(pdf_sha256: str, prompt: str, model: str) -> str:
+    """Build the cache key from the PDF hash, the prompt hash and the model name."""
+    return f"{model}:{sha256_hex(prompt)}:{pdf_sha256}"
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of raw model responses."""
+
+    def __init__(self, path: str, memory_entries: int = 128, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+        logger.info(f"Response cache opened at {path} (memory entries: {memory_entries}, max size: {max_bytes/1024/1024:.0f}MB, TTL: {ttl_seconds}s)")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._hits_memory += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._evictions += 1
+                self._misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, value, created_at)
+            self._hits_disk += 1
+            return value
+
+    def _put_sync(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._writes += 1
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float) -> None:
+        if self.ttl_seconds > 0:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._evictions += max(cursor.rowcount, 0)
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under the size limit
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            self._evictions += 1
+
+    def _invalidate_sync(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def put(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._put_sync, key, value)
+
+    async def invalidate(self, key: str) -> None:
+        await asyncio.to_thread(self._invalidate_sync, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            hits = self._hits_memory + self._hits_disk
+            lookups = hits + self._misses
+            return {
+                "enabled": True,
+                "hits": hits,
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "writes": self._writes,
+                "evictions": self._evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": entries,
+                "disk_bytes": total,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_unavailable = False
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled or the cache could not be opened."""
+    global _response_cache, _response_cache_unavailable
+    if not config.is_ocr_cache_enabled() or _response_cache_unavailable:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            try:
+                _response_cache = ResponseCache(
+                    path=config.get_ocr_cache_path(),
+                    memory_entries=config.get_ocr_cache_memory_entries(),
+                    max_bytes=config.get_ocr_cache_max_mb() * 1024 * 1024,
+                    ttl_seconds=config.get_ocr_cache_ttl_hours() * 3600,
+                )
+            except (OSError, sqlite3.Error) as e:
+                # Remembered so that every later lookup (and /stats) does not retry the open
+                _response_cache_unavailable = True
+                logger.warning(f"Response cache unavailable, continuing without it: {e}")
+                return None
+        return _response_cache
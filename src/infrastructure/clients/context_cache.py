@@ -0,0 +1,218 @@
+"""Explicit Gemini context caching for the large static OCR prompts.
+
+The OCR prompts embed the full statement index and are identical for every
+call, so they are stored once per (API key, model, prompt) as cached content
+and requests only send the PDF on top of it. Callers opt in per prompt;
+dynamic prompts such as the subtree retries are never cached. Handles are refreshed shortly
+before they expire; prompts the model refuses to cache (e.g. below the
+minimum token count) fall back to being sent inline. Creation failures that
+may be transient (quota, server errors) are only retried after a short backoff.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from src.infrastructure import config
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+# Statuses of a request whose cached content is gone (deleted, expired) or not usable with it
+STALE_CACHE_STATUSES = {"NOT_FOUND", "INVALID_ARGUMENT", "FAILED_PRECONDITION", "PERMISSION_DENIED"}
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Whether caching the prompt can never work, e.g. it is below the minimum token count or the model does not support caching."""
+    return isinstance(error, genai_errors.ClientError) and error.code in (400, 404)
+
+
+def is_stale_cache_error(error: Exception, name: str) -> bool:
+    """Whether a request failed because of its cached content (and not because of quota, the server or the input)."""
+    if not isinstance(error, genai_errors.ClientError) or error.status not in STALE_CACHE_STATUSES:
+        return False
+    message = str(error.message or error).lower()
+    return name.lower() in message or "cachedcontent" in message or "cached content" in message
+
+
+@dataclass
+class CachedPrompt:
+    name: str
+    expires_at: float
+
+
+class ContextCacheManager:
+    """Creates, refreshes and tracks cached-content handles for static prompts."""
+
+    def __init__(
+        self, ttl_seconds: int = 3600, refresh_margin_seconds: int = 300, min_prompt_chars: int = 2000, failure_backoff_seconds: int = 60
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_prompt_chars = min_prompt_chars
+        self._entries: Dict[CacheKey, CachedPrompt] = {}
+        # Keys whose creation failed, mapped to when creation may be attempted again
+        self._unsupported: Dict[CacheKey, float] = {}
+        self._locks: Dict[CacheKey, asyncio.Lock] = {}
+        self._clients: Dict[CacheKey, genai.Client] = {}
+        self.creations = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.hits = 0
+        self.calls_cached = 0
+        self.calls_uncached = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.seconds_cached = 0.0
+        self.seconds_uncached = 0.0
+
+    @staticmethod
+    def _key(api_key: str, model: str, prompt: str) -> CacheKey:
+        api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return (api_key_hash, model, prompt_hash)
+
+    async def get_cached_content(self, client: genai.Client, api_key: str, model: str, prompt: str) -> Optional[str]:
+        """Return the cached-content name for prompt, creating or refreshing it as needed."""
+        if len(prompt) < self.min_prompt_chars:
+            return None
+        key = self._key(api_key, model, prompt)
+        if self._unsupported.get(key, 0.0) > time.time():
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at - time.time() > self.refresh_margin_seconds:
+            self.hits += 1
+            return entry.name
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is not None and entry.expires_at - now > self.refresh_margin_seconds:
+                self.hits += 1
+                return entry.name
+
+            ttl = f"{self.ttl_seconds}s"
+            if entry is not None and entry.expires_at > now:
+                try:
+                    await client.aio.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(ttl=ttl))
+                    entry.expires_at = now + self.ttl_seconds
+                    self.refreshes += 1
+                    logger.info(f"Refreshed cached prompt {entry.name} for model {model}")
+                    return entry.name
+                except Exception as e:
+                    logger.warning(f"Refreshing cached prompt {entry.name} failed, recreating: {e}")
+
+            try:
+                cached = await client.aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt)])],
+                        ttl=ttl,
+                        display_name=f"valuagent-{key[2][:12]}",
+                    ),
+                )
+            except Exception as e:
+                self.failures += 1
+                permanent = is_permanent_error(e)
+                self._unsupported[key] = now + (self.ttl_seconds if permanent else self.failure_backoff_seconds)
+                self._entries.pop(key, None)
+                logger.warning(
+                    f"Context caching {'unavailable' if permanent else 'failed'} for model {model} (prompt {key[2][:12]}), "
+                    f"sending prompt inline for {self.ttl_seconds if permanent else self.failure_backoff_seconds}s: {e}"
+                )
+                return None
+
+            expires_at = cached.expire_time.timestamp() if cached.expire_time is not None else now + self.ttl_seconds
+            self._entries[key] = CachedPrompt(name=cached.name, expires_at=expires_at)
+            self._clients[key] = client
+            self.creations += 1
+            token_count = getattr(cached.usage_metadata, "total_token_count", None)
+            logger.info(f"Created cached prompt {cached.name} for model {model} ({token_count} tokens)")
+            return cached.name
+
+    async def discard(self, name: str) -> None:
+        """Forget the handle and delete it server-side so that it is not billed until its TTL runs out."""
+        for key, entry in list(self._entries.items()):
+            if entry.name != name:
+                continue
+            del self._entries[key]
+            client = self._clients.pop(key, None)
+            if client is None:
+                continue
+            try:
+                await client.aio.caches.delete(name=name)
+            except Exception as e:
+                logger.warning(f"Failed to delete cached prompt {name}: {e}")
+
+    def record_call(self, cached: bool, usage_metadata, seconds: float) -> None:
+        if cached:
+            self.calls_cached += 1
+            self.seconds_cached += seconds
+        else:
+            self.calls_uncached += 1
+            self.seconds_uncached += seconds
+        if usage_metadata is not None:
+            self.prompt_tokens += usage_metadata.prompt_token_count or 0
+            self.cached_tokens += usage_metadata.cached_content_token_count or 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "active_handles": len(self._entries),
+            "creations": self.creations,
+            "refreshes": self.refreshes,
+            "hits": self.hits,
+            "failures": self.failures,
+            "calls_cached": self.calls_cached,
+            "calls_uncached": self.calls_uncached,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "avg_seconds_cached": round(self.seconds_cached / self.calls_cached, 2) if self.calls_cached else None,
+            "avg_seconds_uncached": round(self.seconds_uncached / self.calls_uncached, 2) if self.calls_uncached else None,
+        }
+
+    async def aclose(self) -> None:
+        for key, entry in list(self._entries.items()):
+            client = self._clients.get(key)
+            if client is None:
+                continue
+            try:
+                await client.aio.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete cached prompt {entry.name}: {e}")
+        self._entries.clear()
+        self._clients.clear()
+
+
+_manager: Optional[ContextCacheManager] = None
+
+
+def get_context_cache() -> Optional[ContextCacheManager]:
+    """Return the shared context cache manager, or None when context caching is disabled."""
+    global _manager
+    if not config.is_context_cache_enabled():
+        return None
+    if _manager is None:
+        _manager = ContextCacheManager(
+            ttl_seconds=config.get_context_cache_ttl_seconds(),
+            refresh_margin_seconds=config.get_context_cache_refresh_margin_seconds(),
+            min_prompt_chars=config.get_context_cache_min_prompt_chars(),
+        )
+    return _manager
+
+
+async def close_context_cache() -> None:
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.aclose()
@@ -1,51 +1,263 @@
-from typing import Optional
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 import asyncio
 import logging
+import threading
+import time
+
+from google import genai
+from google.genai import types
+
+from src.infrastructure import config
+from src.infrastructure.cache import sha256_hex
+from src.infrastructure.clients.context_cache import ContextCacheManager, get_context_cache, is_stale_cache_error
+from src.infrastructure.clients.hedging import get_hedger
+from src.infrastructure.clients.pdf_store import PdfHandle
+from src.infrastructure.clients.scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class TokenUsage:
+    """Token totals of the model calls made while it is set as the current token_usage."""
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+
+    def add(self, usage_metadata) -> None:
+        self.calls += 1
+        if usage_metadata is not None:
+            self.prompt_tokens += usage_metadata.prompt_token_count or 0
+            self.cached_tokens += usage_metadata.cached_content_token_count or 0
+            self.output_tokens += usage_metadata.candidates_token_count or 0
+
+
+# Set by callers that want to account the tokens of the calls they trigger (e.g. benchmarks)
+token_usage: ContextVar[Optional[TokenUsage]] = ContextVar("token_usage", default=None)
+
+
+class GenAIClientRegistry:
+    """Long-lived GenAI clients shared by all coroutines, keyed by (api_key, model).
+
+    Every client owns an HTTP connection pool, so reusing it lets consecutive
+    calls share open keep-alive connections instead of paying for a new pool
+    and TLS handshake on each request.
+    """
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10, keepalive_expiry: float = 60.0):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._clients: Dict[Tuple[str, str], genai.Client] = {}
+        self._lock = threading.Lock()
+
+    def _http_options(self) -> types.HttpOptions:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return types.HttpOptions(client_args={"limits": limits}, async_client_args={"limits": limits})
+
+    def get(self, api_key: str, model: str) -> genai.Client:
+        key = (api_key, model)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = genai.Client(api_key=api_key, http_options=self._http_options())
+                self._clients[key] = client
+                logger.info(
+                    f"Created pooled GenAI client for model {model} "
+                    f"(max connections: {self.max_connections}, keep-alive: {self.max_keepalive_connections}/{self.keepalive_expiry:.0f}s)"
+                )
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def aclose(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close GenAI client cleanly: {e}")
+        logger.info(f"Closed {len(clients)} pooled GenAI clients")
+
+
+_registry: Optional[GenAIClientRegistry] = None
+
+
+def init_client_registry() -> GenAIClientRegistry:
+    """Create the process-wide client registry (called from the app lifespan)."""
+    global _registry
+    if _registry is None:
+        _registry = GenAIClientRegistry(
+            max_connections=config.get_genai_max_connections(),
+            max_keepalive_connections=config.get_genai_max_keepalive_connections(),
+            keepalive_expiry=float(config.get_genai_keepalive_expiry_seconds()),
+        )
+    return _registry
+
+
+def get_client_registry() -> GenAIClientRegistry:
+    """Return the shared registry, creating it lazily outside of the app (e.g. notebooks)."""
+    return _registry or init_client_registry()
+
+
+async def close_client_registry() -> None:
+    global _registry
+    if _registry is not None:
+        registry, _registry = _registry, None
+        await registry.aclose()
+
+
 def generate_json_from_pdf(pdf_bytes: bytes, prompt: str, model: Optional[str] = None, api_key: Optional[str] = None) -> str:
-    """Synchronous wrapper around async function for backward compatibility."""
-    return asyncio.run(generate_json_from_pdf_async(pdf_bytes, prompt, model, api_key))
+    """Synchronous wrapper around async function for backward compatibility.
+
+    Uses a dedicated client because pooled connections are bound to the event
+    loop they were opened on and asyncio.run() creates a fresh loop each time.
+    """
+    api_key = api_key or config.get_api_key()
+    model = model or config.get_model()
+    client = genai.Client(api_key=api_key)
 
+    async def run() -> str:
+        try:
+            return await _generate_json(client, pdf_bytes, prompt, model)
+        finally:
+            await client.aio.aclose()
 
-async def generate_json_from_pdf_async(pdf_bytes: bytes, prompt: str, model: Optional[str] = None, api_key: Optional[str] = None) -> str:
-    """Async version using the new Google GenAI SDK."""
-    from google import genai
-    from google.genai import types
-    from src.infrastructure import config
+    try:
+        return asyncio.run(run())
+    finally:
+        client.close()
+
+
+async def generate_json_from_pdf_async(
+    pdf_bytes: bytes,
+    prompt: str,
+    model: Optional[str] = None,
+    api_key: Optional[str] = None,
+    pdf_handle: Optional[PdfHandle] = None,
+    document_text: Optional[str] = None,
+    cacheable: bool = False,
+) -> str:
+    """Async version using the new Google GenAI SDK and a pooled client.
 
+    When a live pdf_handle is given the PDF is referenced through it instead
+    of being sent inline again. When document_text is given, that text
+    rendition of the document is sent instead of the PDF. The call waits for a slot from the shared
+    scheduler, which bounds concurrent model calls across all requests. With
+    hedging enabled, a slow call is duplicated when the scheduler has a free
+    slot for the duplicate, and the first answer wins. Only cacheable prompts
+    (static ones, reused across documents) are stored as context-cached content.
+    """
     api_key = api_key or config.get_api_key()
     model = model or config.get_model()
-    
+    client = get_client_registry().get(api_key, model)
+    context_cache = get_context_cache() if cacheable else None
+
+    def call():
+        return _generate_json(
+            client, pdf_bytes, prompt, model, pdf_handle,
+            api_key=api_key, context_cache=context_cache, document_text=document_text,
+        )
+
+    hedger = get_hedger()
+    scheduler = get_scheduler()
+    async with scheduler.slot():
+        if hedger is None:
+            return await call()
+        # Latency differs a lot between prompts (disambiguation vs. OCR), so learn it per prompt
+        return await hedger.run((model, sha256_hex(prompt)[:12]), call, scheduler)
+
+
+async def _generate_json(
+    client: genai.Client,
+    pdf_bytes: bytes,
+    prompt: str,
+    model: str,
+    pdf_handle: Optional[PdfHandle] = None,
+    api_key: Optional[str] = None,
+    context_cache: Optional[ContextCacheManager] = None,
+    document_text: Optional[str] = None,
+) -> str:
     pdf_size_kb = len(pdf_bytes) / 1024
-    logger.info(f"Starting async OCR request - Model: {model}, PDF size: {pdf_size_kb:.1f}KB")
-    
+    if document_text is not None:
+        pdf_part = types.Part.from_text(text=document_text)
+        logger.info(f"Starting async OCR request - Model: {model}, text rendition: {len(document_text)} chars instead of {pdf_size_kb:.1f}KB PDF")
+    elif pdf_handle is not None and not pdf_handle.expired:
+        pdf_part = pdf_handle.to_part()
+        logger.info(f"Starting async OCR request - Model: {model}, PDF handle: {pdf_handle.id} ({pdf_size_kb:.1f}KB)")
+    else:
+        if pdf_handle is not None:
+            logger.warning(f"PDF handle {pdf_handle.id} expired, sending PDF inline")
+        pdf_part = types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")
+        logger.info(f"Starting async OCR request - Model: {model}, PDF size: {pdf_size_kb:.1f}KB")
+
+    # The static prompt goes first so it forms a reusable prefix; with context
+    # caching it is not sent at all and only the PDF follows the cached content.
+    cached_content = None
+    if context_cache is not None and api_key:
+        cached_content = await context_cache.get_cached_content(client, api_key, model, prompt)
+
     try:
-        client = genai.Client(api_key=api_key)
-        logger.debug("GenAI client created successfully")
-        
-        response = await client.aio.models.generate_content(
-            model=model,
-            contents=[
-                types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf"),
-                prompt,
-            ],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-            ),
-        )
-        
+        start = time.perf_counter()
+        try:
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=[pdf_part] if cached_content else [prompt, pdf_part],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    cached_content=cached_content,
+                ),
+            )
+        except Exception as e:
+            # Quota, server and input errors are left to the callers' retries; only a
+            # cached content that was evicted or expired server-side is replaced by the inline prompt
+            if cached_content is None or not is_stale_cache_error(e, cached_content):
+                raise
+            logger.warning(f"Cached prompt {cached_content} is not usable, retrying inline: {e}")
+            await context_cache.discard(cached_content)
+            cached_content = None
+            start = time.perf_counter()
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=[prompt, pdf_part],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                ),
+            )
+        elapsed = time.perf_counter() - start
+
+        usage = response.usage_metadata
+        if usage is not None:
+            logger.info(
+                f"Token usage - prompt: {usage.prompt_token_count}, cached: {usage.cached_content_token_count or 0}, "
+                f"output: {usage.candidates_token_count}, latency: {elapsed:.1f}s"
+            )
+        if context_cache is not None:
+            context_cache.record_call(cached_content is not None, usage, elapsed)
+        meter = token_usage.get()
+        if meter is not None:
+            meter.add(usage)
+
         response_text = response.text or ""
         response_chars = len(response_text)
         logger.info(f"OCR request completed - Response length: {response_chars} chars")
         logger.debug(f"Response preview: {response_text[:200]}...")
-        
+
         return response_text
-        
+
     except Exception as e:
         logger.error(f"OCR request failed: {str(e)}", exc_info=True)
         raise
-
-
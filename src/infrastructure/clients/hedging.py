@@ -0,0 +1,158 @@
+"""Hedged model requests to cut tail latency.
+
+Latencies of recent successful calls are kept in a rolling window per
+(model, prompt). When a call has not returned after the configured latency
+percentile of that window, a duplicate is issued; whichever answers first is
+used and the other one is cancelled. The share of hedged calls is capped to
+bound the extra cost, and a hedge is only issued when the scheduler has a free
+slot for it. The window records the latency of the whole call, measured from
+the start of the first request, so hedged calls keep the slow tail in it.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+from src.infrastructure import config
+from src.infrastructure.clients.scheduler import LLMScheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyHistogram:
+    """Rolling window of recent call latencies in seconds."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class RequestHedger:
+    """Issues a duplicate request when the first one is slower than the learned percentile."""
+
+    def __init__(self, percentile: float = 90, min_samples: int = 20, max_hedge_rate: float = 0.1, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.window = window
+        self._histograms: Dict[Hashable, LatencyHistogram] = {}
+        self._recent_hedged: Deque[int] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped_rate_cap = 0
+        self.hedges_skipped_no_slot = 0
+
+    def _histogram(self, key: Hashable) -> LatencyHistogram:
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram(self.window)
+        return histogram
+
+    def threshold(self, key: Hashable) -> Optional[float]:
+        """Return the hedge delay for key, or None while there are too few samples."""
+        histogram = self._histogram(key)
+        if len(histogram) < self.min_samples:
+            return None
+        return histogram.percentile(self.percentile)
+
+    def _hedge_allowed(self) -> bool:
+        if not self._recent_hedged:
+            return self.max_hedge_rate > 0
+        return sum(self._recent_hedged) / len(self._recent_hedged) < self.max_hedge_rate
+
+    async def run(self, key: Hashable, make_call: Callable[[], Awaitable[T]], scheduler: Optional[LLMScheduler] = None) -> T:
+        """Run make_call, hedging it when slow; with a scheduler the hedge takes a slot of its own or is skipped."""
+        self.calls += 1
+        histogram = self._histogram(key)
+        delay = self.threshold(key)
+
+        primary = asyncio.ensure_future(make_call())
+        started = time.perf_counter()
+        tasks = {primary}
+        hedged = False
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if not self._hedge_allowed():
+                        self.hedges_skipped_rate_cap += 1
+                    elif scheduler is not None and not scheduler.try_acquire():
+                        self.hedges_skipped_no_slot += 1
+                    else:
+                        hedged = True
+                        self.hedges += 1
+                        logger.info(f"Call exceeded p{self.percentile:g} latency ({delay:.1f}s), issuing hedged request")
+                        hedge = asyncio.ensure_future(make_call())
+                        if scheduler is not None:
+                            hedge.add_done_callback(lambda _: scheduler.release())
+                        tasks.add(hedge)
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    # Latency of the call as a whole: a hedge that wins still records how long the primary took
+                    histogram.add(time.perf_counter() - started)
+                    if task is not primary:
+                        self.hedge_wins += 1
+                        logger.info("Hedged request answered first, cancelling the original")
+                    return task.result()
+            raise error
+        finally:
+            self._recent_hedged.append(1 if hedged else 0)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "percentile": self.percentile,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedges / self.calls, 3) if self.calls else 0.0,
+            "skipped_by_rate_cap": self.hedges_skipped_rate_cap,
+            "skipped_no_slot": self.hedges_skipped_no_slot,
+            "thresholds_seconds": {
+                str(key): round(value, 2)
+                for key in self._histograms
+                if (value := self.threshold(key)) is not None
+            },
+        }
+
+
+_hedger: Optional[RequestHedger] = None
+
+
+def get_hedger() -> Optional[RequestHedger]:
+    """Return the shared hedger, or None when hedging is disabled (the default)."""
+    global _hedger
+    if not config.is_hedging_enabled():
+        return None
+    if _hedger is None:
+        _hedger = RequestHedger(
+            percentile=config.get_hedge_percentile(),
+            min_samples=config.get_hedge_min_samples(),
+            max_hedge_rate=config.get_hedge_max_rate_percent() / 100,
+        )
+    return _hedger
@@ -0,0 +1,211 @@
+"""Upload-once PDF handles shared by disambiguation, OCR and retries.
+
+A PDF is registered once per job and later model calls reference it by
+handle instead of re-sending the bytes inline. Two stores are available:
+the Gemini Files API and a local stand-in that keeps the bytes in memory
+(useful for development and for models without Files API support). Handles
+carry a TTL; expired ones are swept and every handle is deleted when the job
+that registered it finishes.
+"""
+import asyncio
+import io
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional
+
+from google.genai import types
+
+from src.infrastructure import config
+from src.infrastructure.cache import sha256_hex
+
+logger = logging.getLogger(__name__)
+
+PDF_MIME_TYPE = "application/pdf"
+
+
+@dataclass
+class PdfHandle:
+    """A registered PDF that model calls can reference instead of inlining bytes."""
+    id: str
+    sha256: str
+    size: int
+    expires_at: float
+    uri: Optional[str] = None
+    name: Optional[str] = None
+    data: Optional[bytes] = field(default=None, repr=False)
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def to_part(self) -> types.Part:
+        if self.uri:
+            return types.Part.from_uri(file_uri=self.uri, mime_type=PDF_MIME_TYPE)
+        return types.Part.from_bytes(data=self.data, mime_type=PDF_MIME_TYPE)
+
+
+class PdfStore(ABC):
+    """Base class tracking handle lifetimes; subclasses implement upload and delete."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._handles: Dict[str, PdfHandle] = {}
+        self.registered = 0
+        self.deleted = 0
+        self.bytes_registered = 0
+
+    @abstractmethod
+    async def _upload(self, handle: PdfHandle, pdf_bytes: bytes, display_name: str) -> None:
+        """Make the bytes referenceable through handle (set its uri/name or data)."""
+
+    @abstractmethod
+    async def _delete(self, handle: PdfHandle) -> None:
+        """Free whatever _upload stored for handle."""
+
+    async def register(self, pdf_bytes: bytes, display_name: str = "document.pdf") -> PdfHandle:
+        await self.sweep_expired()
+        handle = PdfHandle(
+            id=uuid.uuid4().hex,
+            sha256=sha256_hex(pdf_bytes),
+            size=len(pdf_bytes),
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        await self._upload(handle, pdf_bytes, display_name)
+        self._handles[handle.id] = handle
+        self.registered += 1
+        self.bytes_registered += handle.size
+        logger.info(f"Registered PDF {display_name} ({handle.size/1024:.1f}KB) as handle {handle.id} via {type(self).__name__}")
+        return handle
+
+    async def release(self, handle: PdfHandle) -> None:
+        if self._handles.pop(handle.id, None) is None:
+            return
+        try:
+            await self._delete(handle)
+            self.deleted += 1
+            logger.debug(f"Deleted PDF handle {handle.id}")
+        except Exception as e:
+            logger.warning(f"Failed to delete PDF handle {handle.id}: {e}")
+
+    async def sweep_expired(self) -> None:
+        for handle in [h for h in self._handles.values() if h.expired]:
+            logger.info(f"PDF handle {handle.id} expired, deleting")
+            await self.release(handle)
+
+    async def aclose(self) -> None:
+        for handle in list(self._handles.values()):
+            await self.release(handle)
+
+    def stats(self) -> dict:
+        return {
+            "store": type(self).__name__,
+            "active_handles": len(self._handles),
+            "registered": self.registered,
+            "deleted": self.deleted,
+            "bytes_registered": self.bytes_registered,
+        }
+
+
+class LocalPdfStore(PdfStore):
+    """Local stand-in: keeps the bytes in process and sends them inline when referenced."""
+
+    async def _upload(self, handle: PdfHandle, pdf_bytes: bytes, display_name: str) -> None:
+        handle.data = pdf_bytes
+
+    async def _delete(self, handle: PdfHandle) -> None:
+        handle.data = None
+
+
+class GeminiFilesPdfStore(PdfStore):
+    """Registers PDFs through the Gemini Files API and references them by URI."""
+
+    async def _upload(self, handle: PdfHandle, pdf_bytes: bytes, display_name: str) -> None:
+        from src.infrastructure.clients.genai_client import get_client_registry
+
+        client = get_client_registry().get(config.get_api_key(), config.get_model())
+        uploaded = await client.aio.files.upload(
+            file=io.BytesIO(pdf_bytes),
+            config=types.UploadFileConfig(mime_type=PDF_MIME_TYPE, display_name=display_name),
+        )
+        # Large files may need a moment of server-side processing before they can be referenced
+        for _ in range(30):
+            state = str(getattr(uploaded.state, "value", uploaded.state) or "")
+            if state != "PROCESSING":
+                break
+            await asyncio.sleep(1)
+            uploaded = await client.aio.files.get(name=uploaded.name)
+        if str(getattr(uploaded.state, "value", uploaded.state) or "") == "FAILED":
+            raise RuntimeError(f"Gemini Files API failed to process {display_name}")
+
+        handle.uri = uploaded.uri
+        handle.name = uploaded.name
+        if uploaded.expiration_time is not None:
+            handle.expires_at = min(handle.expires_at, uploaded.expiration_time.timestamp())
+
+    async def _delete(self, handle: PdfHandle) -> None:
+        from src.infrastructure.clients.genai_client import get_client_registry
+
+        client = get_client_registry().get(config.get_api_key(), config.get_model())
+        await client.aio.files.delete(name=handle.name)
+
+
+_store: Optional[PdfStore] = None
+
+
+def get_pdf_store() -> Optional[PdfStore]:
+    """Return the configured store, or None when PDFs are sent inline (the default)."""
+    global _store
+    mode = config.get_pdf_upload_mode()
+    if mode == "inline":
+        return None
+    if _store is None:
+        ttl = config.get_pdf_handle_ttl_seconds()
+        _store = GeminiFilesPdfStore(ttl) if mode == "files" else LocalPdfStore(ttl)
+    return _store
+
+
+async def close_pdf_store() -> None:
+    global _store
+    if _store is not None:
+        store, _store = _store, None
+        await store.aclose()
+
+
+@asynccontextmanager
+async def registered_pdf(pdf_bytes: bytes, display_name: str) -> AsyncIterator[Optional[PdfHandle]]:
+    """Register a PDF for the duration of a job and delete it afterwards.
+
+    Yields None in inline mode or when registration fails, in which case
+    callers fall back to sending the bytes inline.
+    """
+    store = get_pdf_store()
+    handle = None
+    if store is not None:
+        try:
+            handle = await store.register(pdf_bytes, display_name)
+        except Exception as e:
+            logger.warning(f"PDF registration failed for {display_name}, sending inline instead: {e}")
+    try:
+        yield handle
+    finally:
+        if store is not None and handle is not None:
+            await store.release(handle)
+
+
+@asynccontextmanager
+async def registered_pdfs(documents: Dict[str, bytes], display_name: str) -> AsyncIterator[Dict[str, Optional[PdfHandle]]]:
+    """Register several PDFs of one job (e.g. per-statement page slices); identical documents share a handle."""
+    async with AsyncExitStack() as stack:
+        by_content: Dict[str, Optional[PdfHandle]] = {}
+        handles: Dict[str, Optional[PdfHandle]] = {}
+        for key, pdf_bytes in documents.items():
+            digest = sha256_hex(pdf_bytes)
+            if digest not in by_content:
+                name = display_name if len(by_content) == 0 else f"{display_name} ({key})"
+                by_content[digest] = await stack.enter_async_context(registered_pdf(pdf_bytes, name))
+            handles[key] = by_content[digest]
+        yield handles
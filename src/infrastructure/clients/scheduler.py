@@ -0,0 +1,152 @@
+"""Process-wide governor for concurrent model calls.
+
+Every Gemini call takes a slot from a shared limit. When all slots are busy,
+callers wait in a FIFO queue per session and sessions are served round-robin,
+so one user uploading many files cannot starve everybody else and excess
+work waits in order instead of failing with quota errors.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from src.infrastructure import config
+
+logger = logging.getLogger(__name__)
+
+# Session the current task's model calls are queued under (set per /process request)
+llm_session: ContextVar[str] = ContextVar("llm_session", default="default")
+
+
+class LLMScheduler:
+    """Limits in-flight model calls and queues the excess fairly per session."""
+
+    def __init__(self, max_in_flight: int = 8, wait_window: int = 1000):
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._rotation: Deque[str] = deque()
+        self._wait_times: Deque[float] = deque(maxlen=wait_window)
+        self.admitted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, session: Optional[str] = None) -> AsyncIterator[None]:
+        await self._acquire(session or llm_session.get())
+        try:
+            yield
+        finally:
+            self._release()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is queued; the caller must release() it."""
+        if self._in_flight < self.max_in_flight and not self._rotation:
+            self._in_flight += 1
+            self.admitted += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        self._release()
+
+    async def _acquire(self, session: str) -> None:
+        start = time.perf_counter()
+        if self._in_flight < self.max_in_flight and not self._rotation:
+            self._in_flight += 1
+            self.admitted += 1
+            self._wait_times.append(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(session, deque())
+        queue.append(future)
+        if session not in self._rotation:
+            self._rotation.append(session)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        logger.debug(f"Model call queued for session {session} (in flight: {self._in_flight}, queued: {self.queue_depth})")
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted right before cancellation; pass it on
+                self._release()
+            else:
+                self._discard(session, future)
+            raise
+
+        waited = time.perf_counter() - start
+        self.admitted += 1
+        self._wait_times.append(waited)
+        logger.info(f"Model call for session {session} admitted after {waited:.2f}s in queue")
+
+    def _discard(self, session: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(session)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[session]
+            try:
+                self._rotation.remove(session)
+            except ValueError:
+                pass
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        while self._in_flight < self.max_in_flight and self._rotation:
+            session = self._rotation.popleft()
+            queue = self._queues[session]
+            future = queue.popleft()
+            if queue:
+                self._rotation.append(session)
+            else:
+                del self._queues[session]
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+
+        def percentile(p: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 3)
+
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "queued_now": self.queue_depth,
+            "sessions_waiting": len(self._rotation),
+            "admitted": self.admitted,
+            "queued_total": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "wait_seconds_avg": round(sum(waits) / len(waits), 3) if waits else None,
+            "wait_seconds_p50": percentile(0.5),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": round(waits[-1], 3) if waits else None,
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(max_in_flight=config.get_genai_max_in_flight())
+    return _scheduler
@@ -1,9 +1,19 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _get_int_env(name: str, default: int, minimum: int, maximum: int) -> int:
+    """Read an integer env var, falling back to default and clamping to minimum..maximum."""
+    try:
+        value = int(os.getenv(name, str(default)))
+    except ValueError:
+        value = default
+    return max(minimum, min(maximum, value))
+
+
 def get_api_key() -> str:
     key = os.getenv("GOOGLE_API_KEY") or os.getenv("GENAI_API_KEY")
     if not key:
@@ -28,3 +38,240 @@ def get_ocr_max_retries() -> int:
         return 5
     return value
 
+
+def is_targeted_retry_enabled() -> bool:
+    """Whether retries re-extract only the rows of failing rules instead of the whole statement."""
+    return os.getenv("OCR_TARGETED_RETRIES", "1") == "1"
+
+
+def get_targeted_retry_max_rows() -> int:
+    """Above this many failing rows a retry re-extracts the whole statement."""
+    return _get_int_env("OCR_TARGETED_RETRY_MAX_ROWS", 40, 1, 1000)
+
+
+def get_ocr_parallel_attempts() -> int:
+    """Return how many OCR attempts run speculatively in parallel (1 = sequential retries), clamped to 1..5."""
+    return _get_int_env("OCR_PARALLEL_ATTEMPTS", 1, 1, 5)
+
+
+def is_page_locator_enabled() -> bool:
+    """Whether only the located statement pages (instead of the whole PDF) are sent to the model."""
+    return os.getenv("PDF_PAGE_LOCATOR", "1") == "1"
+
+
+def get_page_locator_min_score() -> int:
+    """Minimum page score (matched row labels plus a heading bonus) for a page to hold a statement."""
+    return _get_int_env("PDF_PAGE_LOCATOR_MIN_SCORE", 6, 1, 200)
+
+
+def get_page_locator_max_pages() -> int:
+    return _get_int_env("PDF_PAGE_LOCATOR_MAX_PAGES", 6, 1, 50)
+
+
+def is_text_layer_extraction_enabled() -> bool:
+    """Whether born-digital statements are first parsed locally from the PDF text layer."""
+    return os.getenv("TEXT_LAYER_EXTRACTION", "1") == "1"
+
+
+def get_text_layer_min_coverage_percent() -> int:
+    """Share of statement rows the text layer parse must find before it is validated at all."""
+    return _get_int_env("TEXT_LAYER_MIN_COVERAGE_PERCENT", 50, 1, 100)
+
+
+def is_pdf_slimming_enabled() -> bool:
+    """Whether large PDFs are downsampled and recompressed locally before they are uploaded."""
+    return os.getenv("PDF_SLIMMING", "0") == "1"
+
+
+def get_pdf_slimming_min_kb() -> int:
+    """PDFs smaller than this are uploaded as they are."""
+    return _get_int_env("PDF_SLIMMING_MIN_KB", 2048, 0, 1024 * 1024)
+
+
+def get_pdf_slimming_dpi() -> int:
+    """Resolution page images are downsampled to."""
+    return _get_int_env("PDF_SLIMMING_DPI", 150, 72, 600)
+
+
+def is_pdf_slimming_grayscale() -> bool:
+    """Whether downsampled page images are also converted to grayscale."""
+    return os.getenv("PDF_SLIMMING_GRAYSCALE", "0") == "1"
+
+
+def get_pdf_slimming_jpeg_quality() -> int:
+    return _get_int_env("PDF_SLIMMING_JPEG_QUALITY", 75, 30, 95)
+
+
+def get_pdf_slimming_workers() -> int:
+    """Size of the process pool running the slimming (CPU bound, outside the event loop)."""
+    return _get_int_env("PDF_SLIMMING_WORKERS", 2, 1, 16)
+
+
+def get_dcf_export_workers() -> int:
+    """Size of the process pool generating DCF workbooks (CPU bound, outside the event loop)."""
+    return _get_int_env("DCF_EXPORT_WORKERS", 2, 1, 16)
+
+
+DCF_EXPORT_BACKENDS = {"openpyxl", "xml"}
+
+
+def get_dcf_export_backend() -> str:
+    """Return how DCF workbooks are written: 'openpyxl' (load, fill, save; default) or 'xml' (patch the template package)."""
+    backend = os.getenv("DCF_EXPORT_BACKEND", "openpyxl").strip().lower()
+    return backend if backend in DCF_EXPORT_BACKENDS else "openpyxl"
+
+
+def get_upload_max_file_mb() -> int:
+    """Largest accepted PDF; bigger uploads are rejected with 413 while they are spooled."""
+    return _get_int_env("UPLOAD_MAX_FILE_MB", 50, 1, 1024)
+
+
+def get_upload_max_request_mb() -> int:
+    """Largest accepted total of all PDFs of one request."""
+    return _get_int_env("UPLOAD_MAX_REQUEST_MB", 200, 1, 4096)
+
+
+def get_upload_memory_budget_mb() -> int:
+    """Uploaded PDF bytes held in memory at once across all requests; further files wait for room."""
+    return _get_int_env("UPLOAD_MEMORY_BUDGET_MB", 256, 16, 65536)
+
+
+def get_batch_validation_max_mb() -> int:
+    """Largest accepted JSON Lines body of POST /validate."""
+    return _get_int_env("BATCH_VALIDATION_MAX_MB", 64, 1, 1024)
+
+
+def get_upload_spool_dir() -> str:
+    default = os.path.join(tempfile.gettempdir(), "valuagent", "uploads")
+    return os.getenv("UPLOAD_SPOOL_DIR", default)
+
+
+def get_job_workers() -> int:
+    """Number of background workers running POST /jobs submissions (one job each at a time)."""
+    return _get_int_env("JOB_WORKERS", 2, 1, 32)
+
+
+def get_job_queue_max() -> int:
+    """Jobs that may wait for a worker before POST /jobs is rejected with 503."""
+    return _get_int_env("JOB_QUEUE_MAX", 100, 1, 10000)
+
+
+def get_job_retention_seconds() -> int:
+    """How long finished jobs and their results stay available."""
+    return _get_int_env("JOB_RETENTION_SECONDS", 3600, 60, 7 * 24 * 3600)
+
+
+def is_job_store_enabled() -> bool:
+    """Whether jobs, their uploads and intermediate results are persisted so they survive restarts."""
+    return os.getenv("JOB_STORE_ENABLED", "1") == "1"
+
+
+def get_job_store_path() -> str:
+    default = os.path.join(tempfile.gettempdir(), "valuagent", "jobs.sqlite3")
+    return os.getenv("JOB_STORE_PATH", default)
+
+
+OCR_INPUT_MODES = {"pdf", "text"}
+
+
+def get_ocr_input_mode(statement_type: str) -> str:
+    """Return what OCR calls send for statement_type: 'pdf' (default) or 'text' (text layer of the statement pages).
+
+    OCR_INPUT_MODE sets the default, OCR_INPUT_MODE_ROZVAHA / OCR_INPUT_MODE_VZZ override it per statement type.
+    """
+    mode = os.getenv(f"OCR_INPUT_MODE_{statement_type.upper()}") or os.getenv("OCR_INPUT_MODE", "pdf")
+    mode = mode.strip().lower()
+    return mode if mode in OCR_INPUT_MODES else "pdf"
+
+
+EXTRACTION_MODES = {"staged", "combined"}
+
+
+def get_extraction_mode() -> str:
+    """Return 'staged' (disambiguation, then one call per statement; default) or 'combined' (one call)."""
+    mode = os.getenv("EXTRACTION_MODE", "staged").strip().lower()
+    return mode if mode in EXTRACTION_MODES else "staged"
+
+
+def is_ocr_cache_enabled() -> bool:
+    return os.getenv("OCR_CACHE_ENABLED", "1") == "1"
+
+
+def get_ocr_cache_path() -> str:
+    default = os.path.join(tempfile.gettempdir(), "valuagent", "ocr_cache.sqlite3")
+    return os.getenv("OCR_CACHE_PATH", default)
+
+
+def get_ocr_cache_memory_entries() -> int:
+    return _get_int_env("OCR_CACHE_MEMORY_ENTRIES", 128, 0, 100_000)
+
+
+def get_ocr_cache_max_mb() -> int:
+    return _get_int_env("OCR_CACHE_MAX_MB", 256, 1, 1_000_000)
+
+
+def get_ocr_cache_ttl_hours() -> int:
+    """Return the cache entry lifetime in hours; 0 disables expiry."""
+    return _get_int_env("OCR_CACHE_TTL_HOURS", 168, 0, 100_000)
+
+
+def get_genai_max_connections() -> int:
+    return _get_int_env("GENAI_MAX_CONNECTIONS", 20, 1, 1000)
+
+
+def get_genai_max_keepalive_connections() -> int:
+    return _get_int_env("GENAI_MAX_KEEPALIVE_CONNECTIONS", 10, 0, 1000)
+
+
+def get_genai_keepalive_expiry_seconds() -> int:
+    return _get_int_env("GENAI_KEEPALIVE_EXPIRY_SECONDS", 60, 1, 3600)
+
+
+def get_pdf_upload_mode() -> str:
+    """Return how PDFs reach the model: 'inline' (default), 'files' (Gemini Files API) or 'local'."""
+    mode = os.getenv("GENAI_PDF_UPLOAD_MODE", "inline").strip().lower()
+    return mode if mode in {"inline", "files", "local"} else "inline"
+
+
+def get_pdf_handle_ttl_seconds() -> int:
+    return _get_int_env("GENAI_PDF_HANDLE_TTL_SECONDS", 3600, 60, 47 * 3600)
+
+
+def is_context_cache_enabled() -> bool:
+    return os.getenv("GENAI_CONTEXT_CACHE", "1") == "1"
+
+
+def get_context_cache_ttl_seconds() -> int:
+    return _get_int_env("GENAI_CONTEXT_CACHE_TTL_SECONDS", 3600, 300, 24 * 3600)
+
+
+def get_context_cache_refresh_margin_seconds() -> int:
+    return _get_int_env("GENAI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS", 300, 0, 3600)
+
+
+def get_context_cache_min_prompt_chars() -> int:
+    """Prompts shorter than this are sent inline; models only cache prompts above a minimum token count."""
+    return _get_int_env("GENAI_CONTEXT_CACHE_MIN_PROMPT_CHARS", 2000, 0, 1_000_000)
+
+
+def get_genai_max_in_flight() -> int:
+    """Return the process-wide limit of concurrent model calls."""
+    return _get_int_env("GENAI_MAX_IN_FLIGHT", 8, 1, 256)
+
+
+def is_hedging_enabled() -> bool:
+    return os.getenv("GENAI_HEDGING", "0") == "1"
+
+
+def get_hedge_percentile() -> int:
+    """Latency percentile after which a duplicate request is issued."""
+    return _get_int_env("GENAI_HEDGE_PERCENTILE", 90, 50, 99)
+
+
+def get_hedge_min_samples() -> int:
+    return _get_int_env("GENAI_HEDGE_MIN_SAMPLES", 20, 1, 10_000)
+
+
+def get_hedge_max_rate_percent() -> int:
+    """Upper bound on the share of calls that may be hedged."""
+    return _get_int_env("GENAI_HEDGE_MAX_RATE_PERCENT", 10, 0, 100)
@@ -1,13 +1,72 @@
+import gc
 import io
 import json
 import logging
+import pickle
+import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
 
 import openpyxl
 
+from src.infrastructure import config
+
 logger = logging.getLogger(__name__)
 
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "resources" / "DCF.xlsx"
+# Sheets whose cells are filled only when the template has no formula there
+FORMULA_CHECKED_SHEETS = ("Rozvaha", "Výsledovka")
+
+# Parsed template kept as a pickle snapshot: unpickling is several times faster than load_workbook
+_template_snapshot: Optional[bytes] = None
+_formula_cells: Dict[str, FrozenSet[str]] = {}
+_template_lock = threading.Lock()
+
+
+def preload_dcf_template() -> None:
+    """Parse the DCF template once and remember a snapshot of it plus its formula cells."""
+    global _template_snapshot, _formula_cells
+    with _template_lock:
+        if _template_snapshot is not None:
+            return
+        if not TEMPLATE_PATH.exists():
+            raise FileNotFoundError(f"DCF template not found: {TEMPLATE_PATH}")
+        logger.info(f"Preloading DCF template from {TEMPLATE_PATH}")
+        workbook = openpyxl.load_workbook(TEMPLATE_PATH)
+        _formula_cells = {
+            name: frozenset(cell.coordinate for row in workbook[name].iter_rows() for cell in row if cell.data_type == "f")
+            for name in FORMULA_CHECKED_SHEETS
+            if name in workbook.sheetnames
+        }
+        _template_snapshot = pickle.dumps(workbook, protocol=pickle.HIGHEST_PROTOCOL)
+        # The parsed workbook is full of reference cycles; free it now rather than at some later GC pass
+        del workbook
+        gc.collect()
+        logger.info(f"DCF template preloaded ({len(_template_snapshot)/1024:.0f}KB snapshot)")
+
+
+def preload_export_backend() -> None:
+    """Prepare the template for the configured export backend."""
+    if config.get_dcf_export_backend() == "xml":
+        from src.infrastructure.exporters.dcf_xml import preload_xml_template
+        preload_xml_template()
+    else:
+        preload_dcf_template()
+
+
+def clone_dcf_template() -> Tuple[openpyxl.Workbook, Dict[str, FrozenSet[str]]]:
+    """Return a private copy of the template workbook and the formula cells of the checked sheets."""
+    preload_dcf_template()
+    # Unpickling allocates hundreds of thousands of objects; cyclic GC passes during it would triple the time
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        workbook = pickle.loads(_template_snapshot)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return workbook, _formula_cells
+
 
 def load_predmet_oceneni_mapping() -> Dict[str, Dict[str, str]]:
     """Load the cell mapping for Předmět ocenění sheet."""
@@ -227,7 +286,13 @@ def fill_predmet_oceneni_sheet(workbook: openpyxl.Workbook, balance_sheet_result
     logger.info(f"Successfully filled {filled_count} rows in {sheet_name} sheet, {missing_count} rows not mapped")
 
 
-def fill_rozvaha_sheet(workbook: openpyxl.Workbook, balance_sheet_results: List[Dict[str, Any]]) -> None:
+def _is_formula_cell(sheet, cell_address: str, formula_cells: Optional[FrozenSet[str]]) -> bool:
+    if formula_cells is not None:
+        return cell_address in formula_cells
+    return sheet[cell_address].data_type == 'f'  # 'f' means formula
+
+
+def fill_rozvaha_sheet(workbook: openpyxl.Workbook, balance_sheet_results: List[Dict[str, Any]], formula_cells: Optional[FrozenSet[str]] = None) -> None:
     """Fill the Rozvaha sheet with multiple years of balance sheet data."""
     sheet_name = "Rozvaha"
     
@@ -362,9 +427,8 @@ def fill_rozvaha_sheet(workbook: openpyxl.Workbook, balance_sheet_results: List[
                     cell_address = f"{column}{excel_row}"
 
                     # Check if cell contains a formula - if so, skip it to preserve template logic
-                    existing_cell = sheet[cell_address]
-                    if existing_cell.data_type == 'f':  # 'f' means formula
-                        logger.debug(f"Skipping {cell_address} - contains formula: {existing_cell.value}")
+                    if _is_formula_cell(sheet, cell_address, formula_cells):
+                        logger.debug(f"Skipping {cell_address} - contains formula")
                         missing_count += 1
                     else:
                         sheet[cell_address] = value
@@ -386,7 +450,7 @@ def fill_rozvaha_sheet(workbook: openpyxl.Workbook, balance_sheet_results: List[
     logger.info(f"Successfully filled Rozvaha sheet: {total_filled} total values, {total_missing} total missing")
 
 
-def fill_vysledovka_sheet(workbook: openpyxl.Workbook, profit_loss_results: List[Dict[str, Any]]) -> None:
+def fill_vysledovka_sheet(workbook: openpyxl.Workbook, profit_loss_results: List[Dict[str, Any]], formula_cells: Optional[FrozenSet[str]] = None) -> None:
     """Fill the Výsledovka sheet with multiple years of profit and loss data."""
     sheet_name = "Výsledovka"
     
@@ -508,9 +572,8 @@ def fill_vysledovka_sheet(workbook: openpyxl.Workbook, profit_loss_results: List
                     cell_address = f"{column}{excel_row}"
 
                     # Check if cell contains a formula - if so, skip it to preserve template logic
-                    existing_cell = sheet[cell_address]
-                    if existing_cell.data_type == 'f':  # 'f' means formula
-                        logger.debug(f"Skipping {cell_address} - contains formula: {existing_cell.value}")
+                    if _is_formula_cell(sheet, cell_address, formula_cells):
+                        logger.debug(f"Skipping {cell_address} - contains formula")
                         missing_count += 1
                     else:
                         sheet[cell_address] = value
@@ -571,10 +634,13 @@ def add_data_quality_report(workbook: openpyxl.Workbook, results: List[Dict[str,
     start = row + 1
     sheet.cell(row=start, column=1, value="Problémy ve výkazech (po opakování OCR)")
     row = start + 1
+    violation_headers = ["Problém", "Pravidlo", "Sloupec", "Řádek", "Hodnota", "Vypočteno", "Rozdíl"]
     for r in results:
         errs = r.get("validation_errors") or []
         if not errs:
             continue
+        # validation_errors lists the Czech messages of the violations first, in the same order
+        violations = r.get("violations") or []
         file_name = r.get("original")
         st = r.get("statement_type")
         model = r.get("model")
@@ -583,7 +649,17 @@ def add_data_quality_report(workbook: openpyxl.Workbook, results: List[Dict[str,
         sheet.cell(row=row, column=2, value=f"Výkaz: {st}")
         sheet.cell(row=row, column=3, value=f"Rok: {rok}")
         row += 1
-        for msg in errs:
+        if violations:
+            for col, h in enumerate(violation_headers, start=2):
+                sheet.cell(row=row, column=col, value=h)
+            row += 1
+        for violation, msg in zip(violations, errs):
+            values = [msg, violation.rule_id, violation.column, violation.target_row,
+                      violation.target_value, violation.computed_value, violation.difference]
+            for col, v in enumerate(values, start=2):
+                sheet.cell(row=row, column=col, value=v)
+            row += 1
+        for msg in errs[len(violations):]:
             sheet.cell(row=row, column=2, value=msg)
             row += 1
         row += 1
@@ -599,18 +675,43 @@ def add_data_quality_report(workbook: openpyxl.Workbook, results: List[Dict[str,
 def export_dcf_template(results: List[Dict[str, Any]], disambiguation_info: Dict[str, Any] = None, tolerance: int = 1) -> io.BytesIO:
     """Export results to DCF template, filling Předmět ocenění, Rozvaha, Výsledovka a Kvalita dat."""
     logger.info(f"Creating DCF template export from {len(results)} results")
+    if config.get_dcf_export_backend() == "xml":
+        from src.infrastructure.exporters.dcf_xml import export_dcf_xml
+        return export_dcf_xml(results, disambiguation_info, tolerance)
+    workbook, formula_cells = clone_dcf_template()
+    logger.debug(f"Template cloned with sheets: {workbook.sheetnames}")
+    return fill_dcf_workbook(workbook, results, disambiguation_info, tolerance, formula_cells)
+
+
+def fill_dcf_workbook(
+    workbook: openpyxl.Workbook,
+    results: List[Dict[str, Any]],
+    disambiguation_info: Dict[str, Any] = None,
+    tolerance: int = 1,
+    formula_cells: Optional[Dict[str, FrozenSet[str]]] = None,
+) -> io.BytesIO:
+    """Fill a copy of the template and save it; without formula_cells formulas are detected per cell."""
+    fill_dcf_sheets(workbook, results, disambiguation_info, tolerance, formula_cells)
+
+    # Save to BytesIO buffer
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
     
-    # Load the template
-    resources_dir = Path(__file__).resolve().parent.parent / "resources"
-    template_path = resources_dir / "DCF.xlsx"
-    
-    if not template_path.exists():
-        raise FileNotFoundError(f"DCF template not found: {template_path}")
-    
-    logger.info(f"Loading DCF template from {template_path}")
-    workbook = openpyxl.load_workbook(template_path)
-    logger.debug(f"Template loaded with sheets: {workbook.sheetnames}")
-    
+    logger.info(f"DCF template export completed, buffer size: {buffer.getbuffer().nbytes/1024:.1f}KB")
+    return buffer
+
+
+def fill_dcf_sheets(
+    workbook: openpyxl.Workbook,
+    results: List[Dict[str, Any]],
+    disambiguation_info: Dict[str, Any] = None,
+    tolerance: int = 1,
+    formula_cells: Optional[Dict[str, FrozenSet[str]]] = None,
+) -> None:
+    """Write the results into the sheets of workbook (or of a workbook stand-in with the same interface)."""
+    formula_cells = formula_cells or {}
+
     # Get all balance sheets sorted by year (newest first)
     sorted_balance_sheets = get_sorted_balance_sheets(results)
     
@@ -624,14 +725,14 @@ def export_dcf_template(results: List[Dict[str, Any]], disambiguation_info: Dict
     
     # Fill Rozvaha sheet with historical years (skip latest)
     if len(sorted_balance_sheets) > 1:
-        fill_rozvaha_sheet(workbook, sorted_balance_sheets)
+        fill_rozvaha_sheet(workbook, sorted_balance_sheets, formula_cells.get("Rozvaha"))
     else:
         logger.info("Only one balance sheet year available, skipping Rozvaha sheet historical data")
     
     # Fill Výsledovka sheet with profit and loss data
     sorted_profit_loss = get_sorted_profit_loss_statements(results)
     if sorted_profit_loss:
-        fill_vysledovka_sheet(workbook, sorted_profit_loss)
+        fill_vysledovka_sheet(workbook, sorted_profit_loss, formula_cells.get("Výsledovka"))
     else:
         logger.info("No profit and loss data available, skipping Výsledovka sheet")
     
@@ -642,11 +743,3 @@ def export_dcf_template(results: List[Dict[str, Any]], disambiguation_info: Dict
         add_data_quality_report(workbook, results, inter_issues, tolerance)
     except Exception as e:
         logger.error(f"Failed to add Data Quality report: {e}", exc_info=True)
-
-    # Save to BytesIO buffer
-    buffer = io.BytesIO()
-    workbook.save(buffer)
-    buffer.seek(0)
-    
-    logger.info(f"DCF template export completed, buffer size: {buffer.getbuffer().nbytes/1024:.1f}KB")
-    return buffer
@@ -0,0 +1,120 @@
+"""DCF workbook export in a process pool.
+
+export_dcf_template fills the multi-megabyte DCF.xlsx template with openpyxl
+and saves it again, which keeps a CPU busy for a long while. Run inline it
+would stall the event loop and with it every other request, so the export runs
+in a bounded ProcessPoolExecutor (DCF_EXPORT_WORKERS). Results cross the
+process boundary as plain dicts (export_payload) and the workbook comes back
+as bytes. Workers start from a fresh interpreter and parse the template once,
+in their initializer; the pool is started at startup so that happens before
+the first export, and every export fills a cheap clone.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.domain.models.balance_sheet import BalanceSheet, BalanceSheetRow
+from src.domain.models.profit_and_loss import ProfitAndLoss, ProfitAndLossRow
+from src.infrastructure import config
+from src.infrastructure.exporters.dcf import export_dcf_template, preload_export_backend
+
+logger = logging.getLogger(__name__)
+
+# Result fields the exporter and the data quality report read
+EXPORT_RESULT_KEYS = ("original", "statement_type", "raw", "violations", "validation_errors", "ocr_attempts", "status")
+
+
+def export_payload(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Plain, picklable copies of results; statement models are replaced by their dumped fields."""
+    payload = []
+    for r in results:
+        item = {key: r.get(key) for key in EXPORT_RESULT_KEYS if key in r}
+        model = r.get("model")
+        item["model"] = model.model_dump(warnings=False) if model is not None else None
+        payload.append(item)
+    return payload
+
+
+def _construct_model(statement_type: str, fields: Dict[str, Any]):
+    # The models were validated (or deliberately left unvalidated) in the parent; rebuild them as they are
+    model_cls, row_cls = (BalanceSheet, BalanceSheetRow) if statement_type == "rozvaha" else (ProfitAndLoss, ProfitAndLossRow)
+    rows = {int(k): row_cls.model_construct(**v) for k, v in (fields.get("data") or {}).items()}
+    return model_cls.model_construct(rok=fields.get("rok"), data=rows, tolerance=fields.get("tolerance", 0))
+
+
+def results_from_payload(payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results = []
+    for item in payload:
+        result = dict(item)
+        if item.get("model") is not None:
+            result["model"] = _construct_model(item["statement_type"], item["model"])
+        results.append(result)
+    return results
+
+
+def export_dcf_bytes(payload: List[Dict[str, Any]], disambiguation_info: Optional[Dict[str, Any]], tolerance: int) -> bytes:
+    """Worker entry point: export_dcf_template on a payload from export_payload."""
+    buffer = export_dcf_template(results_from_payload(payload), disambiguation_info, tolerance=tolerance)
+    return buffer.getvalue()
+
+
+def _init_worker() -> None:
+    # Failing here would break the whole pool; a missing template is reported by the export itself
+    try:
+        preload_export_backend()
+    except Exception as e:
+        logger.warning(f"Preloading the DCF template in the export worker failed: {e}")
+
+
+def _worker_ready() -> None:
+    pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking the threaded server process could copy a held lock into the worker
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=config.get_dcf_export_workers(),
+                mp_context=multiprocessing.get_context(method),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+async def preload_export_template() -> None:
+    """Start the export workers at startup so they have parsed the template before the first export."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        # Workers are started on demand, one per task that finds no idle worker
+        await asyncio.gather(*(loop.run_in_executor(pool, _worker_ready) for _ in range(config.get_dcf_export_workers())))
+    except Exception as e:
+        logger.warning(f"Starting the DCF export workers failed: {e}")
+
+
+async def export_dcf_template_async(
+    results: List[Dict[str, Any]], disambiguation_info: Optional[Dict[str, Any]] = None, tolerance: int = 1
+) -> io.BytesIO:
+    """export_dcf_template in the export process pool, leaving the event loop free."""
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(_get_pool(), export_dcf_bytes, export_payload(results), disambiguation_info, tolerance)
+    return io.BytesIO(content)
+
+
+def close_export_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,360 @@
+"""DCF export by patching the template's xlsx package instead of an openpyxl round-trip.
+
+The exporter writes a few hundred cells, yet openpyxl parses and rewrites the
+whole template (and drops what it does not understand). This backend runs the
+same fill functions against a recording workbook, then opens DCF.xlsx as a
+zip and rewrites only the worksheet parts with recorded cells, the shared
+strings and the workbook parts that register the new "Kvalita dat" sheet.
+Every other part is copied with its compressed bytes unchanged.
+
+Dropped parts: customXml/ (a DataSnipper cache of the source PDFs the template
+was built from, which openpyxl never exported either) and calcChain.xml, which
+Excel rebuilds; the workbook is marked for a full recalculation on load since
+some written cells held formulas.
+"""
+import io
+import logging
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from src.infrastructure.exporters.dcf import FORMULA_CHECKED_SHEETS, TEMPLATE_PATH, fill_dcf_sheets
+
+logger = logging.getLogger(__name__)
+
+DROPPED_PART_PREFIXES = ("customXml/", "xl/calcChain.xml")
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+WORKSHEET_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+NEW_SHEET_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheetData/></worksheet>'
+)
+
+ROW_RE = re.compile(r'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>(.*?)</row>)', re.S)
+CELL_RE = re.compile(r'<c\b[^>]*?\br="([A-Z]+)(\d+)"[^>]*?(?:/>|>(.*?)</c>)', re.S)
+STYLE_RE = re.compile(r'\bs="(\d+)"')
+SPANS_RE = re.compile(r'\s+spans="[^"]*"')
+ILLEGAL_XML_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+
+
+class RecordingSheet:
+    """Worksheet stand-in for the fill functions: remembers the written values by coordinate."""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.values: Dict[str, Any] = {}
+
+    def __setitem__(self, coordinate: str, value: Any) -> None:
+        self.values[coordinate] = value
+
+    def cell(self, row: int, column: int, value: Any = None) -> None:
+        # Like openpyxl, a cell() call without a value leaves the cell as it is
+        if value is not None:
+            self.values[f"{get_column_letter(column)}{row}"] = value
+
+
+class RecordingWorkbook:
+    def __init__(self, sheetnames: List[str]):
+        self.sheetnames = list(sheetnames)
+        self.sheets = {name: RecordingSheet(name) for name in sheetnames}
+        self.created: List[str] = []
+
+    def __getitem__(self, name: str) -> RecordingSheet:
+        return self.sheets[name]
+
+    def create_sheet(self, title: str) -> RecordingSheet:
+        self.sheetnames.append(title)
+        self.created.append(title)
+        self.sheets[title] = RecordingSheet(title)
+        return self.sheets[title]
+
+
+@dataclass
+class _Part:
+    info: zipfile.ZipInfo
+    raw: bytes
+
+    def read(self) -> str:
+        if self.info.compress_type == zipfile.ZIP_STORED:
+            return self.raw.decode("utf-8")
+        return zlib.decompress(self.raw, -15).decode("utf-8")
+
+
+class XlsxTemplate:
+    """The template package: raw parts to copy, sheet part names and formula cells of the checked sheets."""
+
+    def __init__(self, data: bytes):
+        self.parts: Dict[str, _Part] = {}
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                if info.filename.startswith(DROPPED_PART_PREFIXES):
+                    continue
+                offset = info.header_offset
+                name_length, extra_length = LOCAL_HEADER.unpack_from(data, offset)[-2:]
+                start = offset + LOCAL_HEADER.size + name_length + extra_length
+                self.parts[info.filename] = _Part(info, data[start:start + info.compress_size])
+        self.sheet_parts = self._sheet_parts()
+        self.formula_cells = {
+            name: frozenset(
+                f"{m.group(1)}{m.group(2)}"
+                for m in CELL_RE.finditer(self.parts[self.sheet_parts[name]].read())
+                if m.group(3) and "<f" in m.group(3)
+            )
+            for name in FORMULA_CHECKED_SHEETS
+            if name in self.sheet_parts
+        }
+
+    def _sheet_parts(self) -> Dict[str, str]:
+        rels = dict(re.findall(r'<Relationship\b[^>]*?\bId="([^"]+)"[^>]*?\bTarget="([^"]+)"', self.parts["xl/_rels/workbook.xml.rels"].read()))
+        sheets = {}
+        for tag in re.findall(r"<sheet\b[^>]*>", self.parts["xl/workbook.xml"].read()):
+            name = _unescape(re.search(r'\bname="([^"]*)"', tag).group(1))
+            target = rels[re.search(r'\br:id="([^"]+)"', tag).group(1)]
+            sheets[name] = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        return sheets
+
+
+def _unescape(text: str) -> str:
+    return text.replace("&quot;", '"').replace("&apos;", "'").replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+
+
+_template: Optional[XlsxTemplate] = None
+_template_lock = threading.Lock()
+
+
+def preload_xml_template() -> XlsxTemplate:
+    """Read and index the DCF template package once."""
+    global _template
+    with _template_lock:
+        if _template is None:
+            if not TEMPLATE_PATH.exists():
+                raise FileNotFoundError(f"DCF template not found: {TEMPLATE_PATH}")
+            start = time.perf_counter()
+            _template = XlsxTemplate(TEMPLATE_PATH.read_bytes())
+            logger.info(f"Indexed DCF template package ({len(_template.parts)} parts) in {time.perf_counter() - start:.2f}s")
+        return _template
+
+
+class _SharedStrings:
+    """Appends new strings to sharedStrings.xml; the existing entries are left as they are."""
+
+    def __init__(self, xml: str):
+        self.xml = xml
+        self.base = len(re.findall(r"<si\b", xml))
+        self.added: Dict[str, int] = {}
+        self.references = 0
+
+    def index(self, text: str) -> int:
+        self.references += 1
+        if text not in self.added:
+            self.added[text] = self.base + len(self.added)
+        return self.added[text]
+
+    def render(self) -> str:
+        items = "".join(f'<si><t xml:space="preserve">{_xml_text(text)}</t></si>' for text in self.added)
+        xml = self.xml.replace("</sst>", f"{items}</sst>")
+
+        def bump(match: re.Match, extra: int) -> str:
+            return f'{match.group(1)}="{int(match.group(2)) + extra}"'
+
+        xml = re.sub(r'\b(uniqueCount)="(\d+)"', lambda m: bump(m, len(self.added)), xml, count=1)
+        return re.sub(r'\b(count)="(\d+)"', lambda m: bump(m, self.references), xml, count=1)
+
+
+def _xml_text(text: str) -> str:
+    return escape(ILLEGAL_XML_CHARS_RE.sub("", text))
+
+
+def _xml_attr(text: str) -> str:
+    return escape(ILLEGAL_XML_CHARS_RE.sub("", text), {'"': "&quot;"})
+
+
+def _cell_xml(coordinate: str, value: Any, style: Optional[str], strings: _SharedStrings) -> str:
+    attrs = f' r="{coordinate}"' + (f' s="{style}"' if style else "")
+    if value is None:
+        return f"<c{attrs}/>"
+    if isinstance(value, bool):
+        return f'<c{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c{attrs}><v>{value!r}</v></c>"
+    return f'<c{attrs} t="s"><v>{strings.index(str(value))}</v></c>'
+
+
+def _patch_row(row_xml: str, cells: Dict[int, Tuple[str, Any]], strings: _SharedStrings) -> str:
+    """Return the <row> element with cells (column index -> (coordinate, value)) written in column order."""
+    if row_xml.endswith("/>"):
+        open_tag, inner = row_xml[:-2] + ">", ""
+    else:
+        open_tag, inner = row_xml[: row_xml.index(">") + 1], row_xml[row_xml.index(">") + 1: -len("</row>")]
+    # spans is only an optimisation hint and may no longer be right
+    open_tag = SPANS_RE.sub("", open_tag)
+    pending = dict(cells)
+    out = []
+    for match in CELL_RE.finditer(inner):
+        column = column_index_from_string(match.group(1))
+        for new_column in sorted(c for c in pending if c < column):
+            coordinate, value = pending.pop(new_column)
+            out.append(_cell_xml(coordinate, value, None, strings))
+        if column in pending:
+            coordinate, value = pending.pop(column)
+            style = STYLE_RE.search(match.group(0)[: match.group(0).index(">")])
+            out.append(_cell_xml(coordinate, value, style.group(1) if style else None, strings))
+        else:
+            out.append(match.group(0))
+    for new_column in sorted(pending):
+        coordinate, value = pending[new_column]
+        out.append(_cell_xml(coordinate, value, None, strings))
+    return f"{open_tag}{''.join(out)}</row>"
+
+
+def patch_sheet_xml(xml: str, values: Dict[str, Any], strings: _SharedStrings) -> str:
+    """Write values (coordinate -> value) into a worksheet part, keeping everything else as it is."""
+    by_row: Dict[int, Dict[int, Tuple[str, Any]]] = {}
+    for coordinate, value in values.items():
+        letters, row = re.fullmatch(r"([A-Z]+)(\d+)", coordinate).groups()
+        by_row.setdefault(int(row), {})[column_index_from_string(letters)] = (coordinate, value)
+
+    if "<sheetData/>" in xml:
+        xml = xml.replace("<sheetData/>", "<sheetData></sheetData>", 1)
+    start = xml.index("<sheetData>") + len("<sheetData>")
+    end = xml.index("</sheetData>")
+    data = xml[start:end]
+
+    out = []
+    position = 0
+    for match in ROW_RE.finditer(data):
+        row = int(match.group(1))
+        out.append(data[position:match.start()])
+        for new_row in sorted(r for r in by_row if r < row):
+            out.append(_patch_row(f'<row r="{new_row}"/>', by_row.pop(new_row), strings))
+        out.append(_patch_row(match.group(0), by_row.pop(row), strings) if row in by_row else match.group(0))
+        position = match.end()
+    out.append(data[position:])
+    for new_row in sorted(by_row):
+        out.append(_patch_row(f'<row r="{new_row}"/>', by_row[new_row], strings))
+    return xml[:start] + "".join(out) + xml[end:]
+
+
+def _patch_workbook_parts(template: XlsxTemplate, new_sheets: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Return the patched workbook parts and the part names of the new sheets."""
+    workbook = template.parts["xl/workbook.xml"].read()
+    rels = template.parts["xl/_rels/workbook.xml.rels"].read()
+    content_types = template.parts["[Content_Types].xml"].read()
+
+    # Relationships and content types of the dropped parts
+    rels = re.sub(
+        r'<Relationship\b[^>]*?\bTarget="([^"]+)"[^>]*/>',
+        lambda m: "" if f"xl/{m.group(1)}".replace("xl/../", "").startswith(DROPPED_PART_PREFIXES) else m.group(0),
+        rels,
+    )
+    content_types = re.sub(
+        r'<Override\b[^>]*?\bPartName="/([^"]+)"[^>]*/>',
+        lambda m: "" if m.group(1).startswith(DROPPED_PART_PREFIXES) else m.group(0),
+        content_types,
+    )
+    if "<calcPr" in workbook:
+        workbook = re.sub(r"<calcPr\b", '<calcPr fullCalcOnLoad="1"', workbook, count=1)
+
+    new_parts = {}
+    sheet_ids = [int(i) for i in re.findall(r'<sheet\b[^>]*?\bsheetId="(\d+)"', workbook)]
+    rel_ids = [int(i) for i in re.findall(r'\bId="rId(\d+)"', template.parts["xl/_rels/workbook.xml.rels"].read())]
+    sheet_numbers = [int(m.group(1)) for m in map(re.compile(r"xl/worksheets/sheet(\d+)\.xml").fullmatch, template.parts) if m]
+    for offset, title in enumerate(new_sheets, start=1):
+        part_name = f"xl/worksheets/sheet{max(sheet_numbers, default=0) + offset}.xml"
+        rel_id = f"rId{max(rel_ids, default=0) + offset}"
+        workbook = workbook.replace(
+            "</sheets>", f'<sheet name="{_xml_attr(title)}" sheetId="{max(sheet_ids, default=0) + offset}" r:id="{rel_id}"/></sheets>'
+        )
+        rels = rels.replace(
+            "</Relationships>",
+            f'<Relationship Id="{rel_id}" Type="{WORKSHEET_REL_TYPE}" Target="{part_name[len("xl/"):]}"/></Relationships>',
+        )
+        content_types = content_types.replace(
+            "</Types>", f'<Override PartName="/{part_name}" ContentType="{WORKSHEET_CONTENT_TYPE}"/></Types>'
+        )
+        new_parts[title] = part_name
+    patched = {"xl/workbook.xml": workbook, "xl/_rels/workbook.xml.rels": rels, "[Content_Types].xml": content_types}
+    return patched, new_parts
+
+
+class _ZipBuilder:
+    """Minimal zip writer that can append already-compressed members unchanged."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.central: List[bytes] = []
+
+    def _append(self, name: str, compress_type: int, crc: int, raw: bytes, size: int, date_time: tuple) -> None:
+        encoded = name.encode("utf-8")
+        flags = 0 if encoded.isascii() else 0x800
+        dos_time = (date_time[3] << 11) | (date_time[4] << 5) | (date_time[5] // 2)
+        dos_date = ((date_time[0] - 1980) << 9) | (date_time[1] << 5) | date_time[2]
+        offset = self.buffer.tell()
+        self.buffer.write(LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, compress_type, dos_time, dos_date, crc, len(raw), size, len(encoded), 0))
+        self.buffer.write(encoded)
+        self.buffer.write(raw)
+        self.central.append(
+            CENTRAL_HEADER.pack(b"PK\x01\x02", 20, 20, flags, compress_type, dos_time, dos_date, crc, len(raw), size, len(encoded), 0, 0, 0, 0, 0, offset)
+            + encoded
+        )
+
+    def copy(self, part: _Part) -> None:
+        info = part.info
+        self._append(info.filename, info.compress_type, info.CRC, part.raw, info.file_size, info.date_time)
+
+    def add(self, name: str, data: bytes, date_time: tuple = (1980, 1, 1, 0, 0, 0)) -> None:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        raw = compressor.compress(data) + compressor.flush()
+        self._append(name, zipfile.ZIP_DEFLATED, zlib.crc32(data), raw, len(data), date_time)
+
+    def finish(self) -> io.BytesIO:
+        start = self.buffer.tell()
+        for header in self.central:
+            self.buffer.write(header)
+        size = self.buffer.tell() - start
+        self.buffer.write(END_OF_CENTRAL_DIRECTORY.pack(b"PK\x05\x06", 0, 0, len(self.central), len(self.central), size, start, 0))
+        self.buffer.seek(0)
+        return self.buffer
+
+
+def export_dcf_xml(results: List[Dict[str, Any]], disambiguation_info: Dict[str, Any] = None, tolerance: int = 1) -> io.BytesIO:
+    """Export results to the DCF template by patching its XML parts; same content as the openpyxl backend."""
+    template = preload_xml_template()
+    workbook = RecordingWorkbook(list(template.sheet_parts))
+    fill_dcf_sheets(workbook, results, disambiguation_info, tolerance, template.formula_cells)
+
+    strings = _SharedStrings(template.parts["xl/sharedStrings.xml"].read())
+    patched, new_parts = _patch_workbook_parts(template, workbook.created)
+    for title in workbook.sheetnames:
+        values = workbook[title].values
+        if title in new_parts:
+            patched[new_parts[title]] = patch_sheet_xml(NEW_SHEET_XML, values, strings)
+        elif values:
+            part_name = template.sheet_parts[title]
+            patched[part_name] = patch_sheet_xml(template.parts[part_name].read(), values, strings)
+    if strings.added:
+        patched["xl/sharedStrings.xml"] = strings.render()
+
+    builder = _ZipBuilder()
+    for name, part in template.parts.items():
+        if name in patched:
+            builder.add(name, patched.pop(name).encode("utf-8"), part.info.date_time)
+        else:
+            builder.copy(part)
+    for name, xml in patched.items():
+        builder.add(name, xml.encode("utf-8"))
+    buffer = builder.finish()
+    logger.info(f"DCF template export (xml) completed, buffer size: {buffer.getbuffer().nbytes/1024:.1f}KB")
+    return buffer
@@ -0,0 +1,53 @@
+"""ZIP archives streamed member by member.
+
+zipfile writes to any object with a write() method; without seek() it falls
+back to data descriptors, so an archive can be produced front to back. Each
+member is generated in a thread, and its compressed bytes are yielded before
+the next member is built: the first byte goes out after the first member and
+memory holds one member at a time, however many there are.
+"""
+import asyncio
+import logging
+import zipfile
+from typing import AsyncIterator, Callable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Sink:
+    """Write-only file object collecting what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def stream_zip(members: Iterable[Tuple[str, Callable[[], bytes]]]) -> AsyncIterator[bytes]:
+    """Yield a deflated ZIP archive of members, given as (archive name, function producing the content)."""
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    count = 0
+    try:
+        for arcname, produce in members:
+
+            def write_member(arcname=arcname, produce=produce) -> None:
+                archive.writestr(arcname, produce())
+
+            await asyncio.to_thread(write_member)
+            count += 1
+            yield sink.drain()
+    finally:
+        # Writes the central directory (or just releases the archive when the client went away)
+        archive.close()
+    yield sink.drain()
+    logger.info(f"Streamed ZIP archive with {count} files")
@@ -0,0 +1,241 @@
+"""Durable storage of background jobs in a local SQLite file.
+
+A job row holds the options, status and final result; the uploaded PDFs, the
+per-file stage checkpoints (disambiguation, validated statements) and the
+progress events live in side tables. After a restart unfinished jobs are read
+back and resumed from their checkpoints. All statements run on one dedicated
+thread, so writes keep their order and never block the event loop.
+"""
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.infrastructure import config
+from src.infrastructure.uploads import SpooledPdf, discard_all, spool_stream
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " id TEXT PRIMARY KEY,"
+    " session_id TEXT NOT NULL,"
+    " idempotency_key TEXT,"
+    " fingerprint TEXT,"
+    " options TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " started_at REAL,"
+    " finished_at REAL,"
+    " error TEXT,"
+    " error_status INTEGER,"
+    " summary TEXT,"
+    " export BLOB,"
+    " export_media_type TEXT,"
+    " export_filename TEXT)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs(session_id, idempotency_key) WHERE idempotency_key IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)",
+    "CREATE TABLE IF NOT EXISTS job_files ("
+    " job_id TEXT NOT NULL,"
+    " idx INTEGER NOT NULL,"
+    " name TEXT NOT NULL,"
+    " size INTEGER NOT NULL,"
+    " status TEXT NOT NULL,"
+    " error TEXT,"
+    " statements TEXT,"
+    " pdf BLOB,"
+    " PRIMARY KEY (job_id, idx))",
+    "CREATE TABLE IF NOT EXISTS job_stages ("
+    " job_id TEXT NOT NULL,"
+    " idx INTEGER NOT NULL,"
+    " stage TEXT NOT NULL,"
+    " value TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " PRIMARY KEY (job_id, idx, stage))",
+    "CREATE TABLE IF NOT EXISTS job_events ("
+    " job_id TEXT NOT NULL,"
+    " id INTEGER NOT NULL,"
+    " event TEXT NOT NULL,"
+    " PRIMARY KEY (job_id, id))",
+)
+CHILD_TABLES = ("job_files", "job_stages", "job_events")
+
+
+class JobStore:
+    """SQLite tables of jobs, their input files, stage checkpoints and progress events."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL survives process crashes; only an OS crash can lose the last commits
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        logger.info(f"Job store opened at {path}")
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a store method on the store thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def run_nowait(self, fn: Callable, *args) -> None:
+        """Queue a write on the store thread without waiting for it (e.g. from sync callbacks)."""
+        self._executor.submit(self._logged, fn, *args)
+
+    def _logged(self, fn: Callable, *args) -> None:
+        try:
+            fn(*args)
+        except sqlite3.Error as e:
+            logger.warning(f"Job store write {fn.__name__} failed: {e}")
+
+    def create_job(self, job: dict, files: list[dict], uploads: list[SpooledPdf]) -> None:
+        """Insert a job with its files; raises sqlite3.IntegrityError on a duplicate idempotency key.
+
+        The PDFs are bound straight from their memory maps, without a copy on the Python heap.
+        """
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, session_id, idempotency_key, fingerprint, options, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["session_id"], job["idempotency_key"], job["fingerprint"], json.dumps(job["options"]), job["status"], job["created_at"]),
+            )
+            for idx, (f, upload) in enumerate(zip(files, uploads)):
+                with contextlib.ExitStack() as stack:
+                    pdf = stack.enter_context(upload.view()) if upload.size else b""
+                    self._conn.execute(
+                        "INSERT INTO job_files (job_id, idx, name, size, status, pdf) VALUES (?, ?, ?, ?, ?, ?)",
+                        (job["id"], idx, f["name"], f["size"], f["status"], pdf),
+                    )
+
+    def find_by_idempotency_key(self, session_id: str, idempotency_key: str) -> Optional[tuple[str, Optional[str]]]:
+        """Return (job id, request fingerprint) of the job submitted with this key, if any."""
+        return self._conn.execute(
+            "SELECT id, fingerprint FROM jobs WHERE session_id = ? AND idempotency_key = ?", (session_id, idempotency_key)
+        ).fetchone()
+
+    def update_job(self, job_id: str, **fields) -> None:
+        if "summary" in fields and fields["summary"] is not None:
+            fields["summary"] = json.dumps(fields["summary"], ensure_ascii=False)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def update_file(self, job_id: str, idx: int, status: str, error: Optional[str], statements: list[dict]) -> None:
+        with self._conn:
+            self._conn.execute(
+                "UPDATE job_files SET status = ?, error = ?, statements = ? WHERE job_id = ? AND idx = ?",
+                (status, error, json.dumps(statements, ensure_ascii=False), job_id, idx),
+            )
+
+    def load_payloads(self, job_id: str) -> list[SpooledPdf]:
+        """Copy the uploaded PDFs of a job back into spool files, streaming the blobs where sqlite3 can."""
+        rows = self._conn.execute(
+            "SELECT rowid, name, pdf IS NULL FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,)
+        ).fetchall()
+        uploads: list[SpooledPdf] = []
+        try:
+            for rowid, name, missing in rows:
+                if missing:
+                    uploads.append(spool_stream(name, io.BytesIO()))
+                elif hasattr(self._conn, "blobopen"):
+                    with self._conn.blobopen("job_files", "pdf", rowid, readonly=True) as blob:
+                        uploads.append(spool_stream(name, blob))
+                else:
+                    (pdf,) = self._conn.execute("SELECT pdf FROM job_files WHERE rowid = ?", (rowid,)).fetchone()
+                    uploads.append(spool_stream(name, io.BytesIO(pdf)))
+        except BaseException:
+            discard_all(uploads)
+            raise
+        return uploads
+
+    def drop_payloads(self, job_id: str) -> None:
+        """Forget the uploaded PDFs of a finished job; its result is stored separately."""
+        with self._conn:
+            self._conn.execute("UPDATE job_files SET pdf = NULL WHERE job_id = ?", (job_id,))
+
+    def save_stage(self, job_id: str, idx: int, stage: str, value: dict) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_stages (job_id, idx, stage, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, idx, stage, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+
+    def load_stages(self, job_id: str) -> dict[int, dict[str, dict]]:
+        """Checkpoints of the job per file index and stage name."""
+        stages: dict[int, dict[str, dict]] = {}
+        for idx, stage, value in self._conn.execute("SELECT idx, stage, value FROM job_stages WHERE job_id = ?", (job_id,)):
+            stages.setdefault(idx, {})[stage] = json.loads(value)
+        return stages
+
+    def append_event(self, job_id: str, event: dict) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_events (job_id, id, event) VALUES (?, ?, ?)",
+                (job_id, event["id"], json.dumps(event, ensure_ascii=False)),
+            )
+
+    def load_job(self, job_id: str) -> Optional[dict]:
+        """The job row with its files and events as plain dicts, or None."""
+        cursor = self._conn.execute(
+            "SELECT id, session_id, options, status, created_at, started_at, finished_at, error, error_status,"
+            " summary, export, export_media_type, export_filename FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([column[0] for column in cursor.description], row))
+        job["options"] = json.loads(job["options"])
+        job["summary"] = json.loads(job["summary"]) if job["summary"] is not None else None
+        job["files"] = [
+            {"name": name, "size": size, "status": status, "error": error, "statements": json.loads(statements) if statements else []}
+            for name, size, status, error, statements in self._conn.execute(
+                "SELECT name, size, status, error, statements FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,)
+            )
+        ]
+        job["events"] = [
+            json.loads(event)
+            for (event,) in self._conn.execute("SELECT event FROM job_events WHERE job_id = ? ORDER BY id", (job_id,))
+        ]
+        return job
+
+    def unfinished_job_ids(self) -> list[str]:
+        rows = self._conn.execute("SELECT id FROM jobs WHERE status NOT IN ('done', 'failed') ORDER BY created_at").fetchall()
+        return [job_id for (job_id,) in rows]
+
+    def delete_finished_before(self, cutoff: float) -> int:
+        with self._conn:
+            ids = [job_id for (job_id,) in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            )]
+            for table in CHILD_TABLES:
+                self._conn.executemany(f"DELETE FROM {table} WHERE job_id = ?", [(job_id,) for job_id in ids])
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        return len(ids)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+def open_job_store() -> Optional[JobStore]:
+    """Open the configured job store, or None when jobs are kept in memory only."""
+    if not config.is_job_store_enabled():
+        return None
+    try:
+        return JobStore(config.get_job_store_path())
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Job store unavailable, jobs are kept in memory only: {e}")
+        return None
@@ -0,0 +1,137 @@
+"""Incremental parsing of multipart/form-data request bodies.
+
+request.form() (and with it File()/Form() parameters) returns only once the
+whole body has arrived. iter_form feeds the chunks of request.stream() to
+python-multipart's parser as they come in and yields every form field as soon
+as it is complete and every uploaded file as soon as its last byte has been
+spooled (uploads.SpooledPdf), so a caller can start on the first file while the
+client is still sending the next ones.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+from starlette.requests import Request
+
+from src.infrastructure.uploads import SpooledPdf, SpoolWriter, UploadTooLarge, upload_stats
+
+logger = logging.getLogger(__name__)
+
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class MalformedForm(Exception):
+    """The body is not a well-formed multipart/form-data form."""
+
+
+@dataclass
+class FormField:
+    name: str
+    value: str
+
+
+@dataclass
+class FormFile:
+    """A file part of the form, spooled; received_at is time.perf_counter() when its last byte arrived."""
+
+    field: str
+    upload: SpooledPdf
+    received_at: float
+
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+async def iter_form(request: Request, max_file_bytes: int, max_request_bytes: int) -> AsyncIterator[Union[FormField, FormFile]]:
+    """Yield the fields and spooled files of a multipart body in body order while it is received.
+
+    Raises MalformedForm, or UploadTooLarge once a file or all files together cross their limit.
+    Files yielded belong to the caller; a partly written file is removed when the iteration stops.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise MalformedForm("Expected a multipart/form-data body")
+
+    # The parser reports through synchronous callbacks; they queue events that are handled after each chunk
+    events: list[tuple[str, bytes]] = []
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_end() -> None:
+        events.append(("header", bytes(header_field) + b"\0" + bytes(header_value)))
+        header_field.clear()
+        header_value.clear()
+
+    callbacks = {
+        "on_part_begin": lambda: events.append(("begin", b"")),
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", b"")),
+        "on_header_field": lambda data, start, end: header_field.extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+        "on_header_end": on_header_end,
+    }
+    parser = multipart.MultipartParser(params[b"boundary"], callbacks)
+
+    name: Optional[str] = None
+    filename: Optional[str] = None
+    writer: Optional[SpoolWriter] = None
+    value = bytearray()
+    file_bytes = 0
+    files = 0
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                raise MalformedForm(f"Malformed multipart body: {e}")
+            for kind, data in events:
+                if kind == "begin":
+                    name, filename, writer = None, None, None
+                    value.clear()
+                elif kind == "header":
+                    field, _, header = data.partition(b"\0")
+                    if field.lower() == b"content-disposition":
+                        _, options = parse_options_header(header)
+                        name = _decode(options.get(b"name", b""))
+                        filename = _decode(options[b"filename"]) if b"filename" in options else None
+                elif kind == "data":
+                    if filename is not None:
+                        if writer is None:
+                            files += 1
+                            writer = SpoolWriter(filename or f"soubor_{files}.pdf", max_file_bytes)
+                        file_bytes += len(data)
+                        if file_bytes > max_request_bytes:
+                            upload_stats.rejected += 1
+                            raise UploadTooLarge(f"Files are larger than {max_request_bytes // (1024 * 1024)}MB in total")
+                        await writer.write(data)
+                    else:
+                        value.extend(data)
+                        if len(value) > MAX_FIELD_BYTES:
+                            raise MalformedForm(f"Form field '{name}' is too long")
+                elif kind == "end":
+                    if filename is not None:
+                        if writer is None:
+                            # A file part without data
+                            files += 1
+                            writer = SpoolWriter(filename or f"soubor_{files}.pdf", max_file_bytes)
+                        finished, writer = writer.finish(), None
+                        yield FormFile(field=name or "", upload=finished, received_at=time.perf_counter())
+                    else:
+                        yield FormField(name=name or "", value=_decode(bytes(value)))
+            events.clear()
+        parser.finalize()
+    finally:
+        if writer is not None:
+            writer.abort()
@@ -0,0 +1,168 @@
+"""Find the pages of an annual report that hold the Rozvaha and the VZZ.
+
+Annual reports are often 60-150 pages while the statements take 2-4 of them.
+Every page of the text layer is scored by the statement headings and the row
+labels from the statement indexes it contains; the best pages per statement
+are sliced into small PDFs so only those are sent to the model. Whenever a
+statement cannot be located (scanned PDF, unusual layout), the full document
+is used for it instead.
+"""
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional
+
+from src.infrastructure import config
+from src.infrastructure.pdf.text_layer import normalize_text, read_page_texts, slice_pages
+from src.shared import utils
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_HEADINGS: Dict[str, tuple[str, ...]] = {
+    "rozvaha": ("rozvaha", "aktiva celkem", "pasiva celkem"),
+    "vzz": ("vykaz zisku a ztraty", "vysledek hospodareni za ucetni obdobi"),
+}
+HEADING_BONUS = 3
+# Short labels ("Zásoby", "Výnosy") also appear in the notes and would mislocate statements
+MIN_LABEL_CHARS = 12
+# Pages scoring below this share of the best page are not part of the statement
+RELATIVE_SCORE_CUTOFF = 0.4
+
+
+@lru_cache(maxsize=None)
+def _statement_labels(statement_type: str) -> frozenset[str]:
+    if statement_type == "rozvaha":
+        names = utils.load_balance_sheet_row_names()
+    else:
+        names = utils.load_profit_and_loss_row_names()
+    labels = (normalize_text(name) for name in names.values())
+    return frozenset(label for label in labels if len(label) >= MIN_LABEL_CHARS)
+
+
+def score_page(statement_type: str, normalized_text: str) -> int:
+    """Number of distinct row labels on the page, plus a bonus for a statement heading."""
+    score = sum(1 for label in _statement_labels(statement_type) if label in normalized_text)
+    if any(heading in normalized_text for heading in STATEMENT_HEADINGS[statement_type]):
+        score += HEADING_BONUS
+    return score
+
+
+def locate_statement_pages(page_texts: list[str], min_score: int = 6, max_pages: int = 6) -> Dict[str, list[int]]:
+    """Return the 0-based pages of each statement type; types that were not found are omitted."""
+    normalized = [normalize_text(text) for text in page_texts]
+    located: Dict[str, list[int]] = {}
+    for statement_type in STATEMENT_HEADINGS:
+        scores = [score_page(statement_type, text) for text in normalized]
+        best = max(scores, default=0)
+        if best < min_score:
+            continue
+        cutoff = max(min_score, best * RELATIVE_SCORE_CUTOFF)
+        candidates = sorted((page for page, score in enumerate(scores) if score >= cutoff), key=lambda p: -scores[p])
+        selected = set(candidates[:max_pages])
+        # A statement often ends on a short continuation page; take neighbours that pass the absolute minimum
+        grown = True
+        while grown and len(selected) < max_pages:
+            grown = False
+            for page in sorted(selected):
+                for neighbour in (page - 1, page + 1):
+                    if 0 <= neighbour < len(scores) and neighbour not in selected and scores[neighbour] >= min_score:
+                        if len(selected) < max_pages:
+                            selected.add(neighbour)
+                            grown = True
+        located[statement_type] = sorted(selected)
+    return located
+
+
+@dataclass
+class StatementPdfs:
+    """The uploaded PDF plus smaller PDFs holding only the located statement pages."""
+    full: bytes
+    page_count: int = 0
+    pages: Dict[str, list[int]] = field(default_factory=dict)
+    slices: Dict[str, bytes] = field(default_factory=dict)
+    # All located pages; used where both statements are needed (disambiguation, combined extraction)
+    overview: Optional[bytes] = None
+    page_texts: Optional[list[str]] = None
+
+    def for_statement(self, statement_type: str) -> bytes:
+        return self.slices.get(statement_type, self.full)
+
+    def statement_texts(self, statement_type: str) -> Optional[list[str]]:
+        """Text of the located pages of statement_type, or None if it was not located."""
+        if self.page_texts is None or statement_type not in self.pages:
+            return None
+        return [self.page_texts[page] for page in self.pages[statement_type]]
+
+    def for_overview(self) -> bytes:
+        return self.overview or self.full
+
+
+class PageLocatorStats:
+    """Counters of how much of the uploaded documents is actually sent to the model."""
+
+    def __init__(self):
+        self.files = 0
+        self.located = 0
+        self.pages_total = 0
+        self.pages_selected = 0
+        self.bytes_full = 0
+        self.bytes_per_statement = 0
+
+    def record(self, result: StatementPdfs) -> None:
+        self.files += 1
+        self.located += 1 if result.pages else 0
+        self.pages_total += result.page_count
+        self.pages_selected += sum(len(pages) for pages in result.pages.values())
+        self.bytes_full += len(result.full)
+        statement_bytes = [len(result.for_statement(st)) for st in STATEMENT_HEADINGS]
+        self.bytes_per_statement += sum(statement_bytes) // len(statement_bytes)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "files": self.files,
+            "located": self.located,
+            "pages_total": self.pages_total,
+            "pages_selected": self.pages_selected,
+            "bytes_full": self.bytes_full,
+            "bytes_per_statement": self.bytes_per_statement,
+        }
+
+
+page_locator_stats = PageLocatorStats()
+
+
+def split_statement_pdfs(pdf_bytes: bytes, page_texts: Optional[list[str]] = None) -> StatementPdfs:
+    """Locate the statement pages and slice them out (CPU bound, run it in a thread)."""
+    result = StatementPdfs(full=pdf_bytes)
+    if page_texts is None:
+        page_texts = read_page_texts(pdf_bytes)
+    if page_texts is not None:
+        result.page_texts = page_texts
+        result.page_count = len(page_texts)
+        located = locate_statement_pages(
+            page_texts,
+            min_score=config.get_page_locator_min_score(),
+            max_pages=config.get_page_locator_max_pages(),
+        )
+        for statement_type, pages in located.items():
+            if len(pages) >= result.page_count:
+                continue
+            sliced = slice_pages(pdf_bytes, pages)
+            if sliced is not None:
+                result.pages[statement_type] = pages
+                result.slices[statement_type] = sliced
+
+        # Without both statements located, disambiguation must see the whole document
+        if set(result.pages) == set(STATEMENT_HEADINGS):
+            overview_pages = sorted({page for pages in result.pages.values() for page in pages})
+            result.overview = slice_pages(pdf_bytes, overview_pages)
+
+    page_locator_stats.record(result)
+    if result.pages:
+        located_text = ", ".join(f"{st} on pages {[p + 1 for p in pages]}" for st, pages in result.pages.items())
+        sizes = ", ".join(f"{st} {len(data)/1024:.1f}KB" for st, data in result.slices.items())
+        logger.info(f"Located {located_text} of {result.page_count}; slices: {sizes} (full PDF {len(pdf_bytes)/1024:.1f}KB)")
+    elif page_texts is not None:
+        logger.info(f"No statement pages located in {result.page_count} pages, using the full PDF")
+    return result
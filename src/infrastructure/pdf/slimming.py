@@ -0,0 +1,245 @@
+"""Shrink scanned PDFs before they are uploaded to the model.
+
+Scanned annual reports often carry 300-600 dpi page images, so a filing of a
+few dozen pages can be tens of megabytes. Gemini does not read them better
+than a 150 dpi rendition, but every byte has to be uploaded. slim_pdf
+downsamples page images above a target DPI (optionally converting those to
+grayscale), drops metadata, thumbnails and (for documents without a text
+layer) embedded font programs, and recompresses the content streams. The work
+is CPU bound and runs in a process pool (slim_pdf_async). The slimmed PDF is
+only used when it is actually smaller. Images that need no downsampling are
+never re-encoded, since JPEG recompression is lossy input to OCR; slimming is
+off by default until its effect on extraction accuracy has been measured
+(benchmarks.pdf_slimming --live).
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from src.infrastructure import config
+from src.infrastructure.pdf.text_layer import _pypdf
+
+logger = logging.getLogger(__name__)
+
+POINTS_PER_INCH = 72
+FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+# Bilevel (1 bit) scans are already small with CCITT/JBIG2 and become larger as JPEG
+SKIPPED_IMAGE_MODES = {"1", "P"}
+
+
+@dataclass
+class SlimResult:
+    pdf_bytes: bytes
+    bytes_before: int
+    bytes_after: int
+    images_resampled: int = 0
+    seconds: float = 0.0
+
+    @property
+    def slimmed(self) -> bool:
+        return self.bytes_after < self.bytes_before
+
+
+def _pil_image():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def _effective_dpi(page, width_px: int, height_px: int) -> float:
+    # Page placement of an image is not known here; scans cover the whole page, so assume that.
+    # For smaller images (logos, signatures) this underestimates the DPI, which only means they are kept.
+    width_in = float(page.mediabox.width) / POINTS_PER_INCH
+    height_in = float(page.mediabox.height) / POINTS_PER_INCH
+    if width_in <= 0 or height_in <= 0:
+        return 0.0
+    return max(width_px / width_in, height_px / height_in)
+
+
+def _resample_page_images(page, dpi: int, grayscale: bool, jpeg_quality: int) -> int:
+    Image = _pil_image()
+    if Image is None:
+        return 0
+    resampled = 0
+    for image_file in page.images:
+        try:
+            image = image_file.image
+            if image is None or image.mode in SKIPPED_IMAGE_MODES or "A" in image.getbands():
+                continue
+            scale = dpi / _effective_dpi(page, image.width, image.height) if image.width and image.height else 1.0
+            if scale >= 1:
+                # Re-encoding alone (e.g. for grayscale) only adds JPEG artefacts
+                continue
+            image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+            if grayscale:
+                image = image.convert("L")
+            elif image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            image_file.replace(image, quality=jpeg_quality)
+            resampled += 1
+        except Exception as e:
+            logger.debug(f"Keeping image {getattr(image_file, 'name', '?')} as is: {e}")
+    return resampled
+
+
+def _strip_font_programs(page) -> None:
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources is not None else None
+    if fonts is None:
+        return
+    for font_ref in fonts.get_object().values():
+        font = font_ref.get_object()
+        descriptors = [font.get("/FontDescriptor")]
+        descriptors += [descendant.get_object().get("/FontDescriptor") for descendant in font.get("/DescendantFonts", [])]
+        for descriptor in descriptors:
+            if descriptor is None:
+                continue
+            descriptor = descriptor.get_object()
+            for key in FONT_FILE_KEYS:
+                descriptor.pop(key, None)
+
+
+def slim_pdf(pdf_bytes: bytes, dpi: int = 150, grayscale: bool = False, jpeg_quality: int = 75, strip_fonts: bool = False) -> SlimResult:
+    """Return a slimmed copy of the PDF, or the original bytes if slimming fails or does not help.
+
+    Runs in a worker process, so it only takes and returns picklable values. Font
+    programs are removed only with strip_fonts, because the model reads born-digital
+    text by rendering it.
+    """
+    start = time.perf_counter()
+    unchanged = SlimResult(pdf_bytes=pdf_bytes, bytes_before=len(pdf_bytes), bytes_after=len(pdf_bytes))
+    pypdf = _pypdf()
+    if pypdf is None:
+        return unchanged
+    try:
+        writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(pdf_bytes)))
+        resampled = 0
+        for page in writer.pages:
+            resampled += _resample_page_images(page, dpi, grayscale, jpeg_quality)
+            if strip_fonts:
+                _strip_font_programs(page)
+            for key in ("/Thumb", "/PieceInfo"):
+                page.pop(key, None)
+            page.compress_content_streams()
+        writer.root_object.pop("/Metadata", None)
+        writer.root_object.pop("/PieceInfo", None)
+        writer.metadata = None
+        writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        slimmed = buffer.getvalue()
+    except Exception as e:
+        logger.warning(f"Slimming the PDF failed, using the original: {e}")
+        return unchanged
+    if len(slimmed) >= len(pdf_bytes):
+        unchanged.seconds = time.perf_counter() - start
+        return unchanged
+    return SlimResult(
+        pdf_bytes=slimmed,
+        bytes_before=len(pdf_bytes),
+        bytes_after=len(slimmed),
+        images_resampled=resampled,
+        seconds=time.perf_counter() - start,
+    )
+
+
+class PdfSlimmingStats:
+    """Counters of the bytes saved by slimming, reported by GET /stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.slimmed = 0
+        self.images_resampled = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.seconds = 0.0
+
+    def record(self, result: SlimResult) -> None:
+        with self._lock:
+            self.files += 1
+            self.slimmed += 1 if result.slimmed else 0
+            self.images_resampled += result.images_resampled
+            self.bytes_before += result.bytes_before
+            self.bytes_after += result.bytes_after
+            self.seconds += result.seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": config.is_pdf_slimming_enabled(),
+                "files": self.files,
+                "slimmed": self.slimmed,
+                "images_resampled": self.images_resampled,
+                "bytes_before": self.bytes_before,
+                "bytes_after": self.bytes_after,
+                "ratio": round(self.bytes_after / self.bytes_before, 3) if self.bytes_before else None,
+                "avg_seconds": round(self.seconds / self.files, 3) if self.files else None,
+            }
+
+
+pdf_slimming_stats = PdfSlimmingStats()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # By now the process runs threads (executors, to_thread workers, HTTP pools); forking
+            # it could copy a held lock into the worker, so workers start from a fresh interpreter
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=config.get_pdf_slimming_workers(), mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+async def slim_pdf_async(pdf_bytes: bytes, strip_fonts: bool = False) -> bytes:
+    """Slim the PDF in the process pool when slimming is enabled and the PDF is large enough."""
+    if not config.is_pdf_slimming_enabled() or len(pdf_bytes) < config.get_pdf_slimming_min_kb() * 1024:
+        return pdf_bytes
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            _get_pool(),
+            slim_pdf,
+            pdf_bytes,
+            config.get_pdf_slimming_dpi(),
+            config.is_pdf_slimming_grayscale(),
+            config.get_pdf_slimming_jpeg_quality(),
+            strip_fonts,
+        )
+    except Exception as e:
+        logger.warning(f"PDF slimming worker failed, using the original: {e}")
+        return pdf_bytes
+    pdf_slimming_stats.record(result)
+    logger.info(
+        f"Slimmed PDF {result.bytes_before/1024:.1f}KB -> {result.bytes_after/1024:.1f}KB "
+        f"({result.images_resampled} images resampled) in {result.seconds:.2f}s"
+    )
+    return result.pdf_bytes
+
+
+def close_slimming_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def slim_documents(documents: Dict[str, bytes], strip_fonts: bool = False) -> Dict[str, bytes]:
+    """Slim every distinct PDF of documents once; keys sharing the same bytes object share the result."""
+    distinct = {id(pdf_bytes): pdf_bytes for pdf_bytes in documents.values()}
+    slimmed = await asyncio.gather(*(slim_pdf_async(pdf_bytes, strip_fonts) for pdf_bytes in distinct.values()))
+    by_id = dict(zip(distinct, slimmed))
+    return {key: by_id[id(pdf_bytes)] for key, pdf_bytes in documents.items()}
@@ -0,0 +1,245 @@
+"""Deterministic extraction of statement tables from the PDF text layer.
+
+Born-digital filings carry the statement tables as text, so rows can be read
+without a model: each line is split into cells on runs of two or more spaces
+(layout-preserving text), the row is identified by its number from the
+"Označení" column or by its label from the statement index, and the trailing
+numeric cells are mapped to the statement's value columns. A row with a single
+value (the other year blank) is placed by where the value ends on the line,
+compared with the rows of the same page that fill both year columns; when that
+cannot be decided the whole parse is rejected. The result has the shape
+validate_payload expects; callers only trust it once it validates.
+"""
+import logging
+import re
+import statistics
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from src.infrastructure.pdf.text_layer import normalize_text
+from src.shared import utils
+
+logger = logging.getLogger(__name__)
+
+CELL_SEPARATOR = re.compile(r"\s{2,}")
+# Letter codes of the statutory forms ("A.", "B.II.", "C.I.1."), not part of the label
+ROW_CODE = re.compile(r"^[A-Z]{1,2}\.(?:[IVX]+\.)?(?:\d+\.)?$")
+NUMBER = re.compile(r"^\(?[-−–]?\s?\d{1,3}(?:[  ]\d{3})*\)?$|^\(?[-−–]?\d+\)?$")
+DASH = {"-", "–", "−", "—"}
+DATE = re.compile(r"\b(\d{1,2})\.\s?(\d{1,2})\.\s?((?:19|20)\d{2})\b")
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+BALANCE_SHEET_ASSETS_ROW = 1
+# Rows filling both year columns a page needs before a lone value on it can be placed
+MIN_ANCHOR_ROWS = 3
+
+
+class AmbiguousRow(ValueError):
+    """A row's values cannot be assigned to the statement's columns."""
+
+
+def _parse_number(cell: str) -> Optional[int]:
+    cell = cell.strip()
+    if cell in DASH:
+        return 0
+    if not NUMBER.match(cell):
+        return None
+    negative = cell.startswith("(") or any(sign in cell for sign in "-−–")
+    digits = re.sub(r"\D", "", cell)
+    return -int(digits) if negative else int(digits)
+
+
+def _subtree_ids(index: Dict[int, Any]) -> set[int]:
+    ids: set[int] = set()
+    for row_id, row in index.items():
+        ids.add(row_id)
+        ids.update(_subtree_ids(row.get("sub_rows") or {}))
+    return ids
+
+
+@lru_cache(maxsize=None)
+def _statement_layout(statement_type: str) -> tuple[Dict[str, tuple[int, ...]], frozenset[int], frozenset[int]]:
+    """Return (normalized label -> row ids, all row ids, asset row ids) for a statement type."""
+    if statement_type == "rozvaha":
+        index = utils.read_balance_sheet_index()
+        names = utils.load_balance_sheet_row_names()
+        assets = frozenset(_subtree_ids({BALANCE_SHEET_ASSETS_ROW: index[BALANCE_SHEET_ASSETS_ROW]}))
+    else:
+        names = utils.load_profit_and_loss_row_names()
+        assets = frozenset()
+    labels: Dict[str, list[int]] = {}
+    for row_id, name in names.items():
+        labels.setdefault(normalize_text(name), []).append(row_id)
+    return {label: tuple(sorted(ids)) for label, ids in labels.items()}, frozenset(names), assets
+
+
+def _match_label(statement_type: str, label: str) -> tuple[int, ...]:
+    labels, _, _ = _statement_layout(statement_type)
+    normalized = normalize_text(label)
+    if not normalized:
+        return ()
+    if normalized in labels:
+        return labels[normalized]
+    # Printed labels are often shortened or slightly longer than the index names
+    if len(normalized) >= 12:
+        matches = sorted(
+            row_id
+            for known, ids in labels.items()
+            if known.startswith(normalized) or normalized.startswith(known)
+            for row_id in ids
+        )
+        return tuple(matches)
+    return ()
+
+
+def _split_cells(line: str) -> list[tuple[str, int]]:
+    """Cells of a layout text line with the offset each one ends at."""
+    cells: list[tuple[str, int]] = []
+    start = 0
+    for separator in CELL_SEPARATOR.finditer(line):
+        if line[start:separator.start()].strip():
+            cells.append((line[start:separator.start()].strip(), separator.start()))
+        start = separator.end()
+    if line[start:].strip():
+        cells.append((line[start:].strip(), len(line.rstrip())))
+    return cells
+
+
+def _year_columns(lines_numbers: list[list[tuple[int, int]]]) -> Optional[tuple[float, float]]:
+    """Where the current- and previous-year values of a page end: the last two values of rows with two or more."""
+    full = [numbers[-2:] for numbers in lines_numbers if len(numbers) >= 2]
+    if len(full) < MIN_ANCHOR_ROWS:
+        return None
+    current = statistics.median(end for (_, end), _ in full)
+    previous = statistics.median(end for _, (_, end) in full)
+    return (current, previous) if current < previous else None
+
+
+def _lone_value_column(end: int, year_columns: Optional[tuple[float, float]]) -> int:
+    """0 when a lone value sits in the current-year column, 1 for the previous year."""
+    if year_columns is None:
+        raise AmbiguousRow("no rows on the page to locate the year columns")
+    current, previous = year_columns
+    return 0 if abs(end - current) <= abs(end - previous) else 1
+
+
+def _row_values(
+    statement_type: str, row_id: int, numbers: list[int], lone_column: Optional[int] = None
+) -> Optional[Dict[str, int]]:
+    """Map a row's values to its columns; lone_column places a single value (see _lone_value_column)."""
+    _, _, assets = _statement_layout(statement_type)
+    columns = ("netto", "netto_minule") if statement_type == "rozvaha" else ("současné", "minulé")
+    if statement_type == "rozvaha" and row_id in assets and len(numbers) == 4:
+        return {"brutto": numbers[0], "korekce": numbers[1], "netto": numbers[2], "netto_minule": numbers[3]}
+    if len(numbers) == 2:
+        return {columns[0]: numbers[0], columns[1]: numbers[1]}
+    if len(numbers) == 1:
+        if lone_column is None:
+            raise AmbiguousRow(f"row {row_id} has a single value and its column is unknown")
+        values = dict.fromkeys(columns, 0)
+        values[columns[lone_column]] = numbers[0]
+        return values
+    return None
+
+
+def _expected_columns(statement_type: str, row_id: int) -> set[int]:
+    _, _, assets = _statement_layout(statement_type)
+    if statement_type == "rozvaha" and row_id in assets:
+        return {4, 2, 1}
+    return {2, 1}
+
+
+def _identify_row(
+    statement_type: str, cells: list[str], numbers: list[tuple[int, int]], row_ids: frozenset[int], last_row: int
+) -> Optional[int]:
+    """Row id of a line from its row number or label; a row number parsed as the first value is removed from numbers."""
+    explicit = [int(cell) for cell in cells if cell.isdigit() and int(cell) in row_ids]
+    label = " ".join(cell for cell in cells if not cell.isdigit() and not ROW_CODE.match(cell))
+    candidates = [row for row in _match_label(statement_type, label) if row > last_row]
+    if explicit:
+        return explicit[0]
+    if candidates:
+        row_id = candidates[0]
+        # The row number column follows the label and parses as the first number
+        if len(numbers) > 1 and numbers[0][0] == row_id:
+            numbers.pop(0)
+        return row_id
+    if len(numbers) > 1 and numbers[0][0] in row_ids and numbers[0][0] > last_row:
+        return numbers.pop(0)[0]
+    return None
+
+
+def find_statement_date(page_texts: list[str]) -> Optional[str]:
+    """Most frequent date on the statement pages as YYYY-MM-DD (the balance sheet date)."""
+    dates = Counter(
+        f"{year}-{int(month):02d}-{int(day):02d}"
+        for text in page_texts
+        for day, month, year in DATE.findall(text)
+        if 1 <= int(day) <= 31 and 1 <= int(month) <= 12
+    )
+    return dates.most_common(1)[0][0] if dates else None
+
+
+def _find_year(page_texts: list[str]) -> Optional[int]:
+    date = find_statement_date(page_texts)
+    if date is not None:
+        return int(date[:4])
+    years = Counter(int(year) for text in page_texts for year in YEAR.findall(text))
+    return years.most_common(1)[0][0] if years else None
+
+
+def extract_statement(statement_type: str, page_texts: list[str], min_coverage: float = 0.5) -> Optional[Dict[str, Any]]:
+    """Parse a statement from the text of its pages.
+
+    Returns {"rok": ..., "data": {"<row>": {...}}} with missing rows set to 0,
+    or None when too few rows (below min_coverage of the index) were found or
+    a single value of a row cannot be placed in its year column.
+    """
+    _, row_ids, _ = _statement_layout(statement_type)
+    rows: Dict[int, Dict[str, int]] = {}
+    last_row = 0
+
+    try:
+        for text in page_texts:
+            page_lines = []
+            for line in text.splitlines():
+                cells = _split_cells(line)
+                numbers: list[tuple[int, int]] = []
+                while cells and (value := _parse_number(cells[-1][0])) is not None:
+                    numbers.insert(0, (value, cells.pop()[1]))
+                if numbers and cells:
+                    page_lines.append(([cell for cell, _ in cells], numbers))
+
+            page_rows: list[tuple[int, list[tuple[int, int]]]] = []
+            for cells, numbers in page_lines:
+                row_id = _identify_row(statement_type, cells, numbers, row_ids, last_row)
+                if row_id is None or row_id <= last_row or row_id in rows:
+                    continue
+                if len(numbers) not in _expected_columns(statement_type, row_id) and len(numbers) - 1 in _expected_columns(statement_type, row_id):
+                    # A leading note reference ("5", "12") in front of the values
+                    numbers.pop(0)
+                if len(numbers) in _expected_columns(statement_type, row_id):
+                    page_rows.append((row_id, numbers))
+                    last_row = row_id
+
+            # Located from the values alone, once row numbers and note references are removed
+            year_columns = _year_columns([numbers for _, numbers in page_rows])
+            for row_id, numbers in page_rows:
+                lone_column = _lone_value_column(numbers[0][1], year_columns) if len(numbers) == 1 else None
+                rows[row_id] = _row_values(statement_type, row_id, [value for value, _ in numbers], lone_column)
+    except AmbiguousRow as e:
+        logger.info(f"Text layer extraction of {statement_type} rejected, {e}")
+        return None
+
+    coverage = len(rows) / len(row_ids)
+    year = _find_year(page_texts)
+    # An all-zero table passes every sum rule, so it is never trusted
+    has_values = any(value for row in rows.values() for value in row.values())
+    if coverage < min_coverage or year is None or not has_values:
+        logger.info(f"Text layer extraction of {statement_type} found {len(rows)}/{len(row_ids)} rows (year: {year}), not usable")
+        return None
+
+    empty = {"současné": 0, "minulé": 0} if statement_type != "rozvaha" else {"netto": 0, "netto_minule": 0}
+    data = {str(row_id): rows.get(row_id, dict(empty)) for row_id in sorted(row_ids)}
+    logger.info(f"Text layer extraction of {statement_type} found {len(rows)}/{len(row_ids)} rows for year {year}")
+    return {"rok": year, "data": data}
@@ -0,0 +1,85 @@
+"""Local access to the text layer of PDFs.
+
+pypdf is imported lazily so the app still starts without it; every helper
+then reports that no text layer is available and callers fall back to
+sending the whole PDF to the model.
+"""
+import io
+import logging
+import re
+import unicodedata
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Pages with fewer characters than this are treated as scanned (no usable text layer)
+MIN_PAGE_TEXT_CHARS = 40
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        logger.warning("pypdf is not installed, local PDF text processing is disabled")
+        return None
+    return pypdf
+
+
+def read_page_texts(pdf_bytes: bytes) -> Optional[list[str]]:
+    """Return the layout-preserving text of every page, or None if the PDF has no usable text layer."""
+    pypdf = _pypdf()
+    if pypdf is None:
+        return None
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        texts = [_page_text(page) for page in reader.pages]
+    except Exception as e:
+        logger.warning(f"Reading the PDF text layer failed: {e}")
+        return None
+    if not any(len(text.strip()) >= MIN_PAGE_TEXT_CHARS for text in texts):
+        logger.info(f"PDF has no usable text layer ({len(texts)} pages)")
+        return None
+    return texts
+
+
+def _page_text(page) -> str:
+    # Layout mode keeps table columns apart (two or more spaces), which the table extractor relies on
+    try:
+        return page.extract_text(extraction_mode="layout") or ""
+    except Exception:
+        return page.extract_text() or ""
+
+
+def slice_pages(pdf_bytes: bytes, pages: list[int]) -> Optional[bytes]:
+    """Return a new PDF containing only the given 0-based pages, or None on failure."""
+    pypdf = _pypdf()
+    if pypdf is None:
+        return None
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        writer = pypdf.PdfWriter()
+        for page in pages:
+            writer.add_page(reader.pages[page])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        logger.warning(f"Slicing pages {pages} out of the PDF failed: {e}")
+        return None
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip diacritics and collapse everything but letters and digits to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r"[^0-9a-z]+", " ", stripped.lower()).strip()
+
+
+def render_pages_text(page_texts: list[str]) -> str:
+    """Compact text rendition of pages for the model: trailing spaces and blank lines dropped, columns kept aligned."""
+    pages = []
+    for number, text in enumerate(page_texts, start=1):
+        lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+        pages.append(f"--- Strana {number} ---\n" + "\n".join(lines))
+    # The prompts refer to "the attached PDF"; tell the model this text stands in for it
+    return "Přiložené PDF je předáno jako text jeho stránek se zachovaným rozložením sloupců.\n\n" + "\n\n".join(pages)
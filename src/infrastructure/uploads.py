@@ -0,0 +1,256 @@
+"""Bounded-memory handling of uploaded PDFs.
+
+Uploads are copied chunk by chunk into spool files (UPLOAD_SPOOL_DIR) instead
+of being read into memory whole, enforcing a per-file (UPLOAD_MAX_FILE_MB) and
+a per-request (UPLOAD_MAX_REQUEST_MB) size limit while they are copied. A
+spooled PDF is read back through a read-only memory map: hashing it or copying
+it into the job store walks the mapped pages without a heap copy, and its bytes
+are only materialized while the file is processed. Materialized bytes are
+charged to a process-wide budget (UPLOAD_MEMORY_BUDGET_MB); a file that does
+not fit waits until earlier ones finish, so a burst of large uploads slows
+down instead of exhausting memory.
+"""
+import asyncio
+import collections
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from typing import AsyncIterator, BinaryIO, Iterator, Optional
+
+from src.infrastructure import config
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """An upload exceeded the per-file or per-request size limit."""
+
+
+class SpooledPdf:
+    """An uploaded PDF kept in a spool file until it is discarded."""
+
+    def __init__(self, name: str, path: str, size: int):
+        self.name = name
+        self.path = path
+        self.size = size
+
+    @contextlib.contextmanager
+    def view(self) -> Iterator[mmap.mmap]:
+        """Read-only memory map of the file (must not be empty)."""
+        with open(self.path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+    def read(self) -> bytes:
+        if not self.size:
+            return b""
+        with self.view() as mapped:
+            return mapped[:]
+
+    def sha256(self) -> str:
+        if not self.size:
+            return hashlib.sha256(b"").hexdigest()
+        with self.view() as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+    def discard(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            return
+        upload_stats.spooled_now -= 1
+
+
+def discard_all(uploads: Optional[list[SpooledPdf]]) -> None:
+    for upload in uploads or []:
+        upload.discard()
+
+
+def _new_spool_file() -> tuple[int, str]:
+    directory = config.get_upload_spool_dir()
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=directory)
+
+
+class SpoolWriter:
+    """Spool file written chunk by chunk; write() raises UploadTooLarge past max_bytes."""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.size = 0
+        fd, self.path = _new_spool_file()
+        self._fh = os.fdopen(fd, "wb")
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            upload_stats.rejected += 1
+            raise UploadTooLarge(f"'{self.name}' is larger than {self.max_bytes // (1024 * 1024)}MB")
+        await asyncio.to_thread(self._fh.write, chunk)
+
+    def finish(self) -> SpooledPdf:
+        self._fh.close()
+        upload_stats.record_spooled(self.size)
+        return SpooledPdf(self.name, self.path, self.size)
+
+    def abort(self) -> None:
+        self._fh.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+
+async def spool_upload(upload, name: str, max_bytes: int) -> SpooledPdf:
+    """Copy an UploadFile into a spool file, raising UploadTooLarge past max_bytes."""
+    writer = SpoolWriter(name, max_bytes)
+    try:
+        while chunk := await upload.read(SPOOL_CHUNK_BYTES):
+            await writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def spool_stream(name: str, source: BinaryIO) -> SpooledPdf:
+    """Copy a readable binary stream (e.g. an SQLite blob) into a spool file."""
+    fd, path = _new_spool_file()
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            shutil.copyfileobj(source, fh, SPOOL_CHUNK_BYTES)
+            size = fh.tell()
+    except BaseException:
+        os.unlink(path)
+        raise
+    upload_stats.record_spooled(size)
+    return SpooledPdf(name, path, size)
+
+
+def remove_stale_spool_files(max_age_seconds: int = 24 * 3600) -> int:
+    """Delete spool files a crashed process left behind."""
+    directory = config.get_upload_spool_dir()
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.startswith("upload-") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"Removed {removed} stale upload spool files")
+    return removed
+
+
+class MemoryBudget:
+    """Bytes of uploads held in memory at once; reserve() waits, first come first served, until a file fits.
+
+    A file larger than the whole budget is let through once nothing else is held, so it cannot wait forever.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._waiters: collections.deque[tuple[int, asyncio.Future]] = collections.deque()
+
+    def _fits(self, size: int) -> bool:
+        return self.in_use == 0 or self.in_use + size <= self.limit_bytes
+
+    def _take(self, size: int) -> None:
+        self.in_use += size
+        self.peak = max(self.peak, self.in_use)
+
+    def _wake(self) -> None:
+        while self._waiters and self._fits(self._waiters[0][0]):
+            size, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._take(size)
+            future.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        if not self._waiters and self._fits(size):
+            self._take(size)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((size, future))
+            self.waits += 1
+            start = time.perf_counter()
+            logger.debug(f"Waiting for {size / 1024:.0f}KB of upload memory ({self.in_use / 1024:.0f}KB in use)")
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted just before the cancellation arrived
+                    self.in_use -= size
+                else:
+                    self._waiters.remove((size, future))
+                self._wake()
+                raise
+            finally:
+                self.wait_seconds += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            self.in_use -= size
+            self._wake()
+
+    def stats(self) -> dict:
+        return {
+            "limit_mb": round(self.limit_bytes / (1024 * 1024), 1),
+            "in_use_mb": round(self.in_use / (1024 * 1024), 1),
+            "peak_mb": round(self.peak / (1024 * 1024), 1),
+            "waiting_now": len(self._waiters),
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+class UploadStats:
+    def __init__(self):
+        self.spooled = 0
+        self.spooled_now = 0
+        self.spooled_bytes = 0
+        self.rejected = 0
+
+    def record_spooled(self, size: int) -> None:
+        self.spooled += 1
+        self.spooled_now += 1
+        self.spooled_bytes += size
+
+    def stats(self) -> dict:
+        return {
+            "spool_dir": config.get_upload_spool_dir(),
+            "spooled": self.spooled,
+            "spooled_now": self.spooled_now,
+            "spooled_mb": round(self.spooled_bytes / (1024 * 1024), 1),
+            "rejected": self.rejected,
+            "memory_budget": get_memory_budget().stats(),
+        }
+
+
+upload_stats = UploadStats()
+
+_budget: Optional[MemoryBudget] = None
+
+
+def get_memory_budget() -> MemoryBudget:
+    global _budget
+    if _budget is None:
+        _budget = MemoryBudget(config.get_upload_memory_budget_mb() * 1024 * 1024)
+    return _budget
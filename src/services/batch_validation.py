@@ -0,0 +1,356 @@
+"""Batch validation of extracted statements against the consistency rules.
+
+Re-validating stored extractions (e.g. after a tolerance change) with
+BalanceSheet / ProfitAndLoss.model_validate_with_tolerance builds a pydantic
+model per statement and evaluates every rule in Python. Here the statements of
+one type are stacked into a (statements, columns, rows) array over the rows of
+the compiled RuleMatrix and all rules of all statements are evaluated with one
+residuals call; Violation records are built only for the failed checks and are
+the same as those of the models.
+
+Unlike the models, a statement's violations are all reported together: the
+brutto - korekce row checks first, then the rules (the models stop at the row
+checks). Missing or null values count as 0 and the given tolerance applies to
+every statement. Reading the values out of the dicts is the dominant cost;
+callers that already hold the values as arrays build a StatementBatch directly.
+"""
+import asyncio
+import json
+import logging
+import operator
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional, Sequence, Union
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.domain.models.balance_sheet import brutto_korekce_violation
+from src.domain.models.rule_matrix import RuleMatrix
+from src.domain.models.rules import (
+    BALANCE_SHEET_RULE_MATRIX,
+    PREDEFINED_VALIDATION_RULES,
+    PROFIT_AND_LOSS_RULE_MATRIX,
+    PROFIT_AND_LOSS_RULES,
+)
+from src.domain.models.violations import Violation
+from src.infrastructure import config
+
+logger = logging.getLogger(__name__)
+
+BALANCE_SHEET = "rozvaha"
+PROFIT_AND_LOSS = "vzz"
+PROFIT_AND_LOSS_ALIASES = {"vzz", "ziskaztrata", "vzzcz"}
+
+# Stacked columns per statement type; the first two are the ones the rules run on
+BALANCE_SHEET_COLUMNS = ("netto", "netto_minule", "brutto", "korekce")
+PROFIT_AND_LOSS_COLUMNS = ("současné", "minulé")
+
+
+def normalize_statement_type(statement_type: Any) -> Optional[str]:
+    if statement_type == BALANCE_SHEET:
+        return BALANCE_SHEET
+    if statement_type in PROFIT_AND_LOSS_ALIASES:
+        return PROFIT_AND_LOSS
+    return None
+
+
+def _layout(statement_type: str) -> tuple[RuleMatrix, Sequence[str]]:
+    if statement_type == BALANCE_SHEET:
+        return BALANCE_SHEET_RULE_MATRIX, BALANCE_SHEET_COLUMNS
+    return PROFIT_AND_LOSS_RULE_MATRIX, PROFIT_AND_LOSS_COLUMNS
+
+
+@dataclass
+class StatementValidation:
+    """Result of one statement; index is its position in the input.
+
+    errors say why the statement could not be checked (bad JSON, type or values),
+    violations are the failed consistency checks.
+    """
+
+    index: int
+    statement_type: Optional[str]
+    rok: Any
+    errors: list[str] = field(default_factory=list)
+    violations: list[Violation] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors and not self.violations
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "statement_type": self.statement_type,
+            "rok": self.rok,
+            "valid": self.valid,
+            "errors": self.errors,
+            "violations": [violation.to_dict() for violation in self.violations],
+        }
+
+
+@dataclass
+class StatementBatch:
+    """Statements of one type stacked over the row ids of its RuleMatrix.
+
+    values is (statements, columns, rows) int64 with the columns of
+    BALANCE_SHEET_COLUMNS / PROFIT_AND_LOSS_COLUMNS, or object when a value is
+    outside int64; present marks the rows each statement has and, for balance
+    sheets, paired those with both brutto and korekce set. input_errors holds
+    what made a statement unreadable; its rules are not evaluated. extra_rows
+    are balance-sheet rows outside the rules that still get the brutto - korekce
+    check: (statement, row id, brutto, korekce, netto).
+    """
+
+    statement_type: str
+    years: list[Any]
+    values: np.ndarray
+    present: np.ndarray
+    input_errors: list[list[str]]
+    paired: Optional[np.ndarray] = None
+    extra_rows: list[tuple[int, int, int, int, int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    @classmethod
+    def from_statements(cls, statement_type: str, statements: Sequence[dict]) -> "StatementBatch":
+        """Stack statement dicts ({"rok": ..., "data": {row id: {column: value}}}) of one type."""
+        matrix, columns = _layout(statement_type)
+        width, rows = len(columns), len(matrix.row_ids)
+        positions: dict[Any, int] = {**matrix.row_positions, **{str(r): p for r, p in matrix.row_positions.items()}}
+        paired_columns = statement_type == BALANCE_SHEET
+
+        # Flat lists converted at once; per-element numpy stores cost more than the whole stacking
+        flat: list[Any] = [None] * (len(statements) * width * rows)
+        present = [False] * (len(statements) * rows)
+        read_columns = operator.itemgetter(*columns)
+        years: list[Any] = []
+        input_errors: list[list[str]] = [[] for _ in statements]
+        extra_rows: list[tuple[int, int, int, int, int]] = []
+        for s, statement in enumerate(statements):
+            data = statement.get("data") if isinstance(statement, dict) else None
+            years.append(statement.get("rok") if isinstance(statement, dict) else None)
+            if not isinstance(data, dict):
+                input_errors[s].append("Statement has no data")
+                continue
+            for key, row in data.items():
+                position = positions.get(key)
+                if position is None or not isinstance(row, dict):
+                    position = _unknown_row(s, key, row, paired_columns, positions, input_errors, extra_rows)
+                    if position is None:
+                        continue
+                cell = s * rows + position
+                present[cell] = True
+                offset = cell * width
+                try:
+                    flat[offset:offset + width] = read_columns(row)
+                except KeyError:
+                    flat[offset:offset + width] = [row.get(column) for column in columns]
+
+        values, missing, bad = _to_int64(flat)
+        for i, value in bad:
+            s, rest = divmod(i, width * rows)
+            position, column = divmod(rest, width)
+            input_errors[s].append(f"Row {matrix.row_ids[position]}: {columns[column]} is not an integer ({value!r})")
+        present_array = np.asarray(present, dtype=bool).reshape(len(statements), rows)
+        paired = None
+        if paired_columns:
+            # brutto and korekce count as given only when both are set (not null) in the row
+            missing = missing.reshape(len(statements), rows, width)
+            paired = present_array & ~missing[:, :, columns.index("brutto")] & ~missing[:, :, columns.index("korekce")]
+        return cls(
+            statement_type,
+            years,
+            np.ascontiguousarray(values.reshape(len(statements), rows, width).transpose(0, 2, 1)),
+            present_array,
+            input_errors,
+            paired,
+            extra_rows,
+        )
+
+
+def _unknown_row(
+    s: int,
+    key: Any,
+    row: Any,
+    paired_columns: bool,
+    positions: dict[Any, int],
+    input_errors: list[list[str]],
+    extra_rows: list[tuple[int, int, int, int, int]],
+) -> Optional[int]:
+    """Position of a row key outside the rule rows in string/int form; records extra and malformed rows."""
+    if not isinstance(row, dict):
+        input_errors[s].append(f"Row {key}: expected an object, got {type(row).__name__}")
+        return None
+    try:
+        row_id = int(key)
+    except (TypeError, ValueError):
+        input_errors[s].append(f"Row key {key!r} is not a row number")
+        return None
+    if row_id in positions:
+        return positions[row_id]
+    brutto, korekce = row.get("brutto"), row.get("korekce")
+    if paired_columns and brutto is not None and korekce is not None:
+        netto = row.get("netto")
+        values = [_integer(value) for value in (brutto, korekce, 0 if netto is None else netto)]
+        if None in values:
+            input_errors[s].append(f"Row {row_id}: brutto, korekce and netto must be integers")
+        else:
+            extra_rows.append((s, row_id, *values))
+    return None
+
+
+def _integer(value: Any) -> Optional[int]:
+    """value as an int: integral floats and integer strings as in the statement models, but no booleans (true is not an amount)."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int64(flat: list[Any]) -> tuple[np.ndarray, np.ndarray, list[tuple[int, Any]]]:
+    """flat as int64 with None (missing) as 0, the mask of the missing values, and the values that are not integers.
+
+    A value outside int64 makes it an object array of exact Python ints, which RuleMatrix.residuals accepts.
+    """
+    # np.fromiter would truncate floats and take booleans as 0/1, so it only gets plain ints
+    types = set(map(type, flat))
+    if types <= {int}:
+        try:
+            return np.fromiter(flat, dtype=np.int64, count=len(flat)), np.zeros(len(flat), dtype=bool), []
+        except OverflowError:
+            return np.array(flat, dtype=object), np.zeros(len(flat), dtype=bool), []
+    objects = np.array(flat, dtype=object)
+    missing = np.equal(objects, None)
+    objects[missing] = 0
+    bad = []
+    if not types <= {int, type(None)}:
+        for i in np.flatnonzero(~missing).tolist():
+            if type(objects[i]) is int:
+                continue
+            value = _integer(objects[i])
+            if value is None:
+                bad.append((i, objects[i]))
+                value = 0
+            objects[i] = value
+    try:
+        return objects.astype(np.int64), missing, bad
+    except OverflowError:
+        return objects, missing, bad
+
+
+def validate_batch(batch: StatementBatch, tolerance: int = 0) -> list[list[Violation]]:
+    """The violations of every statement in the batch, with all rules (and balance-sheet row checks) evaluated at once.
+
+    Statements with input_errors are skipped and get no violations.
+    """
+    matrix, columns = _layout(batch.statement_type)
+    results: list[list[Violation]] = [[] for _ in range(len(batch))]
+    readable = np.array([not errors for errors in batch.input_errors], dtype=bool)
+
+    if batch.statement_type == BALANCE_SHEET:
+        _check_brutto_korekce(batch, matrix, readable, tolerance, results)
+
+    rule_values = batch.values[:, :2, :]
+    residuals = matrix.residuals(rule_values)
+    violated = (np.abs(residuals) > tolerance) & readable[:, None, None]
+    statements, rule_columns, rules = np.nonzero(violated)
+    if batch.statement_type == BALANCE_SHEET:
+        # Same order as BalanceSheet.validate_consistency: by rule, then column
+        order = np.lexsort((rule_columns, rules, statements))
+        statements, rule_columns, rules = statements[order], rule_columns[order], rules[order]
+    targets = rule_values[statements, rule_columns, matrix.targets[rules]]
+    computed = targets - residuals[statements, rule_columns, rules]
+
+    rules_of_type = PREDEFINED_VALIDATION_RULES if batch.statement_type == BALANCE_SHEET else PROFIT_AND_LOSS_RULES
+    present_rows: dict[int, set[int]] = {}
+    for s, column, i, target_value, computed_value in zip(
+        statements.tolist(), rule_columns.tolist(), rules.tolist(), targets.tolist(), computed.tolist()
+    ):
+        if s not in present_rows:
+            present_rows[s] = {matrix.row_ids[p] for p in np.flatnonzero(batch.present[s])}
+        results[s].append(rules_of_type[i].violation(columns[column], target_value, computed_value, tolerance, present_rows[s]))
+    return results
+
+
+def _check_brutto_korekce(batch: StatementBatch, matrix: RuleMatrix, readable: np.ndarray, tolerance: int, results: list[list[Violation]]) -> None:
+    netto, brutto, korekce = batch.values[:, 0, :], batch.values[:, 2, :], batch.values[:, 3, :]
+    failing = (np.abs(netto - (brutto - np.abs(korekce))) > tolerance) & batch.paired & readable[:, None]
+    row_violations: list[tuple[int, Violation]] = []
+    for s, position in zip(*(axis.tolist() for axis in np.nonzero(failing))):
+        violation = brutto_korekce_violation(
+            int(brutto[s, position]), int(korekce[s, position]), int(netto[s, position]), tolerance, matrix.row_ids[position]
+        )
+        row_violations.append((s, violation))
+    for s, row_id, row_brutto, row_korekce, row_netto in batch.extra_rows:
+        if readable[s] and abs(row_netto - (row_brutto - abs(row_korekce))) > tolerance:
+            row_violations.append((s, brutto_korekce_violation(row_brutto, row_korekce, row_netto, tolerance, row_id)))
+    for s, violation in sorted(row_violations, key=lambda item: (item[0], item[1].target_row)):
+        results[s].append(violation)
+
+
+def validate_statements(statements: Sequence[dict], statement_type: Optional[str] = None, tolerance: int = 0) -> list[StatementValidation]:
+    """Validate statement dicts in bulk; results are in input order.
+
+    With statement_type every statement is of that type, otherwise each one names
+    its own in a "statement_type" key ('rozvaha' or 'vzz') and the types are
+    batched separately.
+    """
+    start = time.perf_counter()
+    results: list[Optional[StatementValidation]] = [None] * len(statements)
+    groups: dict[str, list[int]] = {}
+    for i, statement in enumerate(statements):
+        raw_type = statement_type if statement_type is not None else (statement.get("statement_type") if isinstance(statement, dict) else None)
+        normalized = normalize_statement_type(raw_type)
+        if normalized is None:
+            rok = statement.get("rok") if isinstance(statement, dict) else None
+            results[i] = StatementValidation(i, raw_type, rok, [f"Unsupported statement_type {raw_type!r}. Use 'rozvaha' or 'vzz'."])
+        else:
+            groups.setdefault(normalized, []).append(i)
+
+    for normalized, indices in groups.items():
+        batch = StatementBatch.from_statements(normalized, [statements[i] for i in indices])
+        for i, rok, errors, violations in zip(indices, batch.years, batch.input_errors, validate_batch(batch, tolerance)):
+            results[i] = StatementValidation(i, normalized, rok, errors, violations)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Validated {len(statements)} statements in {elapsed:.3f}s ({sum(1 for r in results if not r.valid)} with violations)")
+    return results
+
+
+def validate_jsonl(lines: Iterable[Union[str, bytes]], tolerance: int = 0) -> list[StatementValidation]:
+    """validate_statements for JSON Lines (one statement object per line; blank lines are skipped)."""
+    statements: list[Any] = []
+    parse_errors: dict[int, str] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            statements.append(json.loads(line))
+        except ValueError as e:
+            parse_errors[len(statements)] = f"Invalid JSON: {e}"
+            statements.append(None)
+    results = validate_statements(statements, tolerance=tolerance)
+    for i, error in parse_errors.items():
+        results[i] = StatementValidation(i, None, None, [error])
+    return results
+
+
+async def validate_jsonl_request(request: Request, tolerance: int) -> list[StatementValidation]:
+    """Read a JSON Lines request body (up to BATCH_VALIDATION_MAX_MB) and validate it off the event loop."""
+    max_bytes = config.get_batch_validation_max_mb() * 1024 * 1024
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Body exceeds {config.get_batch_validation_max_mb()}MB")
+    if not body.strip():
+        raise HTTPException(status_code=400, detail="No statements were sent")
+    return await asyncio.to_thread(validate_jsonl, bytes(body).splitlines(), tolerance)
@@ -0,0 +1,220 @@
+"""Pipelined ingestion of POST /process uploads.
+
+The multipart body is parsed while it arrives (multipart_stream.iter_form).
+When the settings fields precede the files, as the web form sends them, the
+options are known before the first PDF and every file is handed to
+process_files the moment its last byte is spooled: disambiguation of the
+first file runs while the client is still uploading the rest. A client that
+sends the settings after the files (or none at all) is processed as before,
+once the whole body is in. Per-file timings (received, started, finished)
+are logged and summed up in ingestion_stats, which shows the head start won
+on slow links.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.infrastructure import config
+from src.infrastructure.multipart_stream import FormField, FormFile, MalformedForm, iter_form
+from src.infrastructure.uploads import SpooledPdf, UploadTooLarge, discard_all
+from src.services.pipeline import ProcessOptions, process_files, resolve_options
+
+logger = logging.getLogger(__name__)
+
+FILE_FIELD = "pdfs"
+SETTINGS_FIELDS = {"tolerance", "return_json", "ocr_retries", "ocr_parallel", "extraction_mode"}
+TRUE_VALUES = {"1", "true", "on", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "off", "no", "n", "f"}
+
+
+def _int_field(fields: dict[str, str], name: str, default: Optional[int]) -> Optional[int]:
+    value = fields.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Form field '{name}' must be an integer")
+
+
+def _bool_field(fields: dict[str, str], name: str, default: bool) -> bool:
+    value = fields.get(name, "").strip().lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise HTTPException(status_code=422, detail=f"Form field '{name}' must be a boolean")
+
+
+def options_from_fields(fields: dict[str, str]) -> ProcessOptions:
+    """resolve_options for raw form fields, with the defaults of the /process form parameters."""
+    return resolve_options(
+        _int_field(fields, "tolerance", 1),
+        _bool_field(fields, "return_json", False),
+        _int_field(fields, "ocr_retries", None),
+        _int_field(fields, "ocr_parallel", None),
+        fields.get("extraction_mode") or None,
+    )
+
+
+@dataclass
+class FileTimings:
+    name: str
+    size: int
+    received: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+
+@dataclass
+class IngestionTimings:
+    """Per-file timings of one request, in seconds since the request was accepted."""
+
+    start: float = field(default_factory=time.perf_counter)
+    files: list[FileTimings] = field(default_factory=list)
+    body_done: Optional[float] = None
+
+    def since_start(self, at: Optional[float] = None) -> float:
+        return (at if at is not None else time.perf_counter()) - self.start
+
+    def received(self, form_file: FormFile) -> None:
+        upload = form_file.upload
+        self.files.append(FileTimings(upload.name, upload.size, self.since_start(form_file.received_at)))
+
+    async def on_file_event(self, index: int, status: str, detail) -> None:
+        if status == "running":
+            self.files[index].started = self.since_start()
+        else:
+            self.files[index].finished = self.since_start()
+
+    def head_start(self) -> float:
+        """How long processing ran before the body was complete."""
+        started = [f.started for f in self.files if f.started is not None]
+        if not started or self.body_done is None:
+            return 0.0
+        return max(0.0, self.body_done - min(started))
+
+    def log(self) -> None:
+        for f in self.files:
+            started = f"{f.started:.2f}s" if f.started is not None else "-"
+            finished = f"{f.finished:.2f}s" if f.finished is not None else "-"
+            logger.info(f"{f.name} ({f.size / 1024:.1f}KB): received {f.received:.2f}s, started {started}, finished {finished}")
+        body_done = f"{self.body_done:.2f}s" if self.body_done is not None else "-"
+        logger.info(f"Upload complete at {body_done}; processing ran {self.head_start():.2f}s of it in parallel")
+
+
+class IngestionStats:
+    def __init__(self):
+        self.requests = 0
+        self.pipelined = 0
+        self.files = 0
+        self.upload_seconds = 0.0
+        self.head_start_seconds = 0.0
+
+    def record(self, timings: IngestionTimings, pipelined: bool) -> None:
+        self.requests += 1
+        self.pipelined += int(pipelined)
+        self.files += len(timings.files)
+        self.upload_seconds += timings.body_done or 0.0
+        self.head_start_seconds += timings.head_start()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "pipelined": self.pipelined,
+            "files": self.files,
+            "upload_seconds": round(self.upload_seconds, 3),
+            "head_start_seconds": round(self.head_start_seconds, 3),
+        }
+
+
+ingestion_stats = IngestionStats()
+
+
+class StreamedForm:
+    """The multipart body of one request, read as it arrives; owns the spooled files."""
+
+    def __init__(self, request: Request):
+        max_file = config.get_upload_max_file_mb() * 1024 * 1024
+        max_request = config.get_upload_max_request_mb() * 1024 * 1024
+        self._parts = iter_form(request, max_file, max_request)
+        self.fields: dict[str, str] = {}
+        self.uploads: list[SpooledPdf] = []
+        self.timings = IngestionTimings()
+        self._first: Optional[FormFile] = None
+
+    async def _next(self) -> Optional[Union[FormField, FormFile]]:
+        try:
+            part = await self._parts.__anext__()
+        except StopAsyncIteration:
+            self.timings.body_done = self.timings.since_start()
+            return None
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=f"Upload rejected: {e}")
+        except MalformedForm as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if isinstance(part, FormFile):
+            if part.field != FILE_FIELD:
+                part.upload.discard()
+                return await self._next()
+            self.uploads.append(part.upload)
+            if not part.upload.size:
+                raise HTTPException(status_code=400, detail=f"Uploaded file '{part.upload.name}' is empty")
+            self.timings.received(part)
+            logger.info(f"File {len(self.uploads)}: {part.upload.name} ({part.upload.size/1024:.1f}KB) received")
+        return part
+
+    async def read_settings(self) -> bool:
+        """Read the fields up to the first file; returns whether any came before it."""
+        while (part := await self._next()) is not None:
+            if isinstance(part, FormFile):
+                self._first = part
+                break
+            self.fields[part.name] = part.value
+        return bool(self.fields) and self._first is not None
+
+    async def files(self, settings_final: bool) -> AsyncIterator[SpooledPdf]:
+        """Yield the files as they are received; with settings_final a later settings field is an error."""
+        if self._first is not None:
+            yield self._first.upload
+        while (part := await self._next()) is not None:
+            if isinstance(part, FormFile):
+                yield part.upload
+            elif settings_final and part.name in SETTINGS_FIELDS:
+                raise HTTPException(status_code=400, detail=f"Form field '{part.name}' must precede the files")
+            else:
+                self.fields[part.name] = part.value
+
+    async def close(self) -> None:
+        await self._parts.aclose()
+        discard_all(self.uploads)
+
+
+async def process_streamed_upload(request: Request) -> tuple[list[dict], ProcessOptions]:
+    """Receive and process the PDFs of a /process request, starting each file as soon as it has arrived."""
+    form = StreamedForm(request)
+    pipelined = False
+    try:
+        pipelined = await form.read_settings()
+        if pipelined:
+            options = options_from_fields(form.fields)
+            logger.info("Settings precede the files, processing each file as soon as it is received")
+            results = await process_files(form.files(settings_final=True), options, on_file_event=form.timings.on_file_event)
+        else:
+            uploads = [upload async for upload in form.files(settings_final=False)]
+            options = options_from_fields(form.fields)
+            if not uploads:
+                raise HTTPException(status_code=400, detail="No PDF files were uploaded")
+            logger.info(f"Processing {len(uploads)} uploaded PDF files")
+            results = await process_files(uploads, options, on_file_event=form.timings.on_file_event)
+    finally:
+        await form.close()
+    form.timings.log()
+    ingestion_stats.record(form.timings, pipelined)
+    return results, options
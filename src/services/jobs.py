@@ -0,0 +1,461 @@
+"""Background processing jobs behind POST /jobs.
+
+A job holds the uploaded files and the resolved options; a bounded pool of
+worker tasks takes jobs from a queue and runs them through process_files, so
+the HTTP request returns immediately and clients poll GET /jobs/{id} or follow
+the progress events of the job (GET /jobs/{id}/events). Finished jobs keep
+their JSON summary or exported workbook until they expire.
+
+With the job store enabled, jobs, their uploads, per-file stage checkpoints
+and events are persisted: jobs interrupted by a restart are resumed on startup
+from their last completed stage, and a submission repeated with the same
+Idempotency-Key attaches to the existing job.
+"""
+import asyncio
+import dataclasses
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from src.infrastructure import config
+from src.infrastructure.cache import sha256_hex
+from src.infrastructure.clients.scheduler import llm_session
+from src.infrastructure.job_store import JobStore, open_job_store
+from src.infrastructure.uploads import SpooledPdf, discard_all
+from src.services import progress
+from src.services.pipeline import ProcessOptions, build_export, process_files, read_export, summarize_results
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = {"done", "failed"}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key was already used for a submission with different files or options."""
+
+
+@dataclass
+class JobFile:
+    name: str
+    size: int
+    status: str = "queued"
+    error: Optional[str] = None
+    statements: list[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "size": self.size, "status": self.status, "error": self.error, "statements": self.statements}
+
+
+@dataclass
+class Job:
+    id: str
+    session_id: str
+    options: ProcessOptions
+    files: list[JobFile]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    error_status: int = 500
+    # JSON summary (return_json) or (content, media type, filename) of the export
+    summary: Optional[list[dict]] = None
+    export: Optional[tuple[bytes, str, str]] = None
+    payloads: Optional[list[SpooledPdf]] = None
+    idempotency_key: Optional[str] = None
+    fingerprint: Optional[str] = None
+    # Progress events in order; an event's id is its index
+    events: list[dict] = field(default_factory=list)
+    _waiters: list[asyncio.Future] = field(default_factory=list, repr=False)
+
+    def add_event(self, event: dict) -> None:
+        """Progress sink of the job: store the event and wake everyone waiting for it."""
+        event["id"] = len(self.events)
+        self.events.append(event)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def follow_events(self, start: int = 0, keepalive_seconds: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """Yield the events from index start on as they arrive, until the job has finished.
+
+        Yields None when nothing happened for keepalive_seconds, so streams can
+        send a heartbeat through proxies that close idle connections.
+        """
+        index = start
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.finished:
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield None
+
+    @classmethod
+    def from_stored(cls, row: dict) -> "Job":
+        export = None
+        if row["export"] is not None:
+            export = (bytes(row["export"]), row["export_media_type"], row["export_filename"])
+        return cls(
+            id=row["id"],
+            session_id=row["session_id"],
+            options=ProcessOptions(**row["options"]),
+            files=[JobFile(**f) for f in row["files"]],
+            status=row["status"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            error=row["error"],
+            error_status=row["error_status"] or 500,
+            summary=row["summary"],
+            export=export,
+            events=row["events"],
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_status(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files_total": len(self.files),
+            "files_done": sum(1 for f in self.files if f.status == "done"),
+            "files": [f.to_dict() for f in self.files],
+            "error": self.error,
+        }
+
+
+class JobCheckpoint:
+    """Stage results of one file of a job, preloaded from the store and written through to it."""
+
+    def __init__(self, store: JobStore, job_id: str, index: int, stages: dict[str, dict]):
+        self.store = store
+        self.job_id = job_id
+        self.index = index
+        self.stages = stages
+
+    def load(self, stage: str) -> Optional[dict]:
+        return self.stages.get(stage)
+
+    async def save(self, stage: str, value: dict) -> None:
+        self.stages[stage] = value
+        await self.store.run(self.store.save_stage, self.job_id, self.index, stage, value)
+
+
+def request_fingerprint(uploads: list[SpooledPdf], options: ProcessOptions) -> str:
+    """Hash of the files and options of a submission, to tell a retry from a different request."""
+    parts = [json.dumps(dataclasses.asdict(options), sort_keys=True)]
+    parts += [f"{upload.name}:{upload.sha256()}" for upload in uploads]
+    return sha256_hex("\n".join(parts))
+
+
+class JobManager:
+    """Job registry with a bounded queue, a fixed number of workers and an optional durable store."""
+
+    def __init__(self, workers: int, queue_max: int, retention_seconds: int, store: Optional[JobStore] = None):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.retention_seconds = retention_seconds
+        self.store = store
+        # Unbounded so recovered jobs always fit; queue_max is enforced on new submissions
+        self._queue: asyncio.Queue[Job] = asyncio.Queue()
+        self._jobs: dict[str, Job] = {}
+        self._by_idempotency_key: dict[tuple[str, str], str] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+        self.deduplicated = 0
+
+    def _ensure_workers(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(n), name=f"job-worker-{n}") for n in range(self.workers)]
+            logger.info(f"Started {self.workers} job workers")
+
+    async def submit(
+        self,
+        session_id: str,
+        uploads: list[SpooledPdf],
+        options: ProcessOptions,
+        idempotency_key: Optional[str] = None,
+    ) -> tuple[Job, bool]:
+        """Queue a job; returns (job, created). A known idempotency key returns the existing job instead.
+
+        A created job takes over the spooled uploads and discards them once it has run.
+        """
+        await self._prune()
+        fingerprint = await asyncio.to_thread(request_fingerprint, uploads, options) if idempotency_key else None
+        if idempotency_key:
+            existing = await self._find_idempotent(session_id, idempotency_key, fingerprint)
+            if existing is not None:
+                return existing, False
+        if self._queue.qsize() >= self.queue_max:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already waiting")
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            session_id=session_id,
+            options=options,
+            files=[JobFile(name=upload.name, size=upload.size) for upload in uploads],
+            payloads=uploads,
+            idempotency_key=idempotency_key,
+            fingerprint=fingerprint,
+        )
+        if self.store is not None:
+            row = {
+                "id": job.id,
+                "session_id": session_id,
+                "idempotency_key": idempotency_key,
+                "fingerprint": fingerprint,
+                "options": dataclasses.asdict(options),
+                "status": job.status,
+                "created_at": job.created_at,
+            }
+            try:
+                await self.store.run(self.store.create_job, row, [f.to_dict() for f in job.files], uploads)
+            except sqlite3.IntegrityError:
+                # A concurrent retry with the same key was stored first
+                existing = await self._find_idempotent(session_id, idempotency_key, fingerprint)
+                if existing is None:
+                    raise
+                return existing, False
+
+        self._jobs[job.id] = job
+        if idempotency_key:
+            self._by_idempotency_key[(session_id, idempotency_key)] = job.id
+        self._ensure_workers()
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        logger.info(f"Queued job {job.id} with {len(job.files)} files ({self._queue.qsize()} waiting)")
+        return job, True
+
+    async def _find_idempotent(self, session_id: str, idempotency_key: str, fingerprint: Optional[str]) -> Optional[Job]:
+        job_id = self._by_idempotency_key.get((session_id, idempotency_key))
+        stored_fingerprint = None
+        if job_id is not None and job_id in self._jobs:
+            stored_fingerprint = self._jobs[job_id].fingerprint
+        elif self.store is not None:
+            found = await self.store.run(self.store.find_by_idempotency_key, session_id, idempotency_key)
+            if found is not None:
+                job_id, stored_fingerprint = found
+        if job_id is None:
+            return None
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyConflict(f"Idempotency-Key {idempotency_key!r} was used for a different request")
+        job = await self.get(job_id)
+        if job is not None:
+            self.deduplicated += 1
+            logger.info(f"Idempotent retry attached to job {job_id}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            row = await self.store.run(self.store.load_job, job_id)
+            if row is not None:
+                job = self._jobs.setdefault(job_id, Job.from_stored(row))
+        return job
+
+    async def recover(self) -> int:
+        """Queue the unfinished jobs of the store again; their completed stages are reused."""
+        if self.store is None:
+            return 0
+        job_ids = await self.store.run(self.store.unfinished_job_ids)
+        for job_id in job_ids:
+            row = await self.store.run(self.store.load_job, job_id)
+            if row is None:
+                continue
+            job = Job.from_stored(row)
+            job.status = "queued"
+            for job_file in job.files:
+                if job_file.status == "running":
+                    job_file.status = "queued"
+            self._jobs[job.id] = job
+            self._queue.put_nowait(job)
+        if job_ids:
+            self.resumed += len(job_ids)
+            self._ensure_workers()
+            logger.info(f"Resuming {len(job_ids)} unfinished jobs from the job store")
+        return len(job_ids)
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {n} failed on job {job.id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _on_file_event(self, job: Job, index: int, status: str, detail: Any) -> None:
+        job_file = job.files[index]
+        job_file.status = status
+        if status == "failed":
+            job_file.error = str(detail)
+        elif status == "done":
+            job_file.statements = summarize_results(detail)
+        if self.store is not None:
+            await self.store.run(self.store.update_file, job.id, index, job_file.status, job_file.error, job_file.statements)
+
+    def _record_event(self, job: Job, event: dict) -> None:
+        job.add_event(event)
+        if self.store is not None:
+            self.store.run_nowait(self.store.append_event, job.id, event)
+
+    async def _run(self, job: Job) -> None:
+        resumed = job.started_at is not None
+        job.status = "running"
+        job.started_at = job.started_at or time.time()
+        # Model calls of the job queue under the submitting session in the shared scheduler
+        llm_session.set(job.session_id)
+        progress.progress_sink.set(lambda event: self._record_event(job, event))
+        progress.emit("job_started", files=len(job.files), waited=round(time.time() - job.created_at, 3), resumed=resumed)
+        payloads, job.payloads = job.payloads, None
+        checkpoints = None
+        if self.store is not None:
+            await self.store.run(self.store.update_job, job.id, status=job.status, started_at=job.started_at)
+            if payloads is None:
+                payloads = await self.store.run(self.store.load_payloads, job.id)
+            stages = await self.store.run(self.store.load_stages, job.id)
+            checkpoints = [JobCheckpoint(self.store, job.id, index, stages.get(index, {})) for index in range(len(job.files))]
+        payloads = payloads or []
+        logger.info(f"{'Resuming' if resumed else 'Running'} job {job.id} ({len(payloads)} files)")
+        try:
+            results = await process_files(
+                payloads,
+                job.options,
+                on_file_event=lambda index, status, detail: self._on_file_event(job, index, status, detail),
+                checkpoints=checkpoints,
+            )
+            if job.options.return_json:
+                job.summary = summarize_results(results)
+            else:
+                progress.emit("export_started", statements=len(results))
+                body, media_type, filename = await build_export(results, job.options.tolerance)
+                job.export = (await read_export(body), media_type, filename)
+                progress.emit("export_done", filename=filename, size=len(job.export[0]))
+            job.status = "done"
+            self.completed += 1
+        except asyncio.CancelledError:
+            # Shutdown: the job stays unfinished in the store and is resumed on the next start
+            logger.info(f"Job {job.id} interrupted, it will be resumed from its checkpoints")
+            raise
+        except HTTPException as e:
+            job.status, job.error, job.error_status = "failed", str(e.detail), e.status_code
+            self.failed += 1
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.status, job.error = "failed", str(e)
+            self.failed += 1
+        finally:
+            discard_all(payloads)
+
+        for job_file in job.files:
+            if job_file.status in ("queued", "running"):
+                job_file.status = "cancelled"
+        job.finished_at = time.time()
+        if self.store is not None:
+            export = job.export or (None, None, None)
+            await self.store.run(
+                self.store.update_job,
+                job.id,
+                status=job.status,
+                finished_at=job.finished_at,
+                error=job.error,
+                error_status=job.error_status,
+                summary=job.summary,
+                export=export[0],
+                export_media_type=export[1],
+                export_filename=export[2],
+            )
+            await self.store.run(self.store.drop_payloads, job.id)
+        progress.emit(f"job_{job.status}", error=job.error)
+        logger.info(f"Job {job.id} {job.status} after {job.finished_at - job.started_at:.1f}s")
+
+    async def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and (job.finished_at or 0) < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._by_idempotency_key = {key: job_id for key, job_id in self._by_idempotency_key.items() if job_id in self._jobs}
+        dropped = len(expired)
+        if self.store is not None:
+            dropped = max(dropped, await self.store.run(self.store.delete_finished_before, cutoff))
+        if dropped:
+            logger.debug(f"Dropped {dropped} expired jobs")
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Uploads of jobs that never started; with a store they are read back from it on resume
+        for job in self._jobs.values():
+            discard_all(job.payloads)
+            job.payloads = None
+        if self.store is not None:
+            # Waits for queued writes (events) before closing the database
+            await asyncio.to_thread(self.store.close)
+
+    def stats(self) -> dict:
+        statuses: dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "store": self.store.path if self.store is not None else None,
+            "queued_now": self._queue.qsize(),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "deduplicated": self.deduplicated,
+            "jobs_by_status": statuses,
+        }
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        _manager = JobManager(
+            workers=config.get_job_workers(),
+            queue_max=config.get_job_queue_max(),
+            retention_seconds=config.get_job_retention_seconds(),
+            store=open_job_store(),
+        )
+    return _manager
+
+
+async def close_job_manager() -> None:
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.close()
@@ -0,0 +1,409 @@
+"""Processing of uploaded files, shared by POST /process and the background jobs.
+
+process_files runs every uploaded PDF through the page locator, the text layer
+fast path and the model extraction; summarize_results and build_export turn
+the per-statement results into the JSON summary or the downloadable workbook.
+"""
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Protocol, Union
+
+from fastapi import HTTPException
+
+from src.infrastructure import config
+from src.infrastructure.clients.pdf_store import registered_pdfs
+from src.infrastructure.exporters.dcf_pool import export_dcf_template_async
+from src.infrastructure.exporters.excel import export_excel
+from src.infrastructure.exporters.zip_stream import stream_zip
+from src.infrastructure.pdf.page_locator import StatementPdfs, split_statement_pdfs
+from src.infrastructure.pdf.slimming import slim_documents
+from src.infrastructure.uploads import SpooledPdf, get_memory_budget
+from src.services import progress
+from src.services.process import (
+    disambiguate_pdf_bytes_async,
+    extract_combined_async,
+    extract_from_text_layer,
+    ocr_and_validate_with_retries,
+    validate_payload,
+)
+
+logger = logging.getLogger(__name__)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# A built workbook, or the chunks of a ZIP archive that is streamed as it is produced
+ExportBody = Union[io.BytesIO, AsyncIterator[bytes]]
+
+# Called with (file index, status, results or error message) as files start and finish
+FileEventCallback = Callable[[int, str, Any], Awaitable[None]]
+
+DISAMBIGUATION_STAGE = "disambiguation"
+
+
+def statement_stage(statement_type: str) -> str:
+    return f"statement:{statement_type}"
+
+
+class FileCheckpoint(Protocol):
+    """Stage results of one file that outlive the process (see src/services/jobs.py)."""
+
+    def load(self, stage: str) -> Optional[dict]: ...
+
+    async def save(self, stage: str, value: dict) -> None: ...
+
+
+@dataclass
+class ProcessOptions:
+    tolerance: int = 1
+    mode: str = "staged"
+    max_retries: int = 1
+    parallel_attempts: int = 1
+    return_json: bool = False
+
+
+def resolve_options(
+    tolerance: int,
+    return_json: bool,
+    ocr_retries: Optional[int],
+    ocr_parallel: Optional[int],
+    extraction_mode: Optional[str],
+) -> ProcessOptions:
+    """Apply the configured defaults and limits to the form fields of /process and /jobs."""
+    mode = (extraction_mode or config.get_extraction_mode()).strip().lower()
+    if mode not in config.EXTRACTION_MODES:
+        raise HTTPException(status_code=400, detail="Unsupported extraction_mode. Use 'staged' or 'combined'.")
+
+    max_retries = ocr_retries if isinstance(ocr_retries, int) else config.get_ocr_max_retries()
+    parallel_attempts = ocr_parallel if isinstance(ocr_parallel, int) else config.get_ocr_parallel_attempts()
+    return ProcessOptions(
+        tolerance=tolerance,
+        mode=mode,
+        max_retries=max(1, min(5, max_retries)),
+        parallel_attempts=max(1, min(5, parallel_attempts)),
+        return_json=return_json,
+    )
+
+
+async def process_file(
+    original_name: str,
+    pdf_bytes: bytes,
+    options: ProcessOptions,
+    checkpoint: Optional["FileCheckpoint"] = None,
+) -> list[dict]:
+    """Extract the statements of one uploaded PDF; returns one result dict per present statement.
+
+    With a checkpoint, the disambiguation and every validated statement are
+    saved as they complete, and stages saved by an earlier interrupted run are
+    reused instead of calling the model again.
+    """
+    # Only the pages holding the statements are sent to the model when they can be located
+    if config.is_page_locator_enabled():
+        statement_pdfs = await asyncio.to_thread(split_statement_pdfs, pdf_bytes)
+    else:
+        statement_pdfs = StatementPdfs(full=pdf_bytes)
+    # Born-digital filings can be read from the text layer without uploading anything
+    text_layer = await extract_from_text_layer(statement_pdfs, options.tolerance)
+    if text_layer is not None:
+        info, text_layer_results = text_layer
+        progress.emit("disambiguation", source="text_layer", **info)
+        for st_type in text_layer_results:
+            progress.emit("validation", statement_type=st_type, status="ok", attempts=0, errors=0, source="text_layer")
+        return _collect_file_results(original_name, info, list(text_layer_results), list(text_layer_results.values()))
+
+    info = checkpoint.load(DISAMBIGUATION_STAGE) if checkpoint is not None else None
+    done = _restore_statements(checkpoint, info, options.tolerance) if info is not None else {}
+    if info is not None and done and all(st_type in done for st_type in _present_types(info)):
+        logger.info(f"All statements of {original_name} restored from checkpoints")
+        _emit_restored(info, done)
+        present_types = _present_types(info)
+        return _collect_file_results(original_name, info, present_types, [done[st_type] for st_type in present_types])
+
+    documents = {
+        "overview": statement_pdfs.for_overview(),
+        "rozvaha": statement_pdfs.for_statement("rozvaha"),
+        "vzz": statement_pdfs.for_statement("vzz"),
+    }
+    # Scans are downsampled before upload; font programs only go when there is no text layer to render
+    documents = await slim_documents(documents, strip_fonts=statement_pdfs.page_texts is None)
+    # Register each PDF once; disambiguation, OCR and retries reference it by handle
+    async with registered_pdfs(documents, original_name) as handles:
+        return await _process_registered_file(original_name, statement_pdfs, documents, handles, options, checkpoint, info, done)
+
+
+async def _process_registered_file(
+    original_name: str,
+    statement_pdfs: StatementPdfs,
+    documents: dict,
+    handles: dict,
+    options: ProcessOptions,
+    checkpoint: Optional["FileCheckpoint"] = None,
+    info: Optional[dict] = None,
+    done: Optional[dict[str, dict]] = None,
+) -> list[dict]:
+    logger.info(f"Starting processing of file: {original_name} ({options.mode} extraction)")
+    done = dict(done or {})
+
+    if info is not None:
+        logger.info(f"Resuming {original_name} after disambiguation ({sorted(done) or 'no'} statements restored)")
+        _emit_restored(info, done)
+        present_types = _present_types(info)
+    elif options.mode == "combined":
+        # One call returns the presence flags and both statements; failing statements are retried separately
+        info, combined_results = await extract_combined_async(
+            documents["overview"],
+            options.tolerance,
+            options.max_retries,
+            pdf_handle=handles["overview"],
+            parallel_attempts=options.parallel_attempts,
+        )
+        present_types = list(combined_results)
+        await _save_checkpoint(checkpoint, DISAMBIGUATION_STAGE, info)
+        for st_type, result in combined_results.items():
+            await _save_statement(checkpoint, st_type, result)
+        done.update(combined_results)
+    else:
+        # First disambiguate what's in the file
+        info = await disambiguate_pdf_bytes_async(documents["overview"], pdf_handle=handles["overview"])
+        present_types = _present_types(info)
+        progress.emit("disambiguation", source="model", **info)
+        await _save_checkpoint(checkpoint, DISAMBIGUATION_STAGE, info)
+    if not present_types:
+        logger.error(f"No statement types detected in {original_name}")
+        raise HTTPException(status_code=400, detail=f"Ve souboru '{original_name}' nebyl rozpoznán Rozvaha ani VZZ")
+
+    logger.info(f"File {original_name} contains: {present_types}")
+
+    async def extract(st_type: str) -> dict:
+        result = await ocr_and_validate_with_retries(
+            documents[st_type],
+            st_type,
+            options.tolerance,
+            options.max_retries,
+            pdf_handle=handles[st_type],
+            parallel_attempts=options.parallel_attempts,
+            page_texts=statement_pdfs.statement_texts(st_type),
+        )
+        await _save_statement(checkpoint, st_type, result)
+        return result
+
+    # Process each remaining statement type concurrently with retries
+    pending = [st_type for st_type in present_types if st_type not in done]
+    if pending:
+        logger.info(f"Processing {len(pending)} statement types for {original_name} with up to {options.max_retries} OCR attempts")
+        done.update(zip(pending, await asyncio.gather(*(extract(st_type) for st_type in pending))))
+
+    return _collect_file_results(original_name, info, present_types, [done[st_type] for st_type in present_types])
+
+
+def _present_types(info: dict) -> list[str]:
+    return [st_type for st_type in ("rozvaha", "vzz") if info.get(st_type)]
+
+
+async def _save_checkpoint(checkpoint: Optional["FileCheckpoint"], stage: str, value: dict) -> None:
+    if checkpoint is not None:
+        await checkpoint.save(stage, value)
+
+
+async def _save_statement(checkpoint: Optional["FileCheckpoint"], statement_type: str, result: dict) -> None:
+    # Only validated statements are worth keeping; anything else is extracted again on resume
+    if result.get("status") == "ok":
+        value = {"raw": result["raw"], "ocr_attempts": result.get("ocr_attempts", 1), "source": result.get("source", "model")}
+        await _save_checkpoint(checkpoint, statement_stage(statement_type), value)
+
+
+def _restore_statements(checkpoint: "FileCheckpoint", info: dict, tolerance: int) -> dict[str, dict]:
+    """Rebuild the result dicts of checkpointed statements; entries that no longer validate are dropped."""
+    restored = {}
+    for st_type in _present_types(info):
+        saved = checkpoint.load(statement_stage(st_type))
+        if saved is None:
+            continue
+        try:
+            model_obj = validate_payload(st_type, saved["raw"], tolerance)
+        except Exception as e:
+            logger.info(f"Checkpointed {st_type} no longer validates, extracting it again: {e}")
+            continue
+        restored[st_type] = {
+            "statement_type": st_type,
+            "model": model_obj,
+            "raw": saved["raw"],
+            "violations": [],
+            "validation_errors": [],
+            "ocr_attempts": saved.get("ocr_attempts", 0),
+            "status": "ok",
+            "source": saved.get("source", "model"),
+            "resumed": True,
+        }
+    return restored
+
+
+def _emit_restored(info: dict, restored: dict[str, dict]) -> None:
+    progress.emit("disambiguation", source="checkpoint", **info)
+    for st_type, result in restored.items():
+        progress.emit("validation", statement_type=st_type, status="ok", attempts=result["ocr_attempts"], errors=0, source="checkpoint")
+
+
+def _collect_file_results(original_name: str, info: dict, present_types: list[str], models: list[dict]) -> list[dict]:
+    file_results = []
+    for st_type, result_obj in zip(present_types, models):
+        # result_obj is the dict from ocr_and_validate_with_retries
+        result_obj = dict(result_obj)
+        result_obj["original"] = original_name
+        result_obj["statement_type"] = st_type
+        result_obj["disambiguation_info"] = info
+        file_results.append(result_obj)
+        logger.debug(f"Completed {st_type} for {original_name} with status {result_obj.get('status')}")
+
+    logger.info(f"Finished processing file: {original_name} ({len(file_results)} results)")
+    return file_results
+
+
+async def process_files(
+    uploads: Union[list[SpooledPdf], AsyncIterator[SpooledPdf]],
+    options: ProcessOptions,
+    on_file_event: Optional[FileEventCallback] = None,
+    checkpoints: Optional[list[FileCheckpoint]] = None,
+) -> list[dict]:
+    """Process all files concurrently and return the flattened results; checkpoints are per file.
+
+    uploads may be an async iterator of files still being received: each file starts as soon as it
+    arrives. A file's bytes are read from its spool file only once it fits into the upload memory budget.
+    When one file fails, the others are cancelled and awaited before the error propagates.
+    """
+    budget = get_memory_budget()
+
+    async def run(index: int, upload: SpooledPdf) -> list[dict]:
+        # Each file runs in its own task, so the variable only tags this file's events
+        progress.progress_file.set(upload.name)
+        progress.emit("file_started", size=upload.size)
+        if on_file_event is not None:
+            await on_file_event(index, "running", None)
+        try:
+            checkpoint = checkpoints[index] if checkpoints is not None else None
+            async with budget.reserve(upload.size):
+                pdf_bytes = await asyncio.to_thread(upload.read)
+                file_results = await process_file(upload.name, pdf_bytes, options, checkpoint)
+                # Drop the bytes before their share of the budget is handed on
+                del pdf_bytes
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            progress.emit("file_failed", error=error)
+            if on_file_event is not None:
+                await on_file_event(index, "failed", error)
+            raise
+        progress.emit("file_done", statements=len(file_results))
+        if on_file_event is not None:
+            await on_file_event(index, "done", file_results)
+        return file_results
+
+    tasks: list[asyncio.Task] = []
+    try:
+        if isinstance(uploads, list):
+            logger.info(f"Starting concurrent processing of {len(uploads)} files")
+            tasks = [asyncio.create_task(run(i, upload)) for i, upload in enumerate(uploads)]
+        else:
+            async for upload in uploads:
+                logger.info(f"Starting processing of received file {len(tasks) + 1}: {upload.name}")
+                tasks.append(asyncio.create_task(run(len(tasks), upload)))
+        file_results_lists = await asyncio.gather(*tasks)
+    except BaseException:
+        # A file failed, the upload broke off or the caller was cancelled: the other files are
+        # stopped and awaited, so none of them still reads its spool file or calls the model
+        # after the caller discards the spools
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    # Flatten the results
+    results = [result for file_results in file_results_lists for result in file_results]
+    logger.info(f"All processing completed. Total results: {len(results)}")
+    return results
+
+
+def summarize_results(results: list[dict]) -> list[dict]:
+    """Compact JSON summary returned when return_json is set."""
+    return [
+        {
+            "file": r.get("original"),
+            "statement_type": r.get("statement_type"),
+            "rok": getattr(r.get("model"), "rok", None) if r.get("model") is not None else (r.get("raw") or {}).get("rok"),
+            "rows": len(getattr(r.get("model"), "data", {})) if r.get("model") is not None else len((r.get("raw") or {}).get("data", {})),
+            "ocr_attempts": r.get("ocr_attempts", 1),
+            "cached": r.get("cached", False),
+            "source": r.get("source", "model"),
+            "status": r.get("status", "ok"),
+            "validation_errors_count": len(r.get("validation_errors") or []),
+            "violations": [violation.to_dict() for violation in r.get("violations") or []],
+        }
+        for r in results
+    ]
+
+
+async def build_export(results: list[dict], tolerance: int) -> tuple[ExportBody, str, str]:
+    """Return (body, media type, filename) of the DCF workbook, or of plain Excel exports if the template fails."""
+    try:
+        logger.info("Creating DCF template export")
+
+        # Get disambiguation info from the latest balance sheet result
+        balance_sheets = [r for r in results if r["statement_type"] == "rozvaha"]
+        disambiguation_info = None
+        if balance_sheets:
+            latest_bs = max(balance_sheets, key=lambda x: getattr(x["model"], "rok", 0))
+            disambiguation_info = latest_bs.get("disambiguation_info")
+            year = getattr(latest_bs["model"], "rok", "")
+            filename = f"DCF_valuagent_{year}.xlsx"
+        else:
+            filename = "DCF_valuagent.xlsx"
+
+        dcf_buffer = await export_dcf_template_async(results, disambiguation_info, tolerance=tolerance)
+
+        logger.info(f"Generated DCF template: {filename}")
+        return dcf_buffer, XLSX_MEDIA_TYPE, filename
+
+    except Exception as e:
+        logger.error(f"Failed to create DCF template: {e}", exc_info=True)
+        # Fallback to old behavior if DCF template fails
+        logger.info("Falling back to ZIP export due to DCF template error")
+
+    # If only one Excel, return it directly for convenience
+    if len(results) == 1:
+        return await asyncio.to_thread(_build_single_excel_export, results[0])
+
+    # Otherwise stream a ZIP, one workbook at a time
+    logger.info(f"Streaming ZIP file with {len(results)} Excel files (fallback)")
+    return stream_zip(_excel_members(results)), "application/zip", "valuagent_results.zip"
+
+
+def _build_single_excel_export(r0: dict) -> tuple[io.BytesIO, str, str]:
+    logger.info("Returning single Excel file (fallback)")
+    st_type = r0["statement_type"]
+    model_obj = r0["model"]
+    excel_buffer = export_excel(st_type, model_obj)
+    safe_name = (r0["original"] or "valuagent").rsplit(".", 1)[0]
+    filename = f"{safe_name}_{st_type}_{model_obj.rok}.xlsx"
+    logger.info(f"Generated Excel file: {filename}")
+    return excel_buffer, XLSX_MEDIA_TYPE, filename
+
+
+def _excel_members(results: list[dict]) -> Iterator[tuple[str, Callable[[], bytes]]]:
+    for i, r in enumerate(results):
+        st_type = r["statement_type"]
+        model_obj = r["model"]
+        safe_name = (r["original"] or "valuagent").rsplit(".", 1)[0]
+        arcname = f"{safe_name}_{st_type}_{model_obj.rok}.xlsx"
+
+        def produce(i=i, r=r, st_type=st_type, model_obj=model_obj) -> bytes:
+            logger.debug(f"Generating Excel {i+1}/{len(results)}: {r['original']} - {st_type}")
+            return export_excel(st_type, model_obj).getvalue()
+
+        yield arcname, produce
+
+
+async def read_export(body: ExportBody) -> bytes:
+    """The whole export as bytes, e.g. to keep it as a job result."""
+    if isinstance(body, io.BytesIO):
+        return body.getvalue()
+    return b"".join([chunk async for chunk in body])
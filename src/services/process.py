@@ -1,19 +1,37 @@
+import asyncio
 import json
 import logging
-from typing import Any, Dict
+import time
+from typing import Any, Dict, Optional
 
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
-from src.domain.prompts.balance_sheet import balance_sheet_ocr_instructions
-from src.domain.prompts.profit_and_loss import profit_and_loss_ocr_instructions
+from src.domain.prompts.balance_sheet import (
+    balance_sheet_ocr_instructions,
+    balance_sheet_subtree_ocr_instructions,
+)
+from src.domain.prompts.profit_and_loss import (
+    profit_and_loss_ocr_instructions,
+    profit_and_loss_subtree_ocr_instructions,
+)
 from src.domain.prompts.statement_disambiguation import (
     statement_disambiguation_instructions,
 )
+from src.domain.prompts.combined import combined_extraction_instructions
 from src.domain.models.balance_sheet import BalanceSheet, BalanceSheetRow
 from src.domain.models.profit_and_loss import ProfitAndLoss, ProfitAndLossRow
+from src.domain.models.rules import BALANCE_SHEET_RULE_MATRIX, PROFIT_AND_LOSS_RULE_MATRIX
+from src.domain.models.violations import Violation, format_violation_cz, row_names_for, violations_from_error
 from src.infrastructure.clients.genai_client import generate_json_from_pdf, generate_json_from_pdf_async
+from src.infrastructure.clients.pdf_store import PdfHandle
+from src.infrastructure.pdf.page_locator import StatementPdfs
+from src.infrastructure.pdf.table_extractor import extract_statement, find_statement_date
+from src.infrastructure.pdf.text_layer import render_pages_text
+from src.infrastructure.cache import get_response_cache, make_cache_key, sha256_hex
+from src.infrastructure import config
+from src.services import progress
 from src.shared import utils
 
 
@@ -25,6 +43,12 @@ def pick_prompt(statement_type: str) -> str:
     raise HTTPException(status_code=400, detail="Unsupported statement_type. Use 'rozvaha' or 'vzz'.")
 
 
+def pick_subtree_prompt(statement_type: str, row_ids: set[int]) -> str:
+    if statement_type == "rozvaha":
+        return balance_sheet_subtree_ocr_instructions(row_ids)
+    return profit_and_loss_subtree_ocr_instructions(row_ids)
+
+
 def validate_payload(statement_type: str, data_dict: Dict[str, Any], tolerance: int):
     if statement_type == "rozvaha":
         return BalanceSheet.model_validate_with_tolerance(data_dict, tolerance=tolerance)
@@ -68,21 +92,7 @@ def disambiguate_pdf_bytes(pdf_bytes: bytes) -> dict:
     except json.JSONDecodeError:
         data = utils.load_json_from_text(text_response)
 
-    # Normalize possible Czech keys and booleans
-    rozvaha = False
-    vzz = False
-    datum = None
-
-    for key, value in (data or {}).items():
-        normalized_key = str(key).strip().lower()
-        if normalized_key in {"rozvaha"}:
-            rozvaha = bool(value)
-        if normalized_key in {"výkaz_zisku_a_ztráty", "vykaz_zisku_a_ztraty", "vzz"}:
-            vzz = bool(value)
-        if normalized_key in {"datum", "date"} and isinstance(value, str):
-            datum = value
-
-    return {"rozvaha": rozvaha, "vzz": vzz, "datum": datum}
+    return _normalize_disambiguation(data)
 
 
 # Async variants
@@ -92,7 +102,7 @@ async def process_pdf_bytes_async(pdf_bytes: bytes, statement_type: str, toleran
     prompt = pick_prompt(statement_type)
     logger.debug(f"Using prompt for {statement_type}, length: {len(prompt)} chars")
     
-    text_response = await generate_json_from_pdf_async(pdf_bytes, prompt)
+    text_response = await generate_json_from_pdf_async(pdf_bytes, prompt, cacheable=True)
     if not text_response:
         logger.error("Empty response from model")
         raise HTTPException(status_code=500, detail="Empty response from model")
@@ -116,13 +126,25 @@ async def process_pdf_bytes_async(pdf_bytes: bytes, statement_type: str, toleran
     return model_obj
 
 
-async def disambiguate_pdf_bytes_async(pdf_bytes: bytes) -> dict:
+async def disambiguate_pdf_bytes_async(pdf_bytes: bytes, pdf_handle: Optional[PdfHandle] = None) -> dict:
     """Async version of disambiguation using the new SDK."""
     logger.info("Starting PDF statement disambiguation")
-    
-    text_response = await generate_json_from_pdf_async(
-        pdf_bytes, statement_disambiguation_instructions
-    )
+
+    cache = get_response_cache()
+    cache_key = None
+    text_response = None
+    if cache is not None:
+        pdf_sha256 = pdf_handle.sha256 if pdf_handle is not None else sha256_hex(pdf_bytes)
+        cache_key = make_cache_key(pdf_sha256, statement_disambiguation_instructions, config.get_model())
+        text_response = await cache.get(cache_key)
+        if text_response is not None:
+            logger.info("Disambiguation served from response cache")
+
+    fresh = text_response is None
+    if fresh:
+        text_response = await generate_json_from_pdf_async(
+            pdf_bytes, statement_disambiguation_instructions, pdf_handle=pdf_handle
+        )
     if not text_response:
         logger.error("Empty response from disambiguation model")
         raise HTTPException(status_code=500, detail="Empty response from model (disambiguation)")
@@ -135,12 +157,21 @@ async def disambiguate_pdf_bytes_async(pdf_bytes: bytes) -> dict:
         logger.warning(f"Disambiguation JSON decode failed: {e}, attempting fallback parsing")
         data = utils.load_json_from_text(text_response)
 
-    # Normalize possible Czech keys and booleans
+    # Only answers that parse into an object are reused
+    if fresh and cache_key is not None and isinstance(data, dict):
+        await cache.put(cache_key, text_response)
+    result = _normalize_disambiguation(data)
+    logger.info(f"Disambiguation completed: {result}")
+    return result
+
+
+def _normalize_disambiguation(data: Any) -> dict:
+    """Normalize possible Czech keys and booleans of a disambiguation answer."""
     rozvaha = False
     vzz = False
     datum = None
 
-    for key, value in (data or {}).items():
+    for key, value in (data if isinstance(data, dict) else {}).items():
         normalized_key = str(key).strip().lower()
         if normalized_key in {"rozvaha"}:
             rozvaha = bool(value)
@@ -149,159 +180,277 @@ async def disambiguate_pdf_bytes_async(pdf_bytes: bytes) -> dict:
         if normalized_key in {"datum", "date"} and isinstance(value, str):
             datum = value
 
-    result = {"rozvaha": rozvaha, "vzz": vzz, "datum": datum}
-    logger.info(f"Disambiguation completed: {result}")
-    return result
+    return {"rozvaha": rozvaha, "vzz": vzz, "datum": datum}
+
+
+def _format_validation_error(error: Exception, statement_type: str) -> tuple[list[Violation], list[str]]:
+    """The violations of a failed validation and short Czech messages for finance users (e.g. in Excel).
+
+    The messages list the violations first (in the same order), then the other
+    problems of the payload (missing fields, values of the wrong type).
+    """
+    violations, other = violations_from_error(error)
+    row_names = row_names_for(statement_type)
+    statement_label = "Rozvaha" if statement_type == "rozvaha" else "Výsledovka"
+    messages = [format_violation_cz(violation, statement_type, row_names) for violation in violations]
+    for text in other:
+        # Field errors are located as data.<row>.<column>
+        parts = text.split(": ", 1)
+        location = parts[0].split(".") if len(parts) == 2 else []
+        if len(location) >= 2 and location[0] == "data" and location[1].isdigit():
+            row = int(location[1])
+            column = f" ({'.'.join(location[2:])})" if len(location) > 2 else ""
+            text = f"ř. {row} ({row_names.get(row, str(row))}){column}: {parts[1]}"
+        messages.append(f"{statement_label}, {text}")
+    return violations, messages
+
+
+async def _run_ocr_attempt(
+    pdf_bytes: bytes,
+    statement_type: str,
+    tolerance: int,
+    attempt: int,
+    pdf_handle: Optional[PdfHandle] = None,
+    document_text: Optional[str] = None,
+) -> dict:
+    """Run a single OCR call and validate it.
+
+    Returns a dict with the parsed payload ("raw", None if unparseable), the
+    validated "model" (None if validation failed), the rule "violations", the
+    formatted "validation_errors" and the raw "text" of the response.
+    """
+    text_response = await generate_json_from_pdf_async(
+        pdf_bytes, pick_prompt(statement_type), pdf_handle=pdf_handle, document_text=document_text, cacheable=True
+    )
+    if not text_response:
+        logger.error("Empty response from model during OCR attempt")
+        return {"raw": None, "model": None, "violations": [], "validation_errors": ["Prázdná odpověď z OCR modelu"], "text": text_response}
+
+    try:
+        data_dict = json.loads(text_response)
+    except json.JSONDecodeError as e:
+        logger.warning(f"JSON decode failed on attempt {attempt}: {e}")
+        try:
+            data_dict = utils.load_json_from_text(text_response)
+        except Exception as e2:
+            logger.error(f"Fallback JSON extraction failed: {e2}")
+            return {"raw": None, "model": None, "violations": [], "validation_errors": ["Neplatný JSON z OCR modelu"], "text": text_response}
+
+    return _validate_attempt(statement_type, data_dict, tolerance, attempt, text_response)
 
 
-def _format_validation_error(error_msg: str, statement_type: str, tolerance: int | None = None) -> list[str]:
-    """Convert technical validation error text into a list of short Czech messages.
+def _validate_attempt(statement_type: str, data_dict: Any, tolerance: int, attempt: int, text_response: str) -> dict:
+    """Validate a parsed payload and wrap it in the outcome dict used by the retry loop."""
+    try:
+        model_obj = validate_payload(statement_type, data_dict, tolerance)
+    except Exception as e:
+        # Pydantic validation error or business rule error
+        logger.info(f"Validation failed on attempt {attempt}: {e}")
+        violations, messages = _format_validation_error(e, statement_type)
+        return {
+            "raw": data_dict if isinstance(data_dict, dict) else None,
+            "model": None,
+            "violations": violations,
+            "validation_errors": messages,
+            "text": text_response,
+        }
+
+    logger.info(f"Validation succeeded on attempt {attempt} for {statement_type}")
+    return {"raw": data_dict, "model": model_obj, "violations": [], "validation_errors": [], "text": text_response}
+
+
+def _run_text_layer_attempt(statement_type: str, page_texts: list[str], tolerance: int) -> Optional[dict]:
+    """Parse the statement from its pages' text layer; None when the parse is not usable."""
+    start = time.perf_counter()
+    data_dict = extract_statement(
+        statement_type, page_texts, min_coverage=config.get_text_layer_min_coverage_percent() / 100
+    )
+    if data_dict is None:
+        return None
+    outcome = _validate_attempt(statement_type, data_dict, tolerance, 0, "")
+    logger.info(
+        f"Text layer parse of {statement_type} {'validated' if outcome['model'] is not None else 'failed validation'} "
+        f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+    )
+    return outcome
+
 
-    The returned list is suitable for presenting to finance users (e.g., in Excel).
+def _find_failing_rows(statement_type: str, data_dict: Dict[str, Any], tolerance: int) -> set[int]:
+    """Return target and source rows of every rule the extraction violates.
+
+    Rows that fail row-level validation (e.g. Brutto - Korekce != Netto) are
+    included as well.
     """
-    from src.shared import utils
-    import re
+    row_cls = BalanceSheetRow if statement_type == "rozvaha" else ProfitAndLossRow
+    data_int = utils.convert_string_keys_to_int(data_dict)
+    rows: Dict[int, Any] = {}
+    failing: set[int] = set()
+    for key, value in (data_int.get("data") or {}).items():
+        try:
+            rows[int(key)] = row_cls.model_validate(value, context={"tolerance": tolerance})
+        except Exception:
+            failing.add(int(key))
 
-    # Load row names for the given statement
     if statement_type == "rozvaha":
-        row_names = utils.load_balance_sheet_row_names()
-        statement_label = "Rozvaha"
+        matrix, fields = BALANCE_SHEET_RULE_MATRIX, ("netto", "netto_minule")
     else:
-        row_names = utils.load_profit_and_loss_row_names()
-        statement_label = "Výsledovka"
-
-    # Trim common Pydantic boilerplate and keep only the core list of issues
-    core = error_msg
-    # Keep text after our explicit failure marker if present
-    for marker in ("Balance sheet validation failed:", "Profit and loss validation failed:"):
-        if marker in core:
-            core = core.split(marker, 1)[1]
-            break
-    # Remove Pydantic headers/footers
-    core = re.sub(r"\s*\[type=.*?\]", "", core)
-    core = re.sub(r"For further information visit .*", "", core)
-
-    issues: list[str] = []
-
-    # Split by lines, consider only those that look like rule messages
-    lines = [ln.strip(" -\t\n") for ln in core.splitlines() if ln.strip()]
-
-    # Helpers
-    def with_row(num: int) -> str:
-        return f"ř. {num} ({row_names.get(num, str(num))})"
-
-    def finalize(msg: str, diff: str | None) -> str:
-        if diff and tolerance is not None:
-            return f"{msg}. Rozdíl {diff} > tolerance {tolerance}."
-        if diff:
-            return f"{msg}. Rozdíl {diff}."
-        return msg
-
-    for ln in lines:
-        # Netto rule (Balance sheet)
-        m = re.search(r"Rule validation failed for netto: Row (\d+) \(([^)]+)\) != Sum of rows ([^(]+) \(([^)]+)\).*?difference: (\d+)", ln)
-        if m:
-            target_row = int(m.group(1))
-            target_val = m.group(2)
-            src_rows = [p.strip() for p in m.group(3).split("+") if p.strip()]
-            sum_val = m.group(4)
-            diff = m.group(5)
-            src_pretty: list[str] = []
-            for part in src_rows:
-                try:
-                    src_pretty.append(with_row(int(part)))
-                except Exception:
-                    src_pretty.append(part)
-            msg = f"{statement_label}, {with_row(target_row)} {target_val} ≠ součet {', '.join(src_pretty)} {sum_val}"
-            issues.append(finalize(msg, diff))
-            continue
+        matrix, fields = PROFIT_AND_LOSS_RULE_MATRIX, ("současné", "minulé")
+    failing.update(matrix.failing_rows(matrix.values(rows, fields), tolerance))
+    return failing
 
-        # Netto_minule rule (Balance sheet previous-year column)
-        m = re.search(r"Rule validation failed for netto_minule: Row (\d+) \(([^)]+)\) != Sum of rows ([^(]+) \(([^)]+)\).*?difference: (\d+)", ln)
-        if m:
-            target_row = int(m.group(1))
-            target_val = m.group(2)
-            src_rows = [p.strip() for p in m.group(3).split("+") if p.strip()]
-            sum_val = m.group(4)
-            diff = m.group(5)
-            src_pretty: list[str] = []
-            for part in src_rows:
-                try:
-                    src_pretty.append(with_row(int(part)))
-                except Exception:
-                    src_pretty.append(part)
-            msg = f"{statement_label}, {with_row(target_row)} (sl. minulé) {target_val} ≠ součet {', '.join(src_prety)} {sum_val}"
-            # fix typo variable name if needed: ensure src_pretty is used
-            msg = msg.replace("{', '.join(src_prety)}", ", ".join(src_pretty))
-            issues.append(finalize(msg, diff))
-            continue
 
-        # Flexible PL rule (with + / - expression)
-        m = re.search(r"Flexible rule validation failed for ([^:]+): Row (\d+) \(([^)]+)\) != ([^()]+) \(([^)]+)\).*?difference: (\d+)", ln)
-        if m:
-            field = m.group(1).strip()
-            target_row = int(m.group(2))
-            target_val = m.group(3)
-            expr = m.group(4).strip()
-            calc_val = m.group(5)
-            diff = m.group(6)
-            # Convert expression like 31+35-34 into pretty row refs
-            parts_pretty: list[str] = []
-            token = ""
-            sign = "+"
-            for ch in expr:
-                if ch in "+-":
-                    if token.strip():
-                        try:
-                            num = int(token.strip())
-                            name = with_row(num)
-                        except Exception:
-                            name = token.strip()
-                        parts_pretty.append(("+" if sign == "+" else "−") + " " + name)
-                    sign = ch
-                    token = ""
-                else:
-                    token += ch
-            if token.strip():
-                try:
-                    num = int(token.strip())
-                    name = with_row(num)
-                except Exception:
-                    name = token.strip()
-                parts_pretty.append(("+" if sign == "+" else "−") + " " + name)
-            expr_pretty = " ".join(p.lstrip("+") for p in parts_pretty).strip()
-            msg = f"{statement_label}, {with_row(target_row)} ({field}) {target_val} ≠ {expr_pretty} {calc_val}"
-            issues.append(finalize(msg, diff))
-            continue
+def _merge_partial_extraction(previous: Dict[str, Any], partial: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay re-extracted rows onto the previous extraction (keys normalised to strings)."""
+    merged_rows = {str(k): v for k, v in (previous.get("data") or {}).items()}
+    for key, value in (partial.get("data") or {}).items():
+        if isinstance(value, dict):
+            merged_rows[str(key)] = value
+    merged = dict(previous)
+    merged["data"] = merged_rows
+    return merged
 
-        # Brutto - Korekce row-level rule
-        if "Brutto - Korekce validation failed" in ln:
-            # Translate straight to Czech; row number is not included in the message
-            ln_cz = ln.replace("Brutto - Korekce validation failed:", "Chyba kontroly Brutto − Korekce:")
-            # Try to attach difference if present
-            m2 = re.search(r"difference: (\d+)", ln)
-            diff = m2.group(1) if m2 else None
-            issues.append(finalize(f"{statement_label}: {ln_cz}", diff))
-            continue
 
-        # Fallback: replace bare Row N with Czech row + name and keep message concise
-        def repl(match: re.Match[str]) -> str:
-            try:
-                return with_row(int(match.group(1)))
-            except Exception:
-                return match.group(0)
-        short = re.sub(r"[Rr]ow (\d+)", repl, ln)
-        short = re.sub(r"\s+", " ", short).strip()
-        if short:
-            issues.append(short)
+async def _run_targeted_attempt(
+    pdf_bytes: bytes,
+    statement_type: str,
+    tolerance: int,
+    attempt: int,
+    previous_raw: Dict[str, Any],
+    previous_violations: list[Violation],
+    previous_errors: list[str],
+    row_ids: set[int],
+    pdf_handle: Optional[PdfHandle] = None,
+    document_text: Optional[str] = None,
+) -> dict:
+    """Re-extract only row_ids, merge them into previous_raw and revalidate.
+
+    Returns the same outcome dict as _run_ocr_attempt; if the partial answer
+    is unusable, the previous extraction is returned unchanged with errors.
+    """
+    logger.info(f"Targeted re-extraction of {len(row_ids)} rows for {statement_type}: {sorted(row_ids)}")
+    text_response = await generate_json_from_pdf_async(
+        pdf_bytes, pick_subtree_prompt(statement_type, row_ids), pdf_handle=pdf_handle, document_text=document_text
+    )
+    try:
+        try:
+            partial = json.loads(text_response)
+        except json.JSONDecodeError:
+            partial = utils.load_json_from_text(text_response)
+    except Exception as e:
+        logger.warning(f"Targeted re-extraction on attempt {attempt} returned unusable JSON: {e}")
+        partial = None
+    if not isinstance(partial, dict):
+        return {
+            "raw": previous_raw,
+            "model": None,
+            "violations": previous_violations,
+            "validation_errors": previous_errors,
+            "text": text_response,
+        }
+
+    merged = _merge_partial_extraction(previous_raw, partial)
+    try:
+        model_obj = validate_payload(statement_type, merged, tolerance)
+    except Exception as e:
+        logger.info(f"Validation failed after targeted re-extraction on attempt {attempt}: {e}")
+        violations, messages = _format_validation_error(e, statement_type)
+        return {
+            "raw": merged,
+            "model": None,
+            "violations": violations,
+            "validation_errors": messages,
+            "text": text_response,
+        }
+
+    logger.info(f"Validation succeeded after targeted re-extraction on attempt {attempt} for {statement_type}")
+    return {"raw": merged, "model": model_obj, "violations": [], "validation_errors": [], "text": text_response}
+
+
+async def _run_speculative_attempts(
+    pdf_bytes: bytes,
+    statement_type: str,
+    tolerance: int,
+    budget: int,
+    parallel_attempts: int,
+    pdf_handle: Optional[PdfHandle] = None,
+    document_text: Optional[str] = None,
+) -> tuple[Optional[dict], list[dict], int]:
+    """Keep up to parallel_attempts OCR calls in flight until one validates.
+
+    Each response is validated as soon as it arrives; the first valid one wins
+    and the remaining calls are cancelled. A failed attempt is replaced by a
+    new one while the total budget allows. Returns (winning outcome or None,
+    failed outcomes in completion order, number of attempts launched).
+    """
+    pending: set[asyncio.Task] = set()
+    failures: list[dict] = []
+    last_exception: Optional[BaseException] = None
+    launched = 0
+
+    def launch() -> None:
+        nonlocal launched
+        launched += 1
+        logger.info(f"OCR attempt {launched}/{budget} for {statement_type} (speculative, up to {parallel_attempts} in flight)")
+        progress.emit("ocr_attempt_started", statement_type=statement_type, attempt=launched, max_attempts=budget)
+        pending.add(asyncio.create_task(
+            _run_ocr_attempt(pdf_bytes, statement_type, tolerance, launched, pdf_handle, document_text)
+        ))
+
+    for _ in range(min(parallel_attempts, budget)):
+        launch()
 
-    # If nothing was parsed, fall back to one trimmed message
-    if not issues:
-        msg = re.sub(r"\s+", " ", core).strip()
-        if msg:
-            issues = [msg]
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                try:
+                    outcome = task.result()
+                except Exception as e:
+                    logger.warning(f"Speculative OCR attempt for {statement_type} failed: {e}")
+                    last_exception = e
+                    outcome = None
+                _report_attempt(statement_type, outcome)
+                if outcome is not None and outcome["model"] is not None:
+                    if pending:
+                        logger.info(f"First valid {statement_type} response won, cancelling {len(pending)} other attempts")
+                    return outcome, failures, launched
+                if outcome is not None:
+                    failures.append(outcome)
+                if launched < budget:
+                    launch()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if last_exception is not None and not any(f["raw"] is not None for f in failures):
+        raise last_exception
+    return None, failures, launched
+
+
+def _report_attempt(statement_type: str, outcome: Optional[dict], attempt: Optional[int] = None) -> None:
+    progress.emit(
+        "ocr_attempt_finished",
+        statement_type=statement_type,
+        attempt=attempt,
+        valid=outcome is not None and outcome["model"] is not None,
+        errors=len(outcome["validation_errors"]) if outcome is not None else None,
+    )
 
-    return issues
+
+def _report_result(result: dict) -> dict:
+    """Emit the final validation status of a statement and return the result unchanged."""
+    progress.emit(
+        "validation",
+        statement_type=result["statement_type"],
+        status=result["status"],
+        attempts=result["ocr_attempts"],
+        errors=len(result["validation_errors"]),
+        source="cache" if result.get("cached") else result.get("source", "model"),
+    )
+    return result
 
 
 async def ocr_and_validate_with_retries(
@@ -309,61 +458,153 @@ async def ocr_and_validate_with_retries(
     statement_type: str,
     tolerance: int,
     max_retries: int,
+    pdf_handle: Optional[PdfHandle] = None,
+    parallel_attempts: int = 1,
+    seed_outcome: Optional[dict] = None,
+    page_texts: Optional[list[str]] = None,
 ) -> dict:
     """Run OCR and statement-level validation with up to max_retries attempts.
 
+    When pdf_handle is given, every attempt references the already registered
+    PDF instead of re-sending the bytes. When an attempt parses but fails the
+    business rules, the next retry re-extracts only the rows of the failing
+    rules and merges them into the previous result. With parallel_attempts > 1 attempts
+    run speculatively: that many calls are in flight at once, the first valid
+    response wins and the rest are cancelled (the attempt budget is then
+    max(max_retries, parallel_attempts)). A seed_outcome produced elsewhere
+    (e.g. by the combined extraction) counts as the first attempt. When the
+    text of the statement pages is given, a local parse of it is tried first
+    and the model is only called if that parse does not validate; with the
+    'text' input mode for statement_type the model then gets a text rendition
+    of those pages instead of the PDF.
+
     Returns a result dict containing:
       - statement_type: str
       - model: validated Pydantic model or None
       - raw: last parsed dict or None
-      - validation_errors: list[str] (only from final attempt)
+      - violations: list[Violation] (the failed rules and row checks of the final attempt)
+      - validation_errors: list[str] (only from final attempt; Czech, violations first)
       - ocr_attempts: int
       - status: "ok" | "errors"
     """
     attempts = 0
     last_raw = None
+    final_violations: list[Violation] = []
     final_validation_errors: list[str] = []
-
-    for attempt in range(1, max_retries + 1):
-        attempts = attempt
-        logger.info(f"OCR attempt {attempt}/{max_retries} for {statement_type}")
-        text_response = await generate_json_from_pdf_async(pdf_bytes, pick_prompt(statement_type))
-        if not text_response:
-            logger.error("Empty response from model during OCR attempt")
-            final_validation_error = "Prázdná odpověď z OCR modelu"
-            continue
-
-        try:
-            data_dict = json.loads(text_response)
-        except json.JSONDecodeError as e:
-            logger.warning(f"JSON decode failed on attempt {attempt}: {e}")
+    seed_outcomes = [seed_outcome] if seed_outcome is not None else []
+    document_text = None
+    if page_texts and config.get_ocr_input_mode(statement_type) == "text":
+        document_text = render_pages_text(page_texts)
+
+    # A previously validated response for the same PDF, prompt and model is reused as-is
+    cache = get_response_cache()
+    cache_key = None
+    if cache is not None:
+        if document_text is not None:
+            pdf_sha256 = sha256_hex(document_text)
+        else:
+            pdf_sha256 = pdf_handle.sha256 if pdf_handle is not None else sha256_hex(pdf_bytes)
+        cache_key = make_cache_key(pdf_sha256, pick_prompt(statement_type), config.get_model())
+        cached_text = None
+        if seed_outcome is None or seed_outcome["model"] is None:
+            cached_text = await cache.get(cache_key)
+        if cached_text is not None:
             try:
-                data_dict = utils.load_json_from_text(text_response)
-            except Exception as e2:
-                logger.error(f"Fallback JSON extraction failed: {e2}")
-                final_validation_error = "Neplatný JSON z OCR modelu"
-                continue
-
-        last_raw = data_dict
-
-        try:
-            model_obj = validate_payload(statement_type, data_dict, tolerance)
-            logger.info(f"Validation succeeded on attempt {attempt} for {statement_type}")
-            return {
+                data_dict = json.loads(cached_text)
+                model_obj = validate_payload(statement_type, data_dict, tolerance)
+                logger.info(f"OCR for {statement_type} served from response cache")
+                return _report_result({
+                    "statement_type": statement_type,
+                    "model": model_obj,
+                    "raw": data_dict,
+                    "violations": [],
+                    "validation_errors": [],
+                    "ocr_attempts": 0,
+                    "status": "ok",
+                    "cached": True,
+                })
+            except Exception as e:
+                logger.info(f"Cached {statement_type} response not usable at tolerance {tolerance}, running OCR: {e}")
+
+    if page_texts and seed_outcome is None and config.is_text_layer_extraction_enabled():
+        outcome = await asyncio.to_thread(_run_text_layer_attempt, statement_type, page_texts, tolerance)
+        if outcome is not None and outcome["model"] is not None:
+            return _report_result({
                 "statement_type": statement_type,
-                "model": model_obj,
-                "raw": last_raw,
+                "model": outcome["model"],
+                "raw": outcome["raw"],
+                "violations": [],
                 "validation_errors": [],
-                "ocr_attempts": attempts,
+                "ocr_attempts": 0,
                 "status": "ok",
-            }
-        except Exception as e:
-            # Pydantic validation error or business rule error
-            raw_msg = str(e)
-            formatted_list = _format_validation_error(raw_msg, statement_type, tolerance)
-            logger.info(f"Validation failed on attempt {attempt}: {raw_msg}")
-            final_validation_errors = formatted_list
-            # continue to retry
+                "source": "text_layer",
+            })
+
+    if seed_outcome is not None and (seed_outcome["model"] is not None or max_retries <= 1):
+        outcomes = seed_outcomes
+        winner = seed_outcome if seed_outcome["model"] is not None else None
+        attempts = 1
+    elif parallel_attempts > 1:
+        budget = max(max_retries, parallel_attempts) - len(seed_outcomes)
+        winner, failures, attempts = await _run_speculative_attempts(
+            pdf_bytes, statement_type, tolerance, budget, parallel_attempts, pdf_handle, document_text
+        )
+        attempts += len(seed_outcomes)
+        outcomes = seed_outcomes + failures + ([winner] if winner is not None else [])
+    else:
+        outcomes = list(seed_outcomes)
+        winner = None
+        for attempt in range(len(seed_outcomes) + 1, max_retries + 1):
+            attempts = attempt
+            logger.info(f"OCR attempt {attempt}/{max_retries} for {statement_type}")
+            failing_rows: set[int] = set()
+            previous = outcomes[-1] if outcomes else None
+            if previous is not None and previous["raw"] is not None and config.is_targeted_retry_enabled():
+                failing_rows = _find_failing_rows(statement_type, previous["raw"], tolerance)
+                if len(failing_rows) > config.get_targeted_retry_max_rows():
+                    logger.info(f"{len(failing_rows)} rows fail validation, re-extracting the whole {statement_type}")
+                    failing_rows = set()
+            progress.emit(
+                "ocr_attempt_started",
+                statement_type=statement_type,
+                attempt=attempt,
+                max_attempts=max_retries,
+                rows=len(failing_rows) or None,
+            )
+            if failing_rows:
+                outcome = await _run_targeted_attempt(
+                    pdf_bytes, statement_type, tolerance, attempt,
+                    previous["raw"], previous["violations"], previous["validation_errors"], failing_rows, pdf_handle, document_text,
+                )
+            else:
+                outcome = await _run_ocr_attempt(pdf_bytes, statement_type, tolerance, attempt, pdf_handle, document_text)
+            outcomes.append(outcome)
+            _report_attempt(statement_type, outcome, attempt)
+            if outcome["model"] is not None:
+                winner = outcome
+                break
+
+    if winner is not None:
+        if cache_key is not None:
+            await cache.put(cache_key, json.dumps(winner["raw"], ensure_ascii=False))
+        return _report_result({
+            "statement_type": statement_type,
+            "model": winner["model"],
+            "raw": winner["raw"],
+            "violations": [],
+            "validation_errors": [],
+            "ocr_attempts": attempts,
+            "status": "ok",
+        })
+
+    for outcome in outcomes:
+        if outcome["raw"] is not None:
+            last_raw = outcome["raw"]
+            final_violations = outcome["violations"]
+            final_validation_errors = outcome["validation_errors"]
+    if last_raw is None and outcomes:
+        final_violations = outcomes[-1]["violations"]
+        final_validation_errors = outcomes[-1]["validation_errors"]
 
     # All attempts failed; return best-effort model with final error
     best_effort_model = None
@@ -398,11 +639,125 @@ async def ocr_and_validate_with_retries(
     # Return only the final validation error (the one from the data we're actually using)
     validation_errors = final_validation_errors if final_validation_errors else []
     
-    return {
+    return _report_result({
         "statement_type": statement_type,
         "model": best_effort_model,
         "raw": last_raw,
+        "violations": final_violations,
         "validation_errors": validation_errors,
         "ocr_attempts": attempts,
         "status": "errors",
-    }
+    })
+
+
+async def extract_combined_async(
+    pdf_bytes: bytes,
+    tolerance: int,
+    max_retries: int,
+    pdf_handle: Optional[PdfHandle] = None,
+    parallel_attempts: int = 1,
+) -> tuple[dict, dict[str, dict]]:
+    """Disambiguate and extract both statements with a single model call.
+
+    The combined answer carries the presence flags, the date and both
+    statements. Each present statement is validated on its own; statements
+    that fail are retried with the per-statement prompts, the combined
+    extraction counting as their first attempt.
+
+    Returns (disambiguation info, result dict per present statement type).
+    """
+    logger.info("Starting combined disambiguation and extraction")
+
+    cache = get_response_cache()
+    cache_key = None
+    text_response = None
+    if cache is not None:
+        pdf_sha256 = pdf_handle.sha256 if pdf_handle is not None else sha256_hex(pdf_bytes)
+        cache_key = make_cache_key(pdf_sha256, combined_extraction_instructions, config.get_model())
+        text_response = await cache.get(cache_key)
+        if text_response is not None:
+            logger.info("Combined extraction served from response cache")
+
+    fresh = text_response is None
+    if fresh:
+        progress.emit("ocr_attempt_started", statement_type="combined", attempt=1, max_attempts=1)
+        text_response = await generate_json_from_pdf_async(
+            pdf_bytes, combined_extraction_instructions, pdf_handle=pdf_handle, cacheable=True
+        )
+    if not text_response:
+        logger.error("Empty response from combined extraction model")
+        raise HTTPException(status_code=500, detail="Empty response from model (combined extraction)")
+
+    try:
+        data = json.loads(text_response)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Combined extraction JSON decode failed: {e}, attempting fallback parsing")
+        data = utils.load_json_from_text(text_response)
+    if not isinstance(data, dict):
+        data = {}
+    elif fresh and cache_key is not None:
+        # Only answers that parse into an object are reused
+        await cache.put(cache_key, text_response)
+
+    info = _normalize_disambiguation(data)
+    logger.info(f"Combined disambiguation: {info}")
+    progress.emit("disambiguation", source="combined", **info)
+
+    payload_keys = {"rozvaha": "rozvaha_data", "vzz": "vzz_data"}
+    tasks = {}
+    for statement_type, payload_key in payload_keys.items():
+        if not info[statement_type]:
+            continue
+        payload = data.get(payload_key)
+        if isinstance(payload, dict):
+            seed = _validate_attempt(statement_type, payload, tolerance, 1, text_response)
+            _report_attempt(statement_type, seed, 1)
+        else:
+            logger.warning(f"Combined answer flags {statement_type} as present but has no {payload_key}")
+            seed = None
+        tasks[statement_type] = ocr_and_validate_with_retries(
+            pdf_bytes,
+            statement_type,
+            tolerance,
+            max_retries,
+            pdf_handle=pdf_handle,
+            parallel_attempts=parallel_attempts,
+            seed_outcome=seed,
+        )
+
+    results = await asyncio.gather(*tasks.values())
+    return info, dict(zip(tasks.keys(), results))
+
+
+async def extract_from_text_layer(statement_pdfs: StatementPdfs, tolerance: int) -> Optional[tuple[dict, dict[str, dict]]]:
+    """Read both statements from the text layer without calling the model.
+
+    Only succeeds when both statements were located and both parses validate;
+    the date comes from the statement headings. Returns the same
+    (disambiguation info, results per statement type) as extract_combined_async.
+    """
+    if not config.is_text_layer_extraction_enabled():
+        return None
+    texts = {st_type: statement_pdfs.statement_texts(st_type) for st_type in ("rozvaha", "vzz")}
+    if not all(texts.values()):
+        return None
+
+    results: dict[str, dict] = {}
+    for st_type, page_texts in texts.items():
+        outcome = await asyncio.to_thread(_run_text_layer_attempt, st_type, page_texts, tolerance)
+        if outcome is None or outcome["model"] is None:
+            return None
+        results[st_type] = {
+            "statement_type": st_type,
+            "model": outcome["model"],
+            "raw": outcome["raw"],
+            "violations": [],
+            "validation_errors": [],
+            "ocr_attempts": 0,
+            "status": "ok",
+            "source": "text_layer",
+        }
+
+    info = {"rozvaha": True, "vzz": True, "datum": find_statement_date(texts["rozvaha"])}
+    logger.info(f"Both statements read from the text layer, skipping the model: {info}")
+    return info, results
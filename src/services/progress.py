@@ -0,0 +1,33 @@
+"""Progress events of a processing run.
+
+The pipeline reports what it is doing with emit(stage, **fields). Whoever
+runs it (a background job) installs a sink in the progress_sink context
+variable; without a sink emit does nothing, so POST /process pays nothing for
+it. The file being processed is taken from progress_file, which process_files
+sets per file.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+progress_sink: ContextVar[Optional[Callable[[dict], None]]] = ContextVar("progress_sink", default=None)
+progress_file: ContextVar[Optional[str]] = ContextVar("progress_file", default=None)
+
+
+def emit(stage: str, **fields) -> None:
+    """Report a progress event to the current sink, if any."""
+    sink = progress_sink.get()
+    if sink is None:
+        return
+    event = {"stage": stage, "time": round(time.time(), 3)}
+    file_name = progress_file.get()
+    if file_name is not None:
+        event["file"] = file_name
+    event.update(fields)
+    try:
+        sink(event)
+    except Exception as e:
+        logger.debug(f"Dropping progress event {stage}: {e}")
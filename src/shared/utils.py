@@ -1,5 +1,5 @@
 import json
-from typing import Dict, Any, Union
+from typing import Dict, Any, Optional, Set, Union
 from importlib import resources
 
 
@@ -39,16 +39,23 @@ def read_profit_and_loss_index() -> Dict[int, Any]:
     return convert_string_keys_to_int(data)
 
 
-def index_to_string(index: Dict[int, Any], indent_level: int = 0) -> str:
-    """Convert index dict to a formatted string with tab indents."""
+def index_to_string(index: Dict[int, Any], indent_level: int = 0, include: Optional[Set[int]] = None) -> str:
+    """Convert index dict to a formatted string with tab indents.
+
+    When include is given, only those rows are listed; they keep the indent
+    of their depth in the full tree so the hierarchy stays readable.
+    """
     result = []
     for row_id in sorted(index.keys()):
         row_data = index[row_id]
-        indent = "\t" * indent_level
-        line = f"{indent}{row_id} {row_data['name']}"
-        result.append(line)
+        if include is None or row_id in include:
+            indent = "\t" * indent_level
+            line = f"{indent}{row_id} {row_data['name']}"
+            result.append(line)
         if "sub_rows" in row_data and row_data["sub_rows"]:
-            result.append(index_to_string(row_data["sub_rows"], indent_level + 1))
+            sub_text = index_to_string(row_data["sub_rows"], indent_level + 1, include)
+            if sub_text:
+                result.append(sub_text)
     return "\n".join(result)
 
 
@@ -0,0 +1,51 @@
+"""Randomized statement payloads for the validation tests."""
+import random
+from typing import Dict
+
+from src.shared import utils
+
+BALANCE_SHEET_FIELDS = ("netto", "netto_minule")
+PROFIT_AND_LOSS_FIELDS = ("současné", "minulé")
+
+
+def _consistent_rows(index: dict, fields: tuple, rng: random.Random) -> Dict[int, dict]:
+    """Random leaf values with every parent row the sum of its sub-rows."""
+    rows: Dict[int, dict] = {}
+
+    def walk(node: dict) -> dict:
+        totals = dict.fromkeys(fields, 0)
+        for row_id, row in node.items():
+            if row.get("sub_rows"):
+                values = walk(row["sub_rows"])
+            else:
+                values = {field: rng.randint(-1000, 100_000) for field in fields}
+            rows[row_id] = values
+            for field in fields:
+                totals[field] += values[field]
+        return totals
+
+    walk(index)
+    return rows
+
+
+def _perturb(rows: Dict[int, dict], fields: tuple, rng: random.Random) -> Dict[int, dict]:
+    """Break some rules: change, zero or drop rows, and now and then push a value outside int64."""
+    for row_id in rng.sample(sorted(rows), rng.randint(0, 6)):
+        action = rng.random()
+        if action < 0.2:
+            del rows[row_id]
+        elif action < 0.3:
+            rows[row_id][rng.choice(fields)] = rng.choice([2 ** 63, -(2 ** 63) - 1, 10 ** 25])
+        else:
+            rows[row_id][rng.choice(fields)] += rng.choice([1, -1, 2, 5, 1000, -123_456])
+    return rows
+
+
+def random_balance_sheet(rng: random.Random) -> dict:
+    rows = _perturb(_consistent_rows(utils.read_balance_sheet_index(), BALANCE_SHEET_FIELDS, rng), BALANCE_SHEET_FIELDS, rng)
+    return {"rok": 2024, "data": {str(row_id): values for row_id, values in rows.items()}}
+
+
+def random_profit_and_loss(rng: random.Random) -> dict:
+    rows = _perturb(_consistent_rows(utils.read_profit_and_loss_index(), PROFIT_AND_LOSS_FIELDS, rng), PROFIT_AND_LOSS_FIELDS, rng)
+    return {"rok": 2024, "data": {str(row_id): values for row_id, values in rows.items()}}
@@ -0,0 +1,71 @@
+"""Batch validation against the violations of the statement models."""
+import json
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from src.domain.models.balance_sheet import BalanceSheet
+from src.domain.models.profit_and_loss import ProfitAndLoss
+from src.domain.models.violations import BRUTTO_KOREKCE, violations_from_error
+from src.services.batch_validation import validate_jsonl, validate_statements
+from tests.statements import random_balance_sheet, random_profit_and_loss
+
+STATEMENTS = {"rozvaha": (BalanceSheet, random_balance_sheet), "vzz": (ProfitAndLoss, random_profit_and_loss)}
+
+
+def model_messages(model, payload: dict, tolerance: int) -> list[str]:
+    try:
+        model.model_validate(payload, context={"tolerance": tolerance})
+    except ValidationError as e:
+        violations, other = violations_from_error(e)
+        assert other == []
+        return [violation.message() for violation in violations]
+    return []
+
+
+@pytest.mark.parametrize("statement_type", sorted(STATEMENTS))
+def test_violations_match_the_models(statement_type):
+    model, make_payload = STATEMENTS[statement_type]
+    rng = random.Random(statement_type)
+    payloads = [make_payload(rng) for _ in range(200)]
+    for tolerance in (0, 5):
+        results = validate_statements(payloads, statement_type, tolerance)
+        for payload, result in zip(payloads, results):
+            assert result.errors == []
+            assert [violation.message() for violation in result.violations] == model_messages(model, payload, tolerance)
+
+
+def test_brutto_korekce_rows_outside_the_rules_are_checked():
+    payload = {"rok": 2024, "data": {"3": {"brutto": 100, "korekce": -30, "netto": 60}, "999": {"brutto": 5, "korekce": 1.0, "netto": 4}}}
+    (result,) = validate_statements([payload], "rozvaha", tolerance=5)
+    assert result.errors == []
+    row_checks = [(violation.target_row, violation.computed_value) for violation in result.violations if violation.kind == BRUTTO_KOREKCE]
+    assert row_checks == [(3, 70)]
+
+    payload["data"]["999"]["netto"] = 3
+    (result,) = validate_statements([payload], "rozvaha", tolerance=0)
+    assert [violation.target_row for violation in result.violations if violation.kind == BRUTTO_KOREKCE] == [3, 999]
+
+
+def test_values_the_models_accept_or_reject():
+    data = {"1": {"netto": 10 ** 20, "netto_minule": "7"}, "2": {"netto": 10 ** 20, "netto_minule": 7.0}}
+    lines = [
+        json.dumps({"statement_type": "rozvaha", "rok": 2024, "data": data}),
+        json.dumps({"statement_type": "rozvaha", "rok": 2024, "data": {"1": {"netto": 1.5}, "2": {"netto": True}}}),
+        json.dumps({"statement_type": "rozvaha", "rok": 2024, "data": {"1": {"netto": -(10 ** 20)}}}),
+    ]
+    exact, rejected, huge = validate_jsonl(lines)
+
+    assert exact.errors == []
+    assert exact.violations
+    assert [violation.message() for violation in exact.violations] == model_messages(BalanceSheet, json.loads(lines[0]), 0)
+
+    assert rejected.errors == ["Row 1: netto is not an integer (1.5)", "Row 2: netto is not an integer (True)"]
+    assert rejected.violations == []
+    with pytest.raises(ValidationError, match="fractional part"):
+        BalanceSheet.model_validate({"rok": 2024, "data": {"1": {"netto": 1.5}}})
+
+    assert huge.errors == []
+    assert huge.violations[0].target_row == 1
+    assert huge.violations[0].target_value == -(10 ** 20)
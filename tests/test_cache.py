@@ -0,0 +1,104 @@
+"""Memory and SQLite tiers of the response cache."""
+import asyncio
+
+import pytest
+
+from src.infrastructure import cache as cache_module
+from src.infrastructure.cache import ResponseCache, make_cache_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "responses.sqlite3")
+
+
+def test_key_covers_pdf_prompt_and_model():
+    key = make_cache_key("pdf", "prompt", "model")
+    assert key == make_cache_key("pdf", "prompt", "model")
+    assert len({key, make_cache_key("pdf2", "prompt", "model"), make_cache_key("pdf", "prompt2", "model"), make_cache_key("pdf", "prompt", "model2")}) == 4
+
+
+def test_memory_then_disk_hits(path):
+    async def main():
+        cache = ResponseCache(path, memory_entries=1)
+        assert await cache.get("a") is None
+        await cache.put("a", "A")
+        await cache.put("b", "B")
+        assert await cache.get("b") == "B"
+        # "a" fell out of the one-entry memory tier but is still on disk
+        assert await cache.get("a") == "A"
+        stats = cache.stats()
+        assert (stats["hits_memory"], stats["hits_disk"], stats["misses"]) == (1, 1, 1)
+        assert (stats["memory_entries"], stats["disk_entries"]) == (1, 2)
+        cache.close()
+
+        reopened = ResponseCache(path)
+        assert await reopened.get("b") == "B"
+        assert reopened.stats()["hits_disk"] == 1
+        reopened.close()
+
+    asyncio.run(main())
+
+
+def test_expired_entries_are_misses(path, monkeypatch):
+    async def main():
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+        cache = ResponseCache(path, ttl_seconds=60)
+        await cache.put("a", "A")
+        now[0] += 30
+        assert await cache.get("a") == "A"
+        now[0] += 31
+        assert await cache.get("a") is None
+        assert cache.stats()["disk_entries"] == 0
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_size_limit_evicts_least_recently_used(path, monkeypatch):
+    async def main():
+        now = [1000.0]
+        monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+        cache = ResponseCache(path, memory_entries=0, max_bytes=25, ttl_seconds=0)
+        for key in "abc":
+            now[0] += 1
+            await cache.put(key, key * 10)
+        # c pushed the total over 25 bytes; a was the least recently used
+        assert await cache.get("a") is None
+        now[0] += 1
+        assert await cache.get("b") == "b" * 10
+        now[0] += 1
+        await cache.put("d", "d" * 10)
+        assert await cache.get("c") is None
+        assert await cache.get("b") == "b" * 10
+        assert cache.stats()["evictions"] == 2
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_invalidate_removes_both_tiers(path):
+    async def main():
+        cache = ResponseCache(path)
+        await cache.put("a", "A")
+        await cache.invalidate("a")
+        assert await cache.get("a") is None
+        assert cache.stats()["disk_entries"] == 0
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_failed_open_is_remembered(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv("OCR_CACHE_ENABLED", "1")
+    monkeypatch.setenv("OCR_CACHE_PATH", str(blocker / "responses.sqlite3"))
+    monkeypatch.setattr(cache_module, "_response_cache", None)
+    monkeypatch.setattr(cache_module, "_response_cache_unavailable", False)
+    opened = []
+    monkeypatch.setattr(cache_module, "ResponseCache", lambda **kwargs: opened.append(kwargs) or ResponseCache(**kwargs))
+    assert cache_module.get_response_cache() is None
+    assert cache_module.get_response_cache() is None
+    assert len(opened) == 1
@@ -0,0 +1,100 @@
+"""Context caching of the static prompts: opt-in, failure backoff and stale handles."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors as genai_errors
+
+from src.infrastructure.clients import genai_client
+from src.infrastructure.clients.context_cache import ContextCacheManager
+
+
+def client_error(code: int, status: str, message: str) -> genai_errors.APIError:
+    error_type = genai_errors.ClientError if code < 500 else genai_errors.ServerError
+    return error_type(code, {"error": {"code": code, "status": status, "message": message}})
+
+
+class FakeCaches:
+    def __init__(self, error=None):
+        self.error = error
+        self.created: list = []
+        self.deleted: list = []
+
+    async def create(self, model, config):
+        if self.error is not None:
+            raise self.error
+        self.created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}", expire_time=None, usage_metadata=None)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class FakeModels:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.cached_contents: list = []
+
+    async def generate_content(self, model, contents, config):
+        self.cached_contents.append(config.cached_content)
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(usage_metadata=None, text="{}")
+
+
+def fake_client(caches=None, models=None):
+    return SimpleNamespace(aio=SimpleNamespace(caches=caches or FakeCaches(), models=models or FakeModels()))
+
+
+@pytest.mark.parametrize("cacheable, created", [(True, 1), (False, 0)])
+def test_only_cacheable_prompts_are_cached(monkeypatch, cacheable, created):
+    client = fake_client()
+    manager = ContextCacheManager(min_prompt_chars=1)
+    monkeypatch.setattr(genai_client, "get_client_registry", lambda: SimpleNamespace(get=lambda api_key, model: client))
+    monkeypatch.setattr(genai_client, "get_context_cache", lambda: manager)
+    monkeypatch.setenv("GENAI_HEDGING", "0")
+
+    async def main():
+        for _ in range(2):
+            await genai_client.generate_json_from_pdf_async(b"%PDF", "prompt " * 500, model="m", api_key="k", cacheable=cacheable)
+
+    asyncio.run(main())
+    assert len(client.aio.caches.created) == created
+    assert manager.calls_cached == (2 if cacheable else 0)
+
+
+@pytest.mark.parametrize("code, status, backoff", [(400, "INVALID_ARGUMENT", 3600), (404, "NOT_FOUND", 3600), (429, "RESOURCE_EXHAUSTED", 60), (503, "UNAVAILABLE", 60)])
+def test_failed_creation_backs_off_by_error_kind(code, status, backoff):
+    manager = ContextCacheManager(ttl_seconds=3600, failure_backoff_seconds=60, min_prompt_chars=1)
+    client = fake_client(FakeCaches(client_error(code, status, "x")))
+    assert asyncio.run(manager.get_cached_content(client, "k", "m", "prompt")) is None
+    (retry_at,) = manager._unsupported.values()
+    assert round(retry_at - time.time()) == backoff
+
+
+@pytest.mark.parametrize("error, falls_back", [
+    (client_error(404, "NOT_FOUND", "CachedContent not found"), True),
+    (client_error(400, "INVALID_ARGUMENT", "cachedContents/1 has expired"), True),
+    (client_error(400, "INVALID_ARGUMENT", "Unsupported MIME type"), False),
+    (client_error(429, "RESOURCE_EXHAUSTED", "quota"), False),
+    (client_error(503, "UNAVAILABLE", "overloaded"), False),
+])
+def test_only_stale_handles_fall_back_inline(error, falls_back):
+    caches = FakeCaches()
+    models = FakeModels([error])
+    client = fake_client(caches, models)
+    manager = ContextCacheManager(min_prompt_chars=1)
+
+    async def main():
+        return await genai_client._generate_json(client, b"%PDF", "prompt", "m", api_key="k", context_cache=manager)
+
+    if falls_back:
+        assert asyncio.run(main()) == "{}"
+        assert models.cached_contents == ["cachedContents/1", None]
+        assert caches.deleted == ["cachedContents/1"]
+    else:
+        with pytest.raises(type(error)):
+            asyncio.run(main())
+        assert models.cached_contents == ["cachedContents/1"]
+        assert caches.deleted == []
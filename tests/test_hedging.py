@@ -0,0 +1,120 @@
+"""Hedged requests: the loser is cancelled, the hedge takes its own slot, the whole call is timed."""
+import asyncio
+
+import pytest
+
+from src.infrastructure.clients.hedging import RequestHedger
+from src.infrastructure.clients.scheduler import LLMScheduler
+
+KEY = ("model", "prompt")
+
+
+def warmed_hedger(delay: float) -> RequestHedger:
+    hedger = RequestHedger(percentile=50, min_samples=1, max_hedge_rate=1.0)
+    hedger._histogram(KEY).add(delay)
+    return hedger
+
+
+class Calls:
+    """make_call returning the given delays in order and recording how each call ended."""
+
+    def __init__(self, *delays: float):
+        self.delays = list(delays)
+        self.outcomes: list = []
+
+    async def __call__(self):
+        index = len(self.outcomes)
+        self.outcomes.append("running")
+        try:
+            await asyncio.sleep(self.delays[index])
+        except asyncio.CancelledError:
+            self.outcomes[index] = "cancelled"
+            raise
+        self.outcomes[index] = "done"
+        return index
+
+
+def test_hedge_wins_and_primary_is_cancelled():
+    async def main():
+        hedger = warmed_hedger(0.01)
+        scheduler = LLMScheduler(max_in_flight=2)
+        calls = Calls(1.0, 0.01)
+        async with scheduler.slot("s"):
+            assert await hedger.run(KEY, calls, scheduler) == 1
+            assert scheduler.stats()["in_flight"] == 1
+        assert calls.outcomes == ["cancelled", "done"]
+        assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+        assert scheduler.stats()["in_flight"] == 0
+        # Measured from the primary's start, so the sample includes the wait before hedging
+        assert hedger._histogram(KEY).percentile(100) >= 0.02
+
+    asyncio.run(main())
+
+
+def test_primary_wins_and_hedge_is_cancelled():
+    async def main():
+        hedger = warmed_hedger(0.01)
+        scheduler = LLMScheduler(max_in_flight=2)
+        calls = Calls(0.03, 1.0)
+        async with scheduler.slot("s"):
+            assert await hedger.run(KEY, calls, scheduler) == 0
+        assert calls.outcomes == ["done", "cancelled"]
+        assert (hedger.hedges, hedger.hedge_wins) == (1, 0)
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_hedge_is_skipped_without_a_free_slot():
+    async def main():
+        hedger = warmed_hedger(0.01)
+        scheduler = LLMScheduler(max_in_flight=1)
+        calls = Calls(0.03)
+        async with scheduler.slot("s"):
+            assert await hedger.run(KEY, calls, scheduler) == 0
+        assert calls.outcomes == ["done"]
+        assert (hedger.hedges, hedger.hedges_skipped_no_slot) == (0, 1)
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_cancelling_the_caller_cancels_both_requests():
+    async def main():
+        hedger = warmed_hedger(0.01)
+        scheduler = LLMScheduler(max_in_flight=2)
+        calls = Calls(1.0, 1.0)
+
+        async def call():
+            async with scheduler.slot("s"):
+                return await hedger.run(KEY, calls, scheduler)
+
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0.05)
+        assert calls.outcomes == ["running", "running"]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert calls.outcomes == ["cancelled", "cancelled"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_error_of_one_request_waits_for_the_other():
+    async def main():
+        hedger = warmed_hedger(0.01)
+        started: list = []
+
+        async def make_call():
+            started.append(len(started))
+            if len(started) == 1:
+                await asyncio.sleep(0.02)
+                raise RuntimeError("primary failed")
+            await asyncio.sleep(0.05)
+            return "hedge"
+
+        assert await hedger.run(KEY, make_call) == "hedge"
+        assert started == [0, 1]
+
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""Durable job store: persistence, idempotent submissions and resuming after a restart."""
+import asyncio
+import io
+import sqlite3
+
+import pytest
+
+from src.infrastructure.job_store import JobStore
+from src.infrastructure.uploads import spool_stream
+from src.services import jobs
+from src.services.jobs import IdempotencyConflict, JobManager
+from src.services.pipeline import ProcessOptions
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_SPOOL_DIR", str(tmp_path / "spool"))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def job_row(job_id: str, key=None, status="queued", created_at=1.0) -> dict:
+    return {
+        "id": job_id,
+        "session_id": "s",
+        "idempotency_key": key,
+        "fingerprint": f"fp-{job_id}",
+        "options": {"tolerance": 1},
+        "status": status,
+        "created_at": created_at,
+    }
+
+
+def uploads(*contents: bytes) -> list:
+    return [spool_stream(f"{n}.pdf", io.BytesIO(content)) for n, content in enumerate(contents)]
+
+
+def file_rows(spooled: list) -> list[dict]:
+    return [{"name": upload.name, "size": upload.size, "status": "queued"} for upload in spooled]
+
+
+def test_job_files_stages_and_events_round_trip(path):
+    store = JobStore(path)
+    spooled = uploads(b"%PDF-1 first", b"")
+    store.create_job(job_row("a", key="k"), file_rows(spooled), spooled)
+    store.save_stage("a", 0, "disambiguation", {"rozvaha": True})
+    store.append_event("a", {"id": 0, "event": "job_started"})
+    store.update_file("a", 0, "done", None, [{"rows": 3}])
+    store.close()
+
+    store = JobStore(path)
+    assert store.find_by_idempotency_key("s", "k") == ("a", "fp-a")
+    assert store.find_by_idempotency_key("other", "k") is None
+    job = store.load_job("a")
+    assert job["options"] == {"tolerance": 1}
+    assert [(f["name"], f["size"], f["status"], f["statements"]) for f in job["files"]] == [
+        ("0.pdf", 12, "done", [{"rows": 3}]),
+        ("1.pdf", 0, "queued", []),
+    ]
+    assert job["events"] == [{"id": 0, "event": "job_started"}]
+    assert store.load_stages("a") == {0: {"disambiguation": {"rozvaha": True}}}
+    assert [upload.read() for upload in store.load_payloads("a")] == [b"%PDF-1 first", b""]
+    store.close()
+
+
+def test_duplicate_idempotency_key_is_rejected(path):
+    store = JobStore(path)
+    store.create_job(job_row("a", key="k"), [], [])
+    with pytest.raises(sqlite3.IntegrityError):
+        store.create_job(job_row("b", key="k"), [], [])
+    # Jobs without a key never collide
+    store.create_job(job_row("c"), [], [])
+    store.create_job(job_row("d"), [], [])
+    store.close()
+
+
+def test_unfinished_and_expired_jobs(path):
+    store = JobStore(path)
+    for job_id, created_at in [("b", 2.0), ("a", 1.0), ("done", 0.5), ("old", 0.1)]:
+        spooled = uploads(b"%PDF")
+        store.create_job(job_row(job_id, created_at=created_at), file_rows(spooled), spooled)
+    store.update_job("done", status="done", finished_at=100.0)
+    store.update_job("old", status="failed", finished_at=10.0)
+    store.save_stage("old", 0, "validated", {})
+    assert store.unfinished_job_ids() == ["a", "b"]
+
+    assert store.delete_finished_before(50.0) == 1
+    assert store.load_job("old") is None
+    assert store.load_stages("old") == {}
+    assert store.load_job("done")["status"] == "done"
+    store.close()
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Replace the pipeline with one that records its inputs and the checkpoints it was given."""
+    calls = []
+
+    async def process_files(payloads, options, on_file_event=None, checkpoints=None):
+        calls.append(([upload.read() for upload in payloads], [checkpoint.stages for checkpoint in checkpoints or []]))
+        for index in range(len(payloads)):
+            await on_file_event(index, "done", [])
+        return []
+
+    monkeypatch.setattr(jobs, "process_files", process_files)
+    return calls
+
+
+def test_idempotent_submission_attaches_to_the_job(path, processed):
+    options = ProcessOptions(return_json=True)
+
+    async def main():
+        manager = JobManager(workers=1, queue_max=10, retention_seconds=3600, store=JobStore(path))
+        job, created = await manager.submit("s", uploads(b"%PDF a"), options, idempotency_key="k")
+        retry, retried = await manager.submit("s", uploads(b"%PDF a"), options, idempotency_key="k")
+        assert (created, retried) == (True, False)
+        assert retry is job
+        with pytest.raises(IdempotencyConflict):
+            await manager.submit("s", uploads(b"%PDF b"), options, idempotency_key="k")
+        # The key is scoped to the session
+        _, other_session = await manager.submit("t", uploads(b"%PDF a"), options, idempotency_key="k")
+        assert other_session
+        await manager._queue.join()
+        await manager.close()
+
+        # After a restart the key is found in the store
+        restarted = JobManager(workers=1, queue_max=10, retention_seconds=3600, store=JobStore(path))
+        stored, created = await restarted.submit("s", uploads(b"%PDF a"), options, idempotency_key="k")
+        assert not created
+        assert (stored.id, stored.status, stored.summary) == (job.id, "done", [])
+        assert restarted.deduplicated == 1
+        await restarted.close()
+
+    asyncio.run(main())
+    assert [pdfs for pdfs, _ in processed] == [[b"%PDF a"], [b"%PDF a"]]
+
+
+def test_unfinished_job_resumes_from_its_checkpoints(path, processed):
+    store = JobStore(path)
+    spooled = uploads(b"%PDF a", b"%PDF b")
+    store.create_job(job_row("a"), file_rows(spooled), spooled)
+    store.update_job("a", status="running", started_at=2.0)
+    store.update_file("a", 0, "done", None, [])
+    store.update_file("a", 1, "running", None, [])
+    store.save_stage("a", 1, "disambiguation", {"vzz": True})
+    store.close()
+
+    async def main():
+        manager = JobManager(workers=1, queue_max=10, retention_seconds=3600, store=JobStore(path))
+        assert await manager.recover() == 1
+        await manager._queue.join()
+        job = await manager.get("a")
+        assert job.status == "done"
+        await manager.close()
+
+    asyncio.run(main())
+    assert processed == [([b"%PDF a", b"%PDF b"], [{}, {"disambiguation": {"vzz": True}}])]
+    store = JobStore(path)
+    assert store.unfinished_job_ids() == []
+    # The payloads are dropped once the job has finished
+    assert [upload.read() for upload in store.load_payloads("a")] == [b"", b""]
+    store.close()
@@ -0,0 +1,123 @@
+"""Incremental multipart parsing of /process bodies."""
+import asyncio
+import os
+
+import pytest
+from starlette.requests import Request
+
+from src.infrastructure.multipart_stream import MAX_FIELD_BYTES, FormField, FormFile, MalformedForm, iter_form
+from src.infrastructure.uploads import UploadTooLarge
+
+BOUNDARY = "----valuagent-test"
+MB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def body(*parts: tuple) -> bytes:
+    """(name, value) fields and (name, filename, content) files as a multipart/form-data body."""
+    chunks = []
+    for part in parts:
+        chunks.append(f"--{BOUNDARY}\r\n".encode())
+        if len(part) == 2:
+            name, value = part
+            chunks.append(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode() + value.encode() + b"\r\n")
+        else:
+            name, filename, content = part
+            chunks.append(
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: application/pdf\r\n\r\n".encode() + content + b"\r\n"
+            )
+    chunks.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(chunks)
+
+
+def request(data: bytes, chunk_size: int, content_type: str = f"multipart/form-data; boundary={BOUNDARY}") -> Request:
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {"type": "http", "method": "POST", "path": "/process", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def parse(data: bytes, chunk_size: int = 64 * 1024, max_file_bytes: int = MB, max_request_bytes: int = 2 * MB, **kwargs) -> list:
+    """The parsed items as ('field', name, value) / ('file', field, filename, content); spooled files are discarded."""
+
+    async def main():
+        items = []
+        async for item in iter_form(request(data, chunk_size, **kwargs), max_file_bytes, max_request_bytes):
+            if isinstance(item, FormField):
+                items.append(("field", item.name, item.value))
+            else:
+                assert isinstance(item, FormFile)
+                items.append(("file", item.field, item.upload.name, item.upload.read()))
+                item.upload.discard()
+        return items
+
+    return asyncio.run(main())
+
+
+def test_fields_and_files_in_body_order():
+    pdf = b"%PDF-1.7\r\n--not-a-boundary\r\n" + os.urandom(3000)
+    data = body(("tolerance", "5"), ("files", "a.pdf", pdf), ("return_json", "true"), ("files", "b.pdf", b"%PDF-b"))
+    assert parse(data) == [
+        ("field", "tolerance", "5"),
+        ("file", "files", "a.pdf", pdf),
+        ("field", "return_json", "true"),
+        ("file", "files", "b.pdf", b"%PDF-b"),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(BOUNDARY) + 3])
+def test_boundaries_split_across_chunks(chunk_size):
+    pdf = b"%PDF" + bytes(range(256)) * 4
+    data = body(("tolerance", "1"), ("files", "a.pdf", pdf), ("files", "b.pdf", pdf[::-1]))
+    assert parse(data, chunk_size=chunk_size) == parse(data)
+
+
+def test_empty_file_and_unnamed_file():
+    data = body(("files", "empty.pdf", b""), ("files", "", b"%PDF-x"))
+    assert parse(data) == [("file", "files", "empty.pdf", b""), ("file", "files", "soubor_2.pdf", b"%PDF-x")]
+
+
+def test_non_utf8_field_falls_back_to_latin1():
+    data = body(("files", "a.pdf", b"x")).replace(b'name="files"', b'name="soubor_\xe9"')
+    assert parse(data)[0][1] == "soubor_é"
+
+
+def test_not_multipart_is_rejected():
+    with pytest.raises(MalformedForm):
+        parse(b"{}", content_type="application/json")
+    with pytest.raises(MalformedForm):
+        parse(body(("tolerance", "1")), content_type="multipart/form-data")
+
+
+def test_garbage_body_is_rejected():
+    with pytest.raises(MalformedForm):
+        parse(b"no boundary here\r\n" * 10)
+
+
+def test_field_too_long_is_rejected():
+    with pytest.raises(MalformedForm):
+        parse(body(("tolerance", "1" * (MAX_FIELD_BYTES + 1))))
+
+
+def test_file_too_large_leaves_no_spool_file(spool_dir):
+    data = body(("files", "a.pdf", b"a" * 100), ("files", "big.pdf", b"b" * (MB + 1)))
+    with pytest.raises(UploadTooLarge):
+        parse(data, chunk_size=4096)
+    assert os.listdir(spool_dir) == []
+
+
+def test_request_too_large_leaves_no_spool_file(spool_dir):
+    data = body(("files", "a.pdf", b"a" * (MB // 2)), ("files", "b.pdf", b"b" * (MB // 2)), ("files", "c.pdf", b"c" * 10))
+    with pytest.raises(UploadTooLarge):
+        parse(data, chunk_size=4096, max_request_bytes=MB)
+    assert os.listdir(spool_dir) == []
@@ -0,0 +1,82 @@
+"""Locating the statement pages of an annual report from its text layer."""
+import io
+
+import pypdf
+
+from src.infrastructure.pdf.page_locator import _statement_labels, locate_statement_pages, split_statement_pdfs
+from src.infrastructure.pdf.text_layer import normalize_text
+from src.shared import utils
+
+
+def statement_page(statement_type: str, heading: str, count: int, skip: int = 0) -> str:
+    names = utils.load_balance_sheet_row_names() if statement_type == "rozvaha" else utils.load_profit_and_loss_row_names()
+    labels = _statement_labels(statement_type)
+    rows = [name for _, name in sorted(names.items()) if normalize_text(name) in labels][skip:skip + count]
+    return "\n".join([heading] + [f"{name:<70}{i + 1:>6}{'1 000':>14}{'2 000':>14}" for i, name in enumerate(rows)])
+
+
+COVER = "Výroční zpráva 2024\nObsah\nZpráva představenstva o podnikatelské činnosti společnosti"
+NOTES = "Příloha účetní závěrky\nSpolečnost nemá žádné významné události po rozvahovém dni."
+
+
+def report() -> list[str]:
+    return [
+        COVER,
+        NOTES,
+        statement_page("rozvaha", "ROZVAHA v plném rozsahu k 31.12.2024", 60),
+        # Continuation page without a heading, far below the first page's score
+        statement_page("rozvaha", "", 8, skip=60),
+        statement_page("vzz", "VÝKAZ ZISKU A ZTRÁTY v druhovém členění", 30),
+        NOTES,
+        # Notes repeating a few row labels, not next to the statement
+        statement_page("rozvaha", "Komentář k položkám", 7, skip=10),
+    ]
+
+
+def test_statements_and_their_continuation_pages_are_located():
+    assert locate_statement_pages(report()) == {"rozvaha": [2, 3], "vzz": [4]}
+
+
+def test_statement_below_the_minimum_score_is_not_located():
+    pages = [COVER, statement_page("vzz", "VÝKAZ ZISKU A ZTRÁTY", 30), statement_page("rozvaha", "", 2)]
+    assert locate_statement_pages(pages) == {"vzz": [1]}
+
+
+def test_max_pages_caps_the_selection():
+    pages = [statement_page("rozvaha", "ROZVAHA", 20, skip=20 * i) for i in range(4)]
+    assert len(locate_statement_pages(pages, max_pages=2)["rozvaha"]) == 2
+
+
+def blank_pdf(pages: int) -> bytes:
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def page_count(pdf_bytes: bytes) -> int:
+    return len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def test_split_slices_each_statement_and_the_overview():
+    texts = report()
+    pdf = blank_pdf(len(texts))
+    result = split_statement_pdfs(pdf, texts)
+    assert result.pages == {"rozvaha": [2, 3], "vzz": [4]}
+    assert page_count(result.for_statement("rozvaha")) == 2
+    assert page_count(result.for_statement("vzz")) == 1
+    assert page_count(result.for_overview()) == 3
+    assert result.statement_texts("vzz") == [texts[4]]
+
+
+def test_split_keeps_the_full_pdf_when_a_statement_is_missing():
+    texts = [COVER, statement_page("vzz", "VÝKAZ ZISKU A ZTRÁTY", 30), NOTES]
+    pdf = blank_pdf(len(texts))
+    result = split_statement_pdfs(pdf, texts)
+    assert result.for_statement("rozvaha") is pdf
+    assert result.statement_texts("rozvaha") is None
+    # Disambiguation must see the whole document when only one statement was found
+    assert result.for_overview() is pdf
+    assert page_count(result.for_statement("vzz")) == 1
@@ -0,0 +1,98 @@
+"""RuleMatrix against the per-rule evaluation it replaces."""
+import random
+
+import numpy as np
+import pytest
+
+from src.domain.models.balance_sheet import BalanceSheetRow
+from src.domain.models.profit_and_loss import ProfitAndLossRow
+from src.domain.models.rule_matrix import RuleMatrix
+from src.domain.models.rules import (
+    BALANCE_SHEET_RULE_MATRIX,
+    PREDEFINED_VALIDATION_RULES,
+    PROFIT_AND_LOSS_RULE_MATRIX,
+    PROFIT_AND_LOSS_RULES,
+)
+from tests.statements import BALANCE_SHEET_FIELDS, PROFIT_AND_LOSS_FIELDS, random_balance_sheet, random_profit_and_loss
+
+STATEMENTS = {
+    "rozvaha": (
+        BALANCE_SHEET_RULE_MATRIX,
+        [(rule.target_row, [(row, 1) for row in rule.source_rows]) for rule in PREDEFINED_VALIDATION_RULES],
+        BALANCE_SHEET_FIELDS,
+        BalanceSheetRow,
+        random_balance_sheet,
+    ),
+    "vzz": (
+        PROFIT_AND_LOSS_RULE_MATRIX,
+        [(rule.target_row, rule.source_expressions) for rule in PROFIT_AND_LOSS_RULES],
+        PROFIT_AND_LOSS_FIELDS,
+        ProfitAndLossRow,
+        random_profit_and_loss,
+    ),
+}
+
+
+def statement_rows(payload: dict, row_type) -> dict:
+    return {int(row_id): row_type(**values) for row_id, values in payload["data"].items()}
+
+
+def per_rule_residuals(rules, data: dict, field: str) -> list[int]:
+    """target - signed sum of the sources of every rule, missing rows counting as 0."""
+    residuals = []
+    for target, terms in rules:
+        target_value = getattr(data[target], field) if target in data else 0
+        computed = sum(getattr(data[row], field) * sign for row, sign in terms if row in data)
+        residuals.append(target_value - computed)
+    return residuals
+
+
+@pytest.mark.parametrize("statement_type", sorted(STATEMENTS))
+def test_residuals_and_failures_match_per_rule_evaluation(statement_type):
+    matrix, rules, fields, row_type, make_payload = STATEMENTS[statement_type]
+    rng = random.Random(statement_type)
+    for _ in range(300):
+        data = statement_rows(make_payload(rng), row_type)
+        tolerance = rng.choice([0, 0, 1, 5, 1000])
+        values = matrix.values(data, fields)
+
+        expected_residuals = [per_rule_residuals(rules, data, field) for field in fields]
+        assert matrix.residuals(values).tolist() == expected_residuals
+
+        expected_failures = []
+        for column, field in enumerate(fields):
+            for i, residual in enumerate(expected_residuals[column]):
+                if abs(residual) > tolerance:
+                    target = rules[i][0]
+                    target_value = getattr(data[target], field) if target in data else 0
+                    expected_failures.append((column, i, target_value, target_value - residual))
+        assert matrix.failures(values, tolerance) == expected_failures
+
+        failing_rows = {row for column, i, _, _ in expected_failures for row in [rules[i][0]] + [row for row, _ in rules[i][1]]}
+        assert matrix.failing_rows(values, tolerance) == failing_rows
+
+
+def test_stacked_statements_match_one_by_one():
+    # Enough columns for the dense float64 product; values stay below its exact limit
+    matrix = BALANCE_SHEET_RULE_MATRIX
+    rng = np.random.default_rng(7)
+    stack = rng.integers(-10 ** 9, 10 ** 9, size=(40, 2, len(matrix.row_ids)), dtype=np.int64)
+    stacked = matrix.residuals(stack)
+    for statement, residuals in zip(stack, stacked):
+        assert residuals.tolist() == np.add.reduceat(statement[..., matrix.positions] * matrix.coefficients, matrix._starts, axis=-1).tolist()
+
+
+def test_values_outside_int64_stay_exact():
+    matrix = RuleMatrix([(1, [(2, 1), (3, -1)])])
+    data = {1: BalanceSheetRow(netto=2 ** 64), 2: BalanceSheetRow(netto=2 ** 64 + 7), 3: BalanceSheetRow(netto=3)}
+    values = matrix.values(data, ("netto",))
+    assert values.dtype == object
+    assert matrix.residuals(values).tolist() == [[-4]]
+    assert matrix.failures(values, 0) == [(0, 0, 2 ** 64, 2 ** 64 + 4)]
+    assert matrix.failures(values, 4) == []
+
+
+def test_missing_rows_count_as_zero():
+    matrix = RuleMatrix([(10, [(11, 1), (12, 1)]), (20, [(21, 1), (22, -1)])])
+    data = {11: BalanceSheetRow(netto=4), 20: BalanceSheetRow(netto=-5), 22: BalanceSheetRow(netto=5)}
+    assert matrix.residuals(matrix.values(data, ("netto",))).tolist() == [[-4, 0]]
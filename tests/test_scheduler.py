@@ -0,0 +1,90 @@
+"""Round-robin admission and cancellation in LLMScheduler."""
+import asyncio
+
+from src.infrastructure.clients.scheduler import LLMScheduler
+
+
+async def _hold(scheduler: LLMScheduler, session: str, name: str, admitted: list, release: asyncio.Event) -> None:
+    async with scheduler.slot(session):
+        admitted.append(name)
+        await release.wait()
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_sessions_are_served_round_robin():
+    async def main():
+        scheduler = LLMScheduler(max_in_flight=1)
+        admitted: list = []
+        release = asyncio.Event()
+        blocker = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, "a", "a0", admitted, blocker))
+        await _settle()
+        tasks = [asyncio.create_task(_hold(scheduler, "a", f"a{i}", admitted, release)) for i in (1, 2, 3)]
+        await _settle()
+        tasks += [asyncio.create_task(_hold(scheduler, "b", f"b{i}", admitted, release)) for i in (1, 2)]
+        await _settle()
+        assert scheduler.queue_depth == 5
+        assert not scheduler.try_acquire()
+
+        release.set()
+        blocker.set()
+        await asyncio.gather(first, *tasks)
+        assert admitted == ["a0", "a1", "b1", "a2", "b2", "a3"]
+        assert scheduler.stats()["in_flight"] == 0
+        assert scheduler.try_acquire()
+        scheduler.release()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def main():
+        scheduler = LLMScheduler(max_in_flight=1)
+        admitted: list = []
+        release = asyncio.Event()
+        blocker = asyncio.Event()
+        first = asyncio.create_task(_hold(scheduler, "a", "a0", admitted, blocker))
+        await _settle()
+        cancelled = asyncio.create_task(_hold(scheduler, "b", "b1", admitted, release))
+        waiting = asyncio.create_task(_hold(scheduler, "c", "c1", admitted, release))
+        await _settle()
+        assert scheduler.queue_depth == 2
+
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert scheduler.queue_depth == 1
+        assert scheduler.stats()["sessions_waiting"] == 1
+
+        release.set()
+        blocker.set()
+        await asyncio.gather(first, waiting)
+        assert admitted == ["a0", "c1"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_passed_on():
+    async def main():
+        scheduler = LLMScheduler(max_in_flight=1)
+        admitted: list = []
+        release = asyncio.Event()
+        assert scheduler.try_acquire()
+        granted = asyncio.create_task(_hold(scheduler, "b", "b1", admitted, release))
+        waiting = asyncio.create_task(_hold(scheduler, "c", "c1", admitted, release))
+        await _settle()
+
+        # The slot goes to b1's future, then b1 is cancelled before it runs again
+        scheduler.release()
+        granted.cancel()
+        release.set()
+        await asyncio.gather(granted, waiting, return_exceptions=True)
+        assert granted.cancelled()
+        assert admitted == ["c1"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    asyncio.run(main())
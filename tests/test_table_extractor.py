@@ -0,0 +1,95 @@
+"""Parsing statement tables from layout text."""
+import random
+
+import pytest
+
+from src.infrastructure.pdf.table_extractor import _statement_layout, extract_statement, find_statement_date
+from src.shared import utils
+
+
+def number(value: int, parentheses: bool = False) -> str:
+    text = f"{abs(value):,}".replace(",", " ")
+    if value < 0:
+        return f"({text})" if parentheses else f"-{text}"
+    return text
+
+
+def vzz_page(values: dict, note_rows: frozenset = frozenset(), blank: dict = None) -> str:
+    """A VZZ page: label, row number, optional note reference, current and previous year."""
+    names = utils.load_profit_and_loss_row_names()
+    blank = blank or {}
+    lines = ["VÝKAZ ZISKU A ZTRÁTY k 31.12.2024", f"{'Text':<60}{'Řádek':>6}{'Příloha':>9}{'Běžné':>14}{'Minulé':>14}"]
+    for row_id, (current, previous) in sorted(values.items()):
+        cells = ["" if blank.get(row_id) == 0 else number(current), "" if blank.get(row_id) == 1 else number(previous, parentheses=True)]
+        note = str(row_id % 9 + 1) if row_id in note_rows else ""
+        lines.append(f"{names[row_id][:55]:<60}{row_id:>6}{note:>9}{cells[0]:>14}{cells[1]:>14}")
+    return "\n".join(lines)
+
+
+def balance_sheet_page(values: dict) -> str:
+    """A Rozvaha page; asset rows carry brutto, korekce, netto and the previous netto."""
+    names = utils.load_balance_sheet_row_names()
+    _, _, assets = _statement_layout("rozvaha")
+    lines = ["ROZVAHA v plném rozsahu ke dni 31.12.2024"]
+    for row_id, (netto, previous) in sorted(values.items()):
+        if row_id in assets:
+            numbers = [number(netto + 100), number(-100), number(netto), number(previous)]
+        else:
+            numbers = [number(netto), number(previous)]
+        lines.append(f"{names[row_id][:55]:<60}{row_id:>6}" + "".join(f"{cell:>14}" for cell in numbers))
+    return "\n".join(lines)
+
+
+def random_values(statement_type: str, rng: random.Random) -> dict:
+    _, row_ids, _ = _statement_layout(statement_type)
+    return {row_id: (rng.randint(-10 ** 7, 10 ** 8), rng.randint(-10 ** 7, 10 ** 8)) for row_id in row_ids}
+
+
+def test_profit_and_loss_round_trip():
+    values = random_values("vzz", random.Random(1))
+    rows = sorted(values)
+    pages = [vzz_page({r: values[r] for r in rows[:30]}), vzz_page({r: values[r] for r in rows[30:]}, note_rows=frozenset(rows[35:40]))]
+    extracted = extract_statement("vzz", pages)
+    assert extracted["rok"] == 2024
+    assert extracted["data"] == {str(r): {"současné": c, "minulé": p} for r, (c, p) in values.items()}
+
+
+def test_balance_sheet_round_trip_with_brutto_and_korekce():
+    values = random_values("rozvaha", random.Random(2))
+    extracted = extract_statement("rozvaha", [balance_sheet_page(values)])
+    _, _, assets = _statement_layout("rozvaha")
+    for row_id, (netto, previous) in values.items():
+        row = extracted["data"][str(row_id)]
+        assert (row["netto"], row["netto_minule"]) == (netto, previous)
+        if row_id in assets:
+            assert (row["brutto"], row["korekce"]) == (netto + 100, -100)
+
+
+@pytest.mark.parametrize("column, field, other", [(0, "minulé", "současné"), (1, "současné", "minulé")])
+def test_lone_values_are_placed_by_their_column(column, field, other):
+    values = random_values("vzz", random.Random(3))
+    lone = {row_id: column for row_id in sorted(values)[::7]}
+    extracted = extract_statement("vzz", [vzz_page(values, blank=lone)])
+    for row_id in lone:
+        # The blank column is 0, the value stays in the column it was printed in
+        assert extracted["data"][str(row_id)][other] == 0
+        assert extracted["data"][str(row_id)][field] == values[row_id][1 - column]
+
+
+def test_lone_values_without_anchor_rows_reject_the_parse():
+    values = {row_id: (5, 7) for row_id in sorted(random_values("vzz", random.Random(4)))[:40]}
+    lone = {row_id: 1 for row_id in values}
+    assert extract_statement("vzz", [vzz_page(values, blank=lone)], min_coverage=0.1) is None
+
+
+def test_low_coverage_and_all_zero_tables_are_rejected():
+    values = random_values("vzz", random.Random(5))
+    few = {row_id: values[row_id] for row_id in sorted(values)[:5]}
+    assert extract_statement("vzz", [vzz_page(few)]) is None
+    assert extract_statement("vzz", [vzz_page({row_id: (0, 0) for row_id in values})]) is None
+
+
+def test_statement_date_is_the_most_frequent_one():
+    pages = ["Rozvaha k 31.12.2024", "Sestaveno dne 15. 3. 2025", "Stav k 31. 12. 2024"]
+    assert find_statement_date(pages) == "2024-12-31"
+    assert find_statement_date(["bez data"]) is None
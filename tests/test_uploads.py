@@ -0,0 +1,139 @@
+"""Upload spooling and the memory budget of uploads held at once."""
+import asyncio
+import io
+import os
+
+import pytest
+
+from src.infrastructure import uploads
+from src.infrastructure.uploads import MemoryBudget, SpoolWriter, UploadTooLarge, spool_stream
+from src.services import pipeline
+from src.services.pipeline import ProcessOptions, process_files
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_SPOOL_DIR", str(tmp_path))
+
+
+async def holder(budget: MemoryBudget, size: int, order: list, release: asyncio.Event) -> None:
+    async with budget.reserve(size):
+        order.append(size)
+        await release.wait()
+
+
+def test_budget_waits_first_come_first_served():
+    async def main():
+        budget = MemoryBudget(100)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(holder(budget, 60, order, release))
+        await asyncio.sleep(0)
+        # 50 does not fit next to 60; 10 would, but must not overtake the waiting 50
+        waiting = [asyncio.create_task(holder(budget, size, order, asyncio.Event())) for size in (50, 10)]
+        await asyncio.sleep(0)
+        assert order == [60]
+        assert budget.stats()["waiting_now"] == 2
+        release.set()
+        await first
+        await asyncio.sleep(0)
+        assert order == [60, 50, 10]
+        assert (budget.in_use, budget.peak, budget.waits) == (60, 60, 2)
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert budget.in_use == 0
+
+    asyncio.run(main())
+
+
+def test_file_larger_than_the_budget_runs_alone():
+    async def main():
+        budget = MemoryBudget(100)
+        async with budget.reserve(500):
+            assert budget.in_use == 500
+        order, release = [], asyncio.Event()
+        small = asyncio.create_task(holder(budget, 10, order, release))
+        await asyncio.sleep(0)
+        large = asyncio.create_task(holder(budget, 500, order, asyncio.Event()))
+        await asyncio.sleep(0)
+        assert order == [10]
+        release.set()
+        await small
+        await asyncio.sleep(0)
+        assert order == [10, 500]
+        large.cancel()
+        await asyncio.gather(large, return_exceptions=True)
+        assert budget.in_use == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_hands_its_place_on():
+    async def main():
+        budget = MemoryBudget(100)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(holder(budget, 90, order, release))
+        await asyncio.sleep(0)
+        blocked = asyncio.create_task(holder(budget, 50, order, asyncio.Event()))
+        behind = asyncio.create_task(holder(budget, 10, order, asyncio.Event()))
+        await asyncio.sleep(0)
+        blocked.cancel()
+        await asyncio.gather(blocked, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert order == [90, 10]
+        behind.cancel()
+        release.set()
+        await asyncio.gather(first, behind, return_exceptions=True)
+        assert (budget.in_use, budget.stats()["waiting_now"]) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_spool_writer_rejects_oversized_uploads(tmp_path):
+    async def main():
+        writer = SpoolWriter("a.pdf", max_bytes=10)
+        await writer.write(b"%PDF-")
+        with pytest.raises(UploadTooLarge):
+            await writer.write(b"123456")
+        writer.abort()
+
+        writer = SpoolWriter("b.pdf", max_bytes=10)
+        await writer.write(b"%PDF-1")
+        return writer.finish()
+
+    spooled = asyncio.run(main())
+    assert os.listdir(tmp_path) == [os.path.basename(spooled.path)]
+    assert (spooled.name, spooled.size, spooled.read()) == ("b.pdf", 6, b"%PDF-1")
+    spooled.discard()
+    spooled.discard()
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_file_cancels_its_siblings_before_returning(monkeypatch):
+    monkeypatch.setattr(uploads, "_budget", MemoryBudget(12))
+    started, cancelled = [], []
+
+    async def process_file(name, pdf_bytes, options, checkpoint):
+        started.append(name)
+        if name == "bad.pdf":
+            raise ValueError("unreadable")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    monkeypatch.setattr(pipeline, "process_file", process_file)
+    spooled = [spool_stream(name, io.BytesIO(b"%PDF-1")) for name in ("a.pdf", "bad.pdf", "c.pdf")]
+
+    async def main():
+        with pytest.raises(ValueError):
+            await process_files(spooled, ProcessOptions())
+        # By the time the error arrives nothing holds the budget or is about to read a spool file
+        assert cancelled == ["a.pdf"]
+        assert uploads.get_memory_budget().stats()["waiting_now"] == 0
+        assert uploads.get_memory_budget().in_use == 0
+
+    asyncio.run(main())
+    # c.pdf waited for the budget behind the other two and was never started
+    assert started == ["a.pdf", "bad.pdf"]
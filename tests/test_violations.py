@@ -0,0 +1,124 @@
+"""Violation records against the English messages the models produced before violations were structured."""
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from src.domain.models.balance_sheet import BalanceSheet, BalanceSheetRow
+from src.domain.models.profit_and_loss import ProfitAndLoss, ProfitAndLossRow
+from src.domain.models.rules import PREDEFINED_PL_FLEXIBLE_RULES, PREDEFINED_PL_VALIDATION_RULES, PREDEFINED_VALIDATION_RULES
+from src.domain.models.violations import BRUTTO_KOREKCE, ViolationError, violations_from_error
+from tests.statements import random_balance_sheet, random_profit_and_loss
+
+
+def sum_rule_message(target_row: int, source_rows: list, data: dict, field: str, tolerance: int):
+    target_value = getattr(data[target_row], field) if target_row in data else 0
+    source_sum = sum(getattr(data[s], field) for s in source_rows if s in data)
+    difference = abs(target_value - source_sum)
+    if difference <= tolerance:
+        return None
+    return (
+        f"Rule validation failed for {field}: Row {target_row} ({target_value}) != "
+        f"Sum of rows {'+'.join(str(row) for row in source_rows)} ({source_sum}) "
+        f"(difference: {difference}, tolerance: {tolerance})"
+    )
+
+
+def expression_rule_message(target_row: int, source_expressions: list, data: dict, field: str, tolerance: int):
+    target_value = getattr(data[target_row], field) if target_row in data else 0
+    calculated_value = 0
+    expression_parts = []
+    for row_number, operation in source_expressions:
+        if row_number in data:
+            calculated_value += getattr(data[row_number], field) * operation
+            op_symbol = "+" if operation > 0 else "-"
+            if len(expression_parts) == 0 and operation > 0:
+                expression_parts.append(str(row_number))
+            else:
+                expression_parts.append(f"{op_symbol}{row_number}")
+    difference = abs(target_value - calculated_value)
+    if difference <= tolerance:
+        return None
+    return (
+        f"Flexible rule validation failed for {field}: Row {target_row} ({target_value}) != "
+        f"{''.join(expression_parts)} ({calculated_value}) (difference: {difference}, tolerance: {tolerance})"
+    )
+
+
+def balance_sheet_messages(data: dict, tolerance: int) -> list:
+    messages = []
+    for rule in PREDEFINED_VALIDATION_RULES:
+        for field in ("netto", "netto_minule"):
+            messages.append(sum_rule_message(rule.target_row, rule.source_rows, data, field, tolerance))
+    return [message for message in messages if message]
+
+
+def profit_and_loss_messages(data: dict, tolerance: int) -> list:
+    messages = []
+    for field in ("současné", "minulé"):
+        for rule in PREDEFINED_PL_VALIDATION_RULES + PREDEFINED_PL_FLEXIBLE_RULES:
+            messages.append(expression_rule_message(rule.target_row, rule.source_expressions, data, field, tolerance))
+    return [message for message in messages if message]
+
+
+STATEMENTS = {
+    "rozvaha": (BalanceSheet, BalanceSheetRow, random_balance_sheet, balance_sheet_messages, "Balance sheet validation failed:"),
+    "vzz": (ProfitAndLoss, ProfitAndLossRow, random_profit_and_loss, profit_and_loss_messages, "Profit and loss validation failed:"),
+}
+
+
+@pytest.mark.parametrize("statement_type", sorted(STATEMENTS))
+def test_model_errors_match_english_messages(statement_type):
+    model, row_type, make_payload, expected_messages, header = STATEMENTS[statement_type]
+    rng = random.Random(statement_type)
+    for _ in range(300):
+        payload = make_payload(rng)
+        tolerance = rng.choice([0, 0, 1, 5, 1000])
+        data = {int(row_id): row_type(**values) for row_id, values in payload["data"].items()}
+        expected = expected_messages(data, tolerance)
+        try:
+            statement = model.model_validate(payload, context={"tolerance": tolerance})
+        except ValidationError as e:
+            violations, other = violations_from_error(e)
+            assert other == []
+            assert [violation.message() for violation in violations] == expected
+            assert header + "\n" + "\n".join(f"- {message}" for message in expected) in str(e)
+        else:
+            assert expected == []
+            assert statement.violations() == []
+
+
+def test_brutto_korekce_message_and_row():
+    payload = {"rok": 2024, "data": {"3": {"brutto": 100, "korekce": -30, "netto": 60, "netto_minule": 0}}}
+    with pytest.raises(ValidationError) as raised:
+        BalanceSheet.model_validate(payload, context={"tolerance": 5})
+    violations, other = violations_from_error(raised.value)
+    assert other == []
+    assert len(violations) == 1
+    violation = violations[0]
+    assert (violation.kind, violation.target_row, violation.computed_value) == (BRUTTO_KOREKCE, 3, 70)
+    assert violation.message() == (
+        "Brutto - Korekce validation failed: brutto (100) - korekce (30) = 70, "
+        "but netto is 60 (difference: 10, tolerance: 5)"
+    )
+
+
+def test_violation_error_text():
+    statement = BalanceSheet.model_validate(random_balance_sheet(random.Random(1)) | {"tolerance": 10 ** 30})
+    statement.tolerance = 0
+    violations = statement.violations()
+    assert violations
+    assert str(ViolationError(violations)) == "\n".join(violation.message() for violation in violations)
+
+
+def test_violations_follow_tolerance_and_data_changes():
+    payload = {"rok": 2024, "data": {"1": {"netto": 0, "netto_minule": 0}, "78": {"netto": 0, "netto_minule": 0}}}
+    statement = BalanceSheet.model_validate(payload)
+    assert statement.violations() == []
+    statement.data[78].netto = 2
+    statement.tolerance = 1
+    assert {violation.target_row for violation in statement.violations()} == {1, 78}
+    assert "✗ VALIDATION ERRORS" in statement.summary_report()
+    statement.tolerance = 2
+    assert statement.violations() == []
+    assert "✓ VALID" in statement.summary_report()
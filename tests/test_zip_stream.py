@@ -0,0 +1,50 @@
+"""ZIP archives streamed member by member."""
+import asyncio
+import io
+import os
+import zipfile
+
+from src.infrastructure.exporters.zip_stream import stream_zip
+
+
+def collect(members) -> bytes:
+    async def main():
+        return b"".join([chunk async for chunk in stream_zip(members)])
+
+    return asyncio.run(main())
+
+
+def test_streamed_archive_unzips():
+    contents = {"a.xlsx": os.urandom(50_000), "b.xlsx": b"x" * 200_000, "empty.xlsx": b""}
+    data = collect((name, lambda content=content: content) for name, content in contents.items())
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(contents)
+        assert {name: archive.read(name) for name in archive.namelist()} == contents
+        assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in archive.infolist())
+
+
+def test_empty_archive_is_valid():
+    with zipfile.ZipFile(io.BytesIO(collect([]))) as archive:
+        assert archive.namelist() == []
+
+
+def test_each_member_is_sent_before_the_next_is_built():
+    produced = []
+
+    def member(name: str):
+        def produce() -> bytes:
+            produced.append(name)
+            return name.encode() * 1000
+        return name, produce
+
+    async def main():
+        stream = stream_zip(member(name) for name in ("a", "b", "c"))
+        first = await stream.__anext__()
+        assert produced == ["a"]
+        assert first.startswith(b"PK\x03\x04")
+        # A client that goes away closes the stream without building the rest
+        await stream.aclose()
+        assert produced == ["a"]
+
+    asyncio.run(main())